@@ -0,0 +1,37 @@
+import sys
+import time
+from typing import List, Dict, Tuple, Set
+
+from data_storage.storage_coordinator import StorageCoordinator
+
+TABLE_DEFINITION = {
+    0: {'name': 'sno', 'type': 'int', 'is_nullable': False, 'is_unique': True, 'is_key': True},
+    1: {'name': 'academy', 'type': 'str', 'is_nullable': False, 'is_unique': False, 'is_key': False},
+    2: {'name': 'major', 'type': 'str', 'is_nullable': False, 'is_unique': False, 'is_key': False},
+    3: {'name': 'grade', 'type': 'int', 'is_nullable': True, 'is_unique': False, 'is_key': False},
+}
+ACADEMIES = ['计科院', '数院', '外院', '物理院', '化学院']
+MAJORS = ['软件', '计科', '基础数学', '应用数学', '英语', '法语', '俄语']
+# 未建索引列上的典型过滤条件
+FILTERS = [(1, '=', '数院'), (2, '<>', '软件'), (3, '>=', 60), (3, '<', 90), (2, 'LIKE', '%数学')]
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main(argv: List[str]) -> None:
+    count = int(argv[1]) if len(argv) > 1 else 1000000
+    table = [(i, ACADEMIES[i % 5], MAJORS[(i // 5) % 7], (i * 37) % 101) for i in range(count)]
+    storages = {layout: StorageCoordinator(table, TABLE_DEFINITION, layout) for layout in ('row', 'columnar')}
+    print(f'{"filter":>24} {"row(s)":>9} {"columnar(s)":>12} {"speedup":>8}')
+    for cond in FILTERS:
+        row = timed(lambda: storages['row'].locate(*cond))
+        columnar = timed(lambda: storages['columnar'].locate(*cond))
+        print(f'{str(cond):>24} {row:>9.3f} {columnar:>12.3f} {row / columnar:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main(sys.argv)
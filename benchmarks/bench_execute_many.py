@@ -0,0 +1,42 @@
+import sys
+import time
+from typing import List, Dict, Tuple, Set
+
+from core import Core
+
+TABLE_DEFINITION = {
+    0: {'name': 'sno', 'type': 'int', 'is_nullable': False, 'is_unique': True, 'is_key': True, 'index_order': 64},
+    1: {'name': 'name', 'type': 'str', 'is_nullable': False, 'is_unique': False, 'is_key': False},
+    2: {'name': 'grade', 'type': 'int', 'is_nullable': True, 'is_unique': False, 'is_key': True, 'index_order': 64},
+}
+
+
+def requests(count: int) -> List[dict]:
+    # 以参数化的插入为主，夹杂少量查询，模拟日志回放与数据导入
+    result = []
+    for i in range(count):
+        if i % 100 == 99:
+            result.append({'sql_expr': 'SELECT name WHERE sno = ?', 'serial_number': i, 'params': (i // 2,)})
+        else:
+            result.append({'sql_expr': 'INSERT sno, name, grade VALUES ?, ?, ?', 'serial_number': i,
+                           'params': (i * 7919 % count, 'n%d' % i, i % 100)})
+    return result
+
+
+def main(argv: List[str]) -> None:
+    count = int(argv[1]) if len(argv) > 1 else 50000
+    core = Core(TABLE_DEFINITION, [])
+    start = time.perf_counter()
+    one_by_one = [core.execute_sql_expr(request) for request in requests(count)]
+    single = time.perf_counter() - start
+    core = Core(TABLE_DEFINITION, [])
+    start = time.perf_counter()
+    batched = list(core.execute_many(requests(count)))
+    many = time.perf_counter() - start
+    assert one_by_one == batched
+    print(f'{count} requests: execute_sql_expr {count / single:.0f}/s, execute_many {count / many:.0f}/s, '
+          f'speedup {single / many:.2f}x')
+
+
+if __name__ == '__main__':
+    main(sys.argv)
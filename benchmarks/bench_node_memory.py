@@ -0,0 +1,71 @@
+import sys
+import tracemalloc
+from typing import List, Dict, Tuple, Set
+
+from data_storage.bplus_tree import BPlusTree, iter_posting
+
+
+class LegacyNode(object):
+    # 改造前的结点布局：每个实例带 __dict__，每个键的倒排项都是一个 list
+    def __init__(self, order: int):
+        self.order = order
+        self.values = []
+        self.pointers = []
+        self.right = None
+        self.left = None
+        self.parent = None
+        self.is_leaf = False
+
+
+def to_legacy(root) -> LegacyNode:
+    # 按相同的树形复制出旧布局，叶子结点同样串成双向链表
+    legacy_root = LegacyNode(root.order)
+    stack = [(root, legacy_root)]
+    last_leaf = None
+    while stack:
+        node, legacy = stack.pop()
+        legacy.values = list(node.values)
+        legacy.is_leaf = node.is_leaf
+        if node.is_leaf:
+            legacy.pointers = [list(iter_posting(p)) for p in node.pointers]
+            legacy.left = last_leaf
+            if last_leaf is not None:
+                last_leaf.right = legacy
+            last_leaf = legacy
+            continue
+        for child in node.pointers:
+            legacy_child = LegacyNode(child.order)
+            legacy_child.parent = legacy
+            legacy.pointers.append(legacy_child)
+        stack.extend(reversed(list(zip(node.pointers, legacy.pointers))))
+    return legacy_root
+
+
+def traced(build):
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def run(count: int, cardinality: int, order: int) -> Tuple[int, int]:
+    pairs = [((i * 7919) % cardinality, i) for i in range(count)]  # 键对象两种布局共享，只比较结构开销
+    tree = BPlusTree(0, order)
+    _, compact = traced(lambda: tree.bulk_load(pairs))
+    _, legacy = traced(lambda: to_legacy(tree.root))
+    return compact, legacy
+
+
+def main(argv: List[str]) -> None:
+    count = int(argv[1]) if len(argv) > 1 else 1000000
+    print(f'{"rows":>10} {"distinct":>10} {"order":>6} {"compact(MB)":>12} {"legacy(MB)":>12} {"saved":>7}')
+    for cardinality in [count, count // 10, 100]:
+        for order in [3, 64, 256]:
+            compact, legacy = run(count, cardinality, order)
+            print(f'{count:>10} {cardinality:>10} {order:>6} {compact / 2 ** 20:>12.1f} {legacy / 2 ** 20:>12.1f}'
+                  f' {1 - compact / legacy:>7.1%}')
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,46 @@
+import sys
+import time
+from typing import List, Dict, Tuple, Set
+
+from core import Core
+
+TABLE_DEFINITION = {
+    0: {'name': 'sno', 'type': 'int', 'is_nullable': False, 'is_unique': True, 'is_key': True, 'index_order': 64},
+    1: {'name': 'name', 'type': 'str', 'is_nullable': False, 'is_unique': False, 'is_key': False},
+    2: {'name': 'grade', 'type': 'int', 'is_nullable': True, 'is_unique': False, 'is_key': False},
+}
+
+
+def timed(core: Core, sql: str, repeat: int) -> tuple:
+    start = time.perf_counter()
+    for i in range(repeat):
+        result = core.execute_sql_expr({'sql_expr': sql, 'serial_number': i})
+    assert result['is_success'], result['error_msg']
+    return (time.perf_counter() - start) / repeat, result['content']
+
+
+def main(argv: List[str]) -> None:
+    count = int(argv[1]) if len(argv) > 1 else 100000
+    core = Core(TABLE_DEFINITION, [(i * 7919 % count, 'n%d' % i, i * 104729 % count) for i in range(count)])
+    # 客户端自行排序：取回全部结果后在客户端排序
+    start = time.perf_counter()
+    rows = core.execute_sql_expr({'sql_expr': 'SELECT sno, grade', 'serial_number': 0})['content']
+    client = sorted(rows, key=lambda row: row[1], reverse=True)[:10]
+    client_time = time.perf_counter() - start
+    cases = [('index walk, top 10', 'SELECT sno, grade ORDER BY sno DESC LIMIT 10', 20),
+             ('index walk, all rows', 'SELECT sno, grade ORDER BY sno', 3),
+             ('heap, top 10', 'SELECT sno, grade ORDER BY grade DESC LIMIT 10', 3),
+             ('sort, all rows', 'SELECT sno, grade ORDER BY grade', 3)]
+    print(f'{count} rows: client-side sort of the full result {client_time * 1000:.1f} ms')
+    for name, sql, repeat in cases:
+        elapsed, content = timed(core, sql, repeat)
+        if name == 'heap, top 10':
+            assert content == client
+        print(f'  {name}: {elapsed * 1000:.1f} ms')
+    core.db_m.sort_run_m = count // 10
+    elapsed, _ = timed(core, 'SELECT sno, grade ORDER BY grade', 1)
+    print(f'  external merge sort, 10 runs: {elapsed * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,44 @@
+import sys
+import time
+from typing import List, Dict, Tuple, Set
+
+from sql_engine import SqlEngine
+
+TABLE_DEFINITION = {
+    0: {'name': 'sno', 'type': 'int', 'is_nullable': False, 'is_unique': True, 'is_key': True},
+    1: {'name': 'name', 'type': 'str', 'is_nullable': False, 'is_unique': False, 'is_key': False},
+    2: {'name': 'major', 'type': 'str', 'is_nullable': False, 'is_unique': False, 'is_key': False},
+    3: {'name': 'grade', 'type': 'int', 'is_nullable': True, 'is_unique': False, 'is_key': False},
+}
+STATEMENTS = [
+    "SELECT * WHERE sno = 42",
+    "SELECT name, grade WHERE major = '软件' AND grade >= 60",
+    "SELECT * WHERE sno > 10 AND grade < 90 OR name LIKE '张%' OR major <> '英语'",
+    "INSERT sno, name, major, grade VALUES 1234, '张三', '计科', 90",
+    "UPDATE SET grade = 95, name = 'amazing' WHERE sno = 99",
+    "DELETE WHERE grade < 60",
+]
+
+
+def per_statement(engine: SqlEngine, sql: str, repeat: int) -> float:
+    # 直接调用解析器，绕过计划缓存
+    parser = engine.parser
+    lexer = engine.lexer
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parser.parse(sql, lexer=lexer)
+    return (time.perf_counter() - start) / repeat
+
+
+def main(argv: List[str]) -> None:
+    repeat = int(argv[1]) if len(argv) > 1 else 20000
+    engines = {backend: SqlEngine(TABLE_DEFINITION, parser_backend=backend) for backend in ('ply', 'fast')}
+    print(f'{"statement":<40} {"ply(us)":>9} {"fast(us)":>9} {"speedup":>8}')
+    for sql in STATEMENTS:
+        ply = per_statement(engines['ply'], sql, repeat) * 1e6
+        fast = per_statement(engines['fast'], sql, repeat) * 1e6
+        print(f'{sql[:40]:<40} {ply:>9.1f} {fast:>9.1f} {ply / fast:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,32 @@
+import sys
+import time
+from typing import List, Dict, Tuple, Set
+
+from core import Core
+
+TABLE_DEFINITION = {
+    0: {'name': 'id', 'type': 'int', 'is_nullable': False, 'is_unique': True, 'is_key': True},
+    1: {'name': 'grp', 'type': 'int', 'is_nullable': False, 'is_unique': False, 'is_key': True},
+}
+
+
+def main(argv: List[str]) -> None:
+    # 两个值的索引列：每个键的倒排项都有 count/2 行，删除其首尾的行不应重建整个倒排项
+    count = int(argv[1]) if len(argv) > 1 else 100000
+    core = Core(TABLE_DEFINITION, [(i, i % 2) for i in range(count)])
+    start = time.perf_counter()
+    result = core.execute_sql_expr({'sql_expr': 'DELETE WHERE id < ?', 'serial_number': 0, 'params': (count // 50,)})
+    assert result['is_success'], result['error_msg']
+    batch = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(200):
+        core.execute_sql_expr({'sql_expr': 'DELETE WHERE id = ?', 'serial_number': i, 'params': (count - 1 - i,)})
+    single = time.perf_counter() - start
+    remaining = core.execute_sql_expr({'sql_expr': 'SELECT id WHERE grp = 0', 'serial_number': 0})['content']
+    assert len(remaining) == (count - count // 50 - 200) // 2
+    print(f'{count} rows: DELETE WHERE id < {count // 50} {batch * 1000:.1f} ms, '
+          f'200 single-row deletes {single * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main(sys.argv)
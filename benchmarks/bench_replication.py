@@ -0,0 +1,51 @@
+import sys
+import time
+from typing import List, Dict, Tuple, Set
+
+from core import Core
+from replication import ReplicatedCore
+
+TABLE_DEFINITION = {
+    0: {'name': 'sno', 'type': 'int', 'is_nullable': False, 'is_unique': True, 'is_key': True, 'index_order': 64},
+    1: {'name': 'name', 'type': 'str', 'is_nullable': False, 'is_unique': False, 'is_key': False},
+    2: {'name': 'grade', 'type': 'int', 'is_nullable': False, 'is_unique': False, 'is_key': False},
+}
+ROWS = [(i, 'n%d' % (i * 7919 % 100000), i % 100) for i in range(20000)]
+
+
+def requests(count: int) -> List[dict]:
+    # 需要扫描整列的查询（grade 无索引），每 50 条夹一条插入
+    result = []
+    for i in range(count):
+        if i % 50 == 49:
+            result.append({'sql_expr': 'INSERT sno, name, grade VALUES ?, ?, ?', 'serial_number': i,
+                           'params': (100000 + i, 'x', i % 100)})
+        else:
+            result.append({'sql_expr': 'SELECT sno WHERE grade = ? AND sno < 2000', 'serial_number': i,
+                           'params': (i % 100,)})
+    return result
+
+
+def run(core, count: int) -> float:
+    start = time.perf_counter()
+    for result in core.execute_many(requests(count)):
+        assert result['is_success']
+    return time.perf_counter() - start
+
+
+def main(argv: List[str]) -> None:
+    count = int(argv[1]) if len(argv) > 1 else 2000
+    baseline = run(Core(TABLE_DEFINITION, ROWS), count)
+    print(f'Core:                  {count / baseline:8.0f} requests/s')
+    for replicas in (1, 2, 4):
+        core = ReplicatedCore(TABLE_DEFINITION, ROWS, replicas)
+        try:
+            core.execute_sql_expr({'sql_expr': 'SELECT sno WHERE sno = 0', 'serial_number': 0})  # 等待副本进程启动
+            elapsed = run(core, count)
+        finally:
+            core.close()
+        print(f'ReplicatedCore({replicas}):     {count / elapsed:8.0f} requests/s  {baseline / elapsed:.2f}x')
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -1,64 +1,99 @@
-from typing import List, Dict, Tuple, Set
-from graphviz import Digraph, nohtml
-from functools import reduce
+from typing import List, Dict, Tuple, Set, Iterable, Iterator
+from itertools import islice
+import re
+import graphviz
+from graphviz.lang import quote
 
 from sql_engine import SqlEngine, Code
 from sql_engine import SqlSyntaxException, SqlColumnException, ValueInvalidException
 from data_storage import StorageCoordinator
 from data_storage import NotUniqueException
+from data_storage import WriteAheadLog, write_checkpoint, load_checkpoint, DEFAULT_CHECKPOINT_INTERVAL
+
+DEFAULT_BATCH_SIZE = 1000  # execute_many 中一次批量插入的最多记录数
+DEFAULT_PAGE_SIZE = 1000  # iter_pages 每页的行数
 
 
 class SqlVm(object):
+    # 一次执行的寄存器状态；Core 每次执行语句都新建一个 SqlVm，多个线程执行的语句互不干扰
+    WRITE_OPCS = frozenset(('insert', 'update', 'delete'))
+
     def __init__(self):
         self.reg_selector = []
         self.reg_table = [[]]
         self.pc = 0
 
     def locate(self, conditions: List[List[tuple]], db: StorageCoordinator) -> None:
-        self.reg_selector = db.locate_all()
+        # 只有无条件时才需要全部存活行；各条件定位出的行号本身都是存活行
         if conditions == []:
+            self.reg_selector = db.locate_all()
             return
-        or_selector = []
+        or_selector = set()
         for and_cond in conditions:
-            and_selector = []
-            for cond in and_cond:
-                and_selector.append(db.locate(*cond))
-            or_selector.append(list(reduce(lambda x, y: x.intersection(y), map(set, and_selector))))
-        or_selector = list(reduce(lambda x, y: x.union(y), map(set, or_selector)))
-        self.reg_selector = list(set(or_selector).intersection(self.reg_selector))
+            # 逐个条件求交集，交集为空时其余条件不必再定位
+            and_selector = set(db.locate(*and_cond[0]))
+            for cond in and_cond[1:]:
+                if not and_selector:
+                    break
+                and_selector.intersection_update(db.locate(*cond))
+            or_selector.update(and_selector)
+        self.reg_selector = sorted(or_selector)
 
     def project(self, columns: List[int]):
-        new_tbl = []
-        for record in self.reg_table:
-            one_new_record = []
-            for index in columns:
-                one_new_record.append(record[index])
-            new_tbl.append(tuple(one_new_record))
-        self.reg_table = new_tbl
+        self.reg_table = list(self.iter_project(self.reg_table, columns))
 
-    def run(self, code_list: List[Code], db: StorageCoordinator):
-        vm_result = {}
+    @staticmethod
+    def iter_project(table: Iterable[tuple], columns: List[int]) -> Iterator[tuple]:
+        for record in table:
+            yield tuple(record[index] for index in columns)
+
+    def bound(self, code_list: List[Code]):
+        # 之后的 limit 最多需要的行数，排序时只需保留这么多行；没有 limit 时为 None
+        for code in code_list[self.pc + 1:]:
+            if code.opc == 'limit':
+                count, offset = code.opr
+                return count + offset
+        return None
+
+    @staticmethod
+    def is_read_only(code_list: List[Code]) -> bool:
+        return not any(code.opc in SqlVm.WRITE_OPCS for code in code_list)
+
+    def stream(self, code_list: List[Code], db: StorageCoordinator) -> Iterator[tuple]:
+        # 执行 code_list，返回结果行的迭代器：order、query、project 与 limit 都是惰性的，
+        # 取到 LIMIT 要求的行数后不再读取与投影其余的行；迭代期间数据不能被修改
         self.reg_selector = []
         self.reg_table = []
         self.pc = 0
+        while self.pc != len(code_list):
+            code = code_list[self.pc]
+            if code.opc == 'insert':
+                db.insert(code.opr)
+            elif code.opc == 'update':
+                db.update(code.opr, self.reg_selector)
+            elif code.opc == 'delete':
+                db.delete(self.reg_selector)
+            elif code.opc == 'locate':
+                self.locate(code.opr, db)
+            elif code.opc == 'order':
+                attribute, desc = code.opr
+                self.reg_selector = db.iter_ordered(self.reg_selector, attribute, desc, self.bound(code_list))
+            elif code.opc == 'query':
+                self.reg_table = db.iter_query(self.reg_selector)
+            elif code.opc == 'project':
+                self.reg_table = self.iter_project(self.reg_table, code.opr)
+            elif code.opc == 'limit':
+                count, offset = code.opr
+                self.reg_table = islice(self.reg_table, offset, offset + count)
+            else:
+                raise Exception('[FATAL][Internal Error]SqlVm found unknown opc' + str(code.opc))
+            self.pc += 1
+        return iter(self.reg_table)
+
+    def run(self, code_list: List[Code], db: StorageCoordinator):
+        vm_result = {}
         try:
-            while self.pc != len(code_list):
-                code = code_list[self.pc]
-                if code.opc == 'insert':
-                    db.insert(code.opr)
-                elif code.opc == 'update':
-                    db.update(code.opr, self.reg_selector)
-                elif code.opc == 'delete':
-                    db.delete(self.reg_selector)
-                elif code.opc == 'locate':
-                    self.locate(code.opr, db)
-                elif code.opc == 'query':
-                    self.reg_table = db.query(self.reg_selector)
-                elif code.opc == 'project':
-                    self.project(code.opr)
-                else:
-                    raise Exception('[FATAL][Internal Error]SqlVm found unknown opc' + str(code.opc))
-                self.pc += 1
+            self.reg_table = list(self.stream(code_list, db))
         except Exception as e:
             vm_result['is_success'] = False
             vm_result['content'] = []
@@ -71,11 +106,31 @@ class SqlVm(object):
 
 
 class Core(object):
-    def __init__(self, table_definition: dict, table_data: List[tuple]):
-        self.vm_m = SqlVm()
+    def __init__(self, table_definition: dict, table_data: List[tuple], table_layout: str = "row",
+                 wal_dir: str = None, checkpoint_interval: int = DEFAULT_CHECKPOINT_INTERVAL,
+                 table_path: str = None, parser_backend: str = "ply"):
         self.table_definition_m = table_definition
-        self.engine_m = SqlEngine(table_definition)
-        self.db_m = StorageCoordinator(table_data, table_definition)
+        self.engine_m = SqlEngine(table_definition, parser_backend=parser_backend)
+        self.wal_dir_m = wal_dir
+        self.wal_m = None
+        self.checkpoint_interval_m = checkpoint_interval
+        if wal_dir is None:
+            self.db_m = StorageCoordinator(table_data, table_definition, table_layout, table_path)
+            return
+        # 指定 wal_dir 时：有检查点则从检查点恢复（忽略 table_data），再重放检查点之后的日志
+        state = load_checkpoint(wal_dir)
+        if state is None:
+            self.db_m = StorageCoordinator(table_data, table_definition, table_layout, table_path)
+            seq = 0
+        else:
+            self.db_m = StorageCoordinator([], table_definition, table_layout, table_path, checkpoint=state)
+            seq = state["seq"]
+        self.wal_m = WriteAheadLog(wal_dir, seq)
+        for record in self.wal_m.records(seq):
+            self.db_m.apply_mutation(record["op"], record["args"])
+        self.db_m.set_log_hook(self.wal_m.append)
+        if state is None:  # 初始数据不写日志，直接作为第一个检查点
+            self.checkpoint()
 
     def execute_sql_expr(self, request: dict) -> dict:
         sql_result = {}
@@ -88,8 +143,10 @@ class Core(object):
             sql_result['serial_number'] = request['serial_number']
 
             # run sql
-            code_list = self.engine_m.resolve_sql_expr(request['sql_expr'])
-            vm_result = self.vm_m.run(code_list, self.db_m)
+            # 可选的 params 为语句中 ? 占位符依次绑定的值
+            code_list = self.engine_m.resolve_sql_expr(request['sql_expr'], request.get('params'))
+            vm_result = self.__run(code_list)
+            self.__maybe_checkpoint()
 
             # rewrite result
             if vm_result['is_success'] == True:
@@ -103,100 +160,203 @@ class Core(object):
                 sql_result['content'] = []
                 sql_result['error_msg'] = vm_result['error_msg']
 
-        except KeyError as e:
-            sql_result['error_msg'] = '[Exception][KeyError] request to Core is unrecognized format. ' + str(e)
-        except SqlSyntaxException as e:
-            sql_result['error_msg'] = '[Exception]' + str(e)
-        except SqlColumnException as e:
-            sql_result['error_msg'] = '[Exception]' + str(e)
-        except ValueInvalidException as e:
-            sql_result['error_msg'] = '[Exception]' + str(e)
-        except NotUniqueException as e:
-            sql_result['error_msg'] = '[Exception]' + str(e)
         except Exception as e:
-            sql_result['error_msg'] = '[Exception][InternalError] unexpected exception occur. ' + str(e)
+            sql_result['error_msg'] = self.__error_msg(e)
         return sql_result
 
-    def generate_index_picture(self, output_path: str, attribute: int) -> None:
-        def generate_bplustree_picture(dat: dict, tree_order=3) -> None:
-            nonlocal output_path
-            dot = Digraph(format='png', node_attr={'shape': 'Mrecord'})
-            nodeid2index: Dict[int, int] = {}
-            leaf_index: List[int] = []
-            index_counter = 0
-
-            def value_str_short(value, truncate: int = 5):
-                value_str = str(value)
-                if len(value_str) > truncate:
-                    value_str = value_str[:truncate] + '...'
-                return value_str
-
-            def value_list_2htmltab(value_list: list, leaf_pointer: list = [], is_leaf: bool = False):
-                nonlocal tree_order
-                tab_body = ''
-                writed_block = 0
-
-                it = iter(leaf_pointer)
-                for value in value_list:
-                    tab_body += f'<f{str(writed_block)}>'
-                    tab_body += value_str_short(value)
-                    if writed_block != tree_order - 1:
-                        tab_body += '|'
-                    writed_block += 1
-
-                for i in range(tree_order - writed_block):
-                    tab_body += f'<f{str(writed_block)}>'
-                    if writed_block != tree_order - 1:
-                        tab_body += '|'
-                    writed_block += 1
+    @staticmethod
+    def __error_msg(e: Exception) -> str:
+        if isinstance(e, KeyError):
+            return '[Exception][KeyError] request to Core is unrecognized format. ' + str(e)
+        if isinstance(e, (SqlSyntaxException, SqlColumnException, ValueInvalidException, NotUniqueException)):
+            return '[Exception]' + str(e)
+        return '[Exception][InternalError] unexpected exception occur. ' + str(e)
+
+    def iter_pages(self, request: dict, page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[dict]:
+        # 分页产生查询结果：每页一个与 execute_sql_expr 格式相同的结果，content 最多 page_size 行，不构建整张结果表
+        # 结果为空时产生一个空页；修改语句与出错的语句只产生一个结果
+        # 迭代器只能使用一次；两页之间持有读锁（修改语句会等待），因此不能在迭代中执行修改语句
+        # 最后一页与出错的结果在释放读锁之后才产生；消费完、close() 或迭代器被回收时读锁一定被释放
+        sql_result = {'is_success': False, 'content': [], 'error_msg': []}
+        try:
+            sql_result['sql_expr'] = request['sql_expr']
+            sql_result['serial_number'] = request['serial_number']
+            code_list = self.engine_m.resolve_sql_expr(request['sql_expr'], request.get('params'))
+        except Exception as e:
+            sql_result['error_msg'] = self.__error_msg(e)
+            yield sql_result
+            return
+        if not SqlVm.is_read_only(code_list):
+            yield self.execute_sql_expr(request)
+            return
+        self.db_m.acquire_read()
+        locked = True
+        try:
+            rows = SqlVm().stream(code_list, self.db_m)
+            page = list(islice(rows, page_size))
+            while True:
+                # 先取下一页：没有下一页时当前页就是最后一页，产生之前释放读锁
+                following = list(islice(rows, page_size))
+                if not following:
+                    locked = False
+                    self.db_m.release_read()
+                yield dict(sql_result, is_success=True, content=page, error_msg='')
+                if not following:
+                    return
+                page = following
+        except Exception as e:
+            sql_result['error_msg'] = str(e)
+        finally:
+            if locked:
+                self.db_m.release_read()
+        yield sql_result
+
+    def __run(self, code_list: List[Code]) -> dict:
+        # 整条语句在存储层的读写锁下执行：只读语句之间可以并行，修改语句独占
+        if SqlVm.is_read_only(code_list):
+            with self.db_m.read_locked():
+                return SqlVm().run(code_list, self.db_m)
+        with self.db_m.write_locked():
+            vm_result = SqlVm().run(code_list, self.db_m)
+            seq = self.wal_m.last_seq() if self.wal_m is not None else 0
+        self.__sync(seq)
+        return vm_result
+
+    def __sync(self, seq: int) -> None:
+        # 修改语句返回结果前等待其日志记录落盘；在写锁之外等待，同时执行的修改语句共用一次 fsync（组提交）
+        if self.wal_m is not None:
+            self.wal_m.sync(seq)
+
+    def __maybe_checkpoint(self) -> None:
+        if self.wal_m is not None and len(self.wal_m) >= self.checkpoint_interval_m:
+            self.checkpoint()
+
+    def execute_many(self, requests: Iterable[dict], batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[dict]:
+        # 依次执行一批请求，按请求顺序惰性地产生与 execute_sql_expr 格式相同的结果
+        # 同一批中相同的语句只取一次计划；连续的单条 INSERT 攒成一组，通过 insert_many 批量维护索引
+        # 攒下的插入在产生其结果时才执行，调用方需要把迭代器消费完
+        statements = {}  # sql_expr -> PreparedStatement
+        pending = []  # 尚未执行的连续插入：(sql_result, record)
+        for request in requests:
+            sql_result = {'is_success': False, 'content': [], 'error_msg': []}
+            try:
+                sql_result['sql_expr'] = request['sql_expr']
+                sql_result['serial_number'] = request['serial_number']
+                statement = statements.get(request['sql_expr'])
+                if statement is None:
+                    statement = statements[request['sql_expr']] = self.engine_m.prepare(request['sql_expr'])
+                code_list = statement.bind(request.get('params') or ())
+            except Exception as e:
+                sql_result['error_msg'] = self.__error_msg(e)
+                yield from self.__flush_inserts(pending)
+                yield sql_result
+                continue
+            if len(code_list) == 1 and code_list[0].opc == 'insert':
+                pending.append((sql_result, code_list[0].opr))
+                if len(pending) >= batch_size:
+                    yield from self.__flush_inserts(pending)
+                continue
+            yield from self.__flush_inserts(pending)
+            vm_result = self.__run(code_list)
+            self.__maybe_checkpoint()
+            sql_result['is_success'] = vm_result['is_success']
+            sql_result['content'] = vm_result['content']
+            sql_result['error_msg'] = vm_result['error_msg']
+            yield sql_result
+        yield from self.__flush_inserts(pending)
+
+    def __flush_inserts(self, pending: List[tuple]) -> Iterator[dict]:
+        # 执行攒下的插入并清空 pending；单条记录的错误与 SqlVm 中逐条插入时的错误信息相同
+        if not pending:
+            return
+        batch = pending[:]
+        del pending[:]
+        try:
+            with self.db_m.write_locked():
+                errors = self.db_m.insert_many([record for _, record in batch])
+                seq = self.wal_m.last_seq() if self.wal_m is not None else 0
+            self.__sync(seq)
+        except Exception as e:
+            errors = [e] * len(batch)
+        self.__maybe_checkpoint()
+        for (sql_result, _), error in zip(batch, errors):
+            if error is None:
+                sql_result['is_success'] = True
+                sql_result['error_msg'] = ''
+            else:
+                sql_result['error_msg'] = str(error)
+            yield sql_result
+
+    def checkpoint(self) -> None:
+        # 写出完整的检查点后截断日志；检查点写入前崩溃时，旧检查点加完整日志仍可恢复
+        # 持有写锁，检查点与截断之间不会有新的日志记录
+        with self.db_m.write_locked():
+            self.wal_m.commit()
+            state = self.db_m.checkpoint_state()
+            state["seq"] = self.wal_m.last_seq()
+            write_checkpoint(self.wal_dir_m, state)
+            self.wal_m.truncate()
 
+    def compact(self) -> int:
+        # 整理空行并返回回收的行槽位数；整理改写了行号，作为一条日志记录落盘，重放时在同一位置整理，
+        # 之后的删除与更新才会作用在正确的行上
+        with self.db_m.write_locked():
+            reclaimed = self.db_m.compact()
+            seq = self.wal_m.last_seq() if self.wal_m is not None else 0
+        self.__sync(seq)
+        self.__maybe_checkpoint()
+        return reclaimed
+
+    def close(self) -> None:
+        # 修改语句返回前其日志已落盘，这里只提交尚未确认的记录并关闭文件
+        if self.wal_m is not None:
+            self.wal_m.close()
+        self.db_m.close()
+
+    def get_index_statistics(self, attribute: int) -> dict:
+        # 索引的高度、各层结点数、叶子填充率以及累计的分裂/合并/借位/比较次数
+        return self.db_m.get_index_statistics(attribute)
+
+    @staticmethod
+    def __index_label(values: list, is_leaf: bool) -> str:
+        # 每个值占一个 record 字段，过长的值截断显示，record 中的特殊字符需转义
+        fields = []
+        for i, value in enumerate(values):
+            value_str = str(value)
+            if len(value_str) > 5:
+                value_str = value_str[:5] + '...'
+            fields.append(f'<f{i}>' + re.sub(r'([{}|<>\\])', r'\\\1', value_str))
+        if not fields:
+            fields.append('<f0>')
+        if is_leaf:
+            fields.append(r'<next>Next-\>')
+        return '{' + '|'.join(fields) + '}'
+
+    def write_index_dot(self, output_path: str, attribute: int, max_depth: int = None,
+                        leaf_sample: int = None) -> None:
+        # 逐个结点把 DOT 源码写入文件，不在内存中构建整棵树的嵌套结构或图对象
+        # max_depth 限制展示的层数（根为第 0 层），leaf_sample 为最多展示的叶子数，按叶子顺序均匀抽样
+        stride = 1
+        if leaf_sample is not None:
+            leaf_count = self.db_m.get_index_statistics(attribute)['leaf_count']
+            stride = max(1, -(-leaf_count // max(1, leaf_sample)))
+        leaf_counter = 0
+        with open(output_path, 'w', encoding='utf-8') as dot:
+            dot.write('digraph {\n\tnode [shape=Mrecord]\n')
+            for node_id, parent_id, depth, is_leaf, values in self.db_m.iter_index_nodes(attribute, max_depth):
                 if is_leaf:
-                    tab_body += nohtml(r'|<next>Next-\>')
-
-                return f'''{{{tab_body}}}'''
-
-            def dfs_traverse(node: dict, father_index: int = None):
-                nonlocal nodeid2index, leaf_index, index_counter
-                nonlocal dot
-                nonlocal tree_order
-
-                # get current node index
-                current_index = 0
-                if id(node) in nodeid2index:
-                    current_index = nodeid2index[id(node)]
-                else:
-                    current_index = index_counter
-                    nodeid2index[id(node)] = current_index  # update index map
-                    index_counter += 1
-
-                # build current node and expand to children
-                if node['type'] == 'node':
-                    dot.attr('node', style='filled', fillcolor='lightblue2', color='black')
-                    dot.node(str(current_index), value_list_2htmltab(node['node_value']))
-                    for child_node in node['node_pointer']:
-                        dfs_traverse(child_node, father_index=current_index)
-                elif node['type'] == 'leaf':
-                    dot.attr('node', style='filled', fillcolor='lightyellow', color='black')
-                    dot.node(str(current_index),
-                             value_list_2htmltab(node['leaf_value'], is_leaf=True, leaf_pointer=node['leaf_pointer']))
-                    leaf_index.append(current_index)
-                else:
-                    raise Exception('InteralError: index tree data is not formatted')
-
-                # add edge to father
-                if father_index is not None:
-                    dot.edge(str(father_index), str(current_index))
-
-            # build tree
-            dfs_traverse(dat)
-
-            # # add edge to next_leaf if this node is leaf
-            # using constraint attribute will make graphviz failed to process, reason unknown
-            # for i in range(len(leaf_index)):
-            #     if i != len(leaf_index) - 1:
-            #         dot.edge(str(leaf_index[i]) + ':next', str(leaf_index[i + 1]), constraint="false")
-
-            dot.render(filename=output_path)
-
-        dat = self.db_m.get_index_structure(attribute)
-        generate_bplustree_picture(dat)
+                    leaf_counter += 1
+                    if (leaf_counter - 1) % stride:
+                        continue
+                color = 'lightyellow' if is_leaf else 'lightblue2'
+                dot.write(f'\t{node_id} [label={quote(self.__index_label(values, is_leaf))} '
+                          f'color=black fillcolor={color} style=filled]\n')
+                if parent_id is not None:
+                    dot.write(f'\t{parent_id} -> {node_id}\n')
+            dot.write('}\n')
+
+    def generate_index_picture(self, output_path: str, attribute: int, max_depth: int = None,
+                               leaf_sample: int = None) -> None:
+        # 生成 output_path（DOT 源码）与 output_path.png
+        self.write_index_dot(output_path, attribute, max_depth, leaf_sample)
+        graphviz.render('dot', 'png', output_path)
@@ -1 +1,4 @@
 from .storage_coordinator import StorageCoordinator, NotUniqueException
+from .wal import WriteAheadLog, write_checkpoint, load_checkpoint, DEFAULT_CHECKPOINT_INTERVAL
+from .rwlock import ReadWriteLock
+from .external_sort import external_sort, DEFAULT_RUN_SIZE
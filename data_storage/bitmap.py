@@ -0,0 +1,166 @@
+from typing import List, Dict, Tuple, Set, Iterable, Iterator
+import re
+
+# 每个字节中被置位的比特序号
+_BYTE_BITS = [tuple(i for i in range(8) if byte >> i & 1) for byte in range(256)]
+_FULL_WORD = (1 << 64) - 1
+_NONZERO = re.compile(b'[^\x00]')
+
+
+class Bitmap(object):
+    # 基于 bytearray 的位图，第 i 位为 1 表示 i 在集合中；按 8 字节对齐便于整字跳过
+    __slots__ = ('data', 'count')
+
+    def __init__(self, size: int = 0):
+        self.data = bytearray(((size + 63) >> 6) << 3)
+        self.count = 0
+
+    @classmethod
+    def from_iterable(cls, rows: Iterable[int], size: int = 0) -> 'Bitmap':
+        bitmap = cls(size)
+        for row in rows:
+            bitmap.add(row)
+        return bitmap
+
+    @classmethod
+    def from_int(cls, bits: int) -> 'Bitmap':
+        bitmap = cls(bits.bit_length())
+        bitmap.data[:] = bits.to_bytes(len(bitmap.data), 'little')
+        bitmap.count = bin(bits).count('1')
+        return bitmap
+
+    def to_int(self) -> int:
+        return int.from_bytes(self.data, 'little')
+
+    def capacity(self) -> int:
+        return len(self.data) << 3
+
+    def __grow(self, row: int) -> None:
+        size = max(row + 1, self.capacity() * 2)
+        self.data.extend(bytes((((size + 63) >> 6) << 3) - len(self.data)))
+
+    def add(self, row: int) -> None:
+        byte = row >> 3
+        if byte >= len(self.data):
+            self.__grow(row)
+        bit = 1 << (row & 7)
+        if not self.data[byte] & bit:
+            self.data[byte] |= bit
+            self.count += 1
+
+    def add_range(self, begin: int, end: int) -> None:
+        # 置位 [begin, end)
+        if end <= begin:
+            return
+        if (end - 1) >> 3 >= len(self.data):
+            self.__grow(end - 1)
+        mask = ((1 << (end - begin)) - 1) << begin
+        bits = self.to_int()
+        self.count += bin(mask & ~bits).count('1')
+        self.data[:] = (bits | mask).to_bytes(len(self.data), 'little')
+
+    def discard(self, row: int) -> None:
+        byte = row >> 3
+        if byte < len(self.data):
+            bit = 1 << (row & 7)
+            if self.data[byte] & bit:
+                self.data[byte] &= ~bit & 0xFF
+                self.count -= 1
+
+    def __contains__(self, row: int) -> bool:
+        byte = row >> 3
+        return 0 <= byte < len(self.data) and bool(self.data[byte] & (1 << (row & 7)))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def next_set(self, row: int) -> int:
+        # 不小于 row 的最小置位序号，没有时为 -1；跳过全 0 的字节由正则在 C 层完成
+        byte = row >> 3
+        if byte >= len(self.data):
+            return -1
+        bits = self.data[byte] >> (row & 7)
+        if bits:
+            return row + (bits & -bits).bit_length() - 1
+        match = _NONZERO.search(self.data, byte + 1)
+        if match is None:
+            return -1
+        byte = match.start()
+        bits = self.data[byte]
+        return (byte << 3) + (bits & -bits).bit_length() - 1
+
+    def prev_set(self, row: int) -> int:
+        # 不大于 row 的最大置位序号，没有时为 -1
+        if row < 0 or not self.data:
+            return -1
+        byte = row >> 3
+        if byte >= len(self.data):
+            byte = len(self.data) - 1
+            bits = self.data[byte]
+        else:
+            bits = self.data[byte] & ((2 << (row & 7)) - 1)
+        if not bits:
+            byte = len(self.data[:byte].rstrip(b'\x00')) - 1
+            if byte < 0:
+                return -1
+            bits = self.data[byte]
+        return (byte << 3) + bits.bit_length() - 1
+
+    def __iter__(self) -> Iterator[int]:
+        # 按 64 位字扫描：全 0 的字直接跳过，全 1 的字整段产出
+        if not self.count:
+            return
+        # 遍历快照：迭代期间位图仍可被修改（扩容时 bytearray 不能有未释放的 memoryview）
+        words = memoryview(bytes(self.data)).cast('Q')
+        for w, word in enumerate(words):
+            if not word:
+                continue
+            base = w << 6
+            if word == _FULL_WORD:
+                yield from range(base, base + 64)
+                continue
+            for b in range(8):
+                byte = (word >> (b << 3)) & 0xFF
+                if byte:
+                    offset = base + (b << 3)
+                    for bit in _BYTE_BITS[byte]:
+                        yield offset + bit
+
+    def __reversed__(self) -> Iterator[int]:
+        words = memoryview(bytes(self.data)).cast('Q')
+        for w in range(len(words) - 1, -1, -1):
+            word = words[w]
+            if not word:
+                continue
+            base = w << 6
+            for b in range(7, -1, -1):
+                byte = (word >> (b << 3)) & 0xFF
+                if byte:
+                    offset = base + (b << 3)
+                    for bit in reversed(_BYTE_BITS[byte]):
+                        yield offset + bit
+
+    def copy(self) -> 'Bitmap':
+        bitmap = Bitmap()
+        bitmap.data = bytearray(self.data)
+        bitmap.count = self.count
+        return bitmap
+
+    def union(self, other: 'Bitmap') -> 'Bitmap':
+        return Bitmap.from_int(self.to_int() | other.to_int())
+
+    def intersection(self, other: 'Bitmap') -> 'Bitmap':
+        return Bitmap.from_int(self.to_int() & other.to_int())
+
+    def difference(self, other: 'Bitmap') -> 'Bitmap':
+        return Bitmap.from_int(self.to_int() & ~other.to_int())
+
+    def complement(self, size: int) -> 'Bitmap':
+        # [0, size) 中未置位的行
+        return Bitmap.from_int(~self.to_int() & ((1 << size) - 1))
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Bitmap) and self.to_int() == other.to_int()
+
+    def __repr__(self) -> str:
+        return 'Bitmap(' + str(list(self)) + ')'
@@ -1,8 +1,42 @@
-from typing import List, Dict, Tuple, Set
+from typing import List, Dict, Tuple, Set, Iterable, Iterator
+from bisect import bisect_left, bisect_right
 import math
+import threading
+
+from .posting_list import PostingList
+
+DEFAULT_ORDER = 3
+DEFAULT_FILL_FACTOR = 1.0
+
+
+def iter_posting(posting) -> Iterable[int]:
+    # 叶子中每个键的倒排项：只有一行时直接存行号，多行时存压缩的有序 PostingList
+    return (posting,) if type(posting) is int else posting
+
+
+def posting_len(posting) -> int:
+    return 1 if type(posting) is int else len(posting)
+
+
+def pack_ranges(count: int, size: tuple, fill_factor: float) -> List[tuple]:
+    # 把 count 个元素切分为若干 [begin, end) 区间，除最后两个外每段 max*fill_factor 个，且每段不少于 min 个
+    minimum, maximum = size
+    per = min(maximum, max(minimum, 2, int(round(maximum * fill_factor))))
+    ranges = [[begin, min(begin + per, count)] for begin in range(0, count, per)]
+    if len(ranges) > 1 and ranges[-1][1] - ranges[-1][0] < minimum:
+        tail = ranges.pop()
+        begin = ranges[-1][0]
+        if tail[1] - begin <= maximum:  # 合并到前一段
+            ranges[-1][1] = tail[1]
+        else:  # 与前一段平分
+            ranges[-1][1] = begin + (tail[1] - begin + 1) // 2
+            ranges.append([ranges[-1][1], tail[1]])
+    return [tuple(r) for r in ranges]
 
 
 class Node(object):
+    __slots__ = ('order', 'values', 'pointers', 'right', 'left', 'parent', 'is_leaf', 'count')
+
     def __init__(self, order: int):
         self.order = order
         self.values = []
@@ -11,38 +45,75 @@ class Node(object):
         self.left = None
         self.parent = None
         self.is_leaf = False
+        self.count = 0  # 计数树中为子树内的行号总数
 
     def insert_in_leaf(self, value, pointer: int) -> None:
-        if self.values:
-            temp = self.values
-            for i in range(len(temp)):
-                if temp[i] == value:  # equal
-                    self.pointers[i].append(pointer)
-                    break
-                if value < temp[i]:  # less
-                    self.pointers.insert(i, [pointer])
-                    self.values.insert(i, value)
-                    break
-                if i + 1 == len(temp):  # biggest
-                    self.pointers.append([pointer])
-                    self.values.append(value)
-                    break
-        else:  # first couple
-            self.values.append(value)
-            self.pointers.append([pointer])
+        i = bisect_left(self.values, value)
+        if i < len(self.values) and self.values[i] == value:  # equal
+            if type(self.pointers[i]) is int:
+                self.pointers[i] = PostingList.from_sorted(sorted((self.pointers[i], pointer)))
+            else:
+                self.pointers[i].add(pointer)
+        else:  # less than values[i] or biggest
+            self.values.insert(i, value)
+            self.pointers.insert(i, pointer)
+
+    def delete_in_leaf(self, value, pointer: int) -> bool:
+        # 删除成功返回 True；键的最后一行被删除时连同键一起移除
+        i = bisect_left(self.values, value)
+        if i == len(self.values) or self.values[i] != value or pointer not in iter_posting(self.pointers[i]):
+            return False
+        if type(self.pointers[i]) is int:
+            del self.values[i]
+            del self.pointers[i]
+        else:
+            self.pointers[i].remove(pointer)
+            if len(self.pointers[i]) == 1:  # 只剩一行时退化为单个行号
+                self.pointers[i] = next(iter(self.pointers[i]))
+        return True
+
+    def delete_rows_in_leaf(self, value, pointers: List[int]) -> int:
+        # 删除同一个键的多行（pointers 升序且不重复），返回实际删除的行数
+        # 删除的行占倒排项的比例较大时做一次差集重建，否则逐行在原处删除
+        i = bisect_left(self.values, value)
+        if i == len(self.values) or self.values[i] != value:
+            return 0
+        posting = self.pointers[i]
+        if type(posting) is int or len(pointers) * 4 < len(posting):
+            return sum(self.delete_in_leaf(value, pointer) for pointer in pointers)
+        remaining = posting.difference(PostingList.from_sorted(pointers))
+        if len(remaining) == 0:
+            del self.values[i]
+            del self.pointers[i]
+        elif len(remaining) == 1:
+            self.pointers[i] = next(iter(remaining))
+        else:
+            self.pointers[i] = remaining
+        return len(posting) - len(remaining)
 
 
 class BPlusTree(object):
-    def __init__(self, name: int, order: int = 3):
+    def __init__(self, name: int, order: int = DEFAULT_ORDER, counted: bool = False):
+        if order < 3:
+            raise ValueError('order of BPlusTree must be at least 3, got ' + str(order))
         self.tree_name_m = name
+        self.counted = counted  # 计数树：每个结点维护子树行数，支持对数时间的范围计数与排名
+        # 累计的结构变化次数与估计的键比较次数（不实际计数，每次二分查找按 log2(n) 次比较估计）
+        self.counters_m = dict.fromkeys(('splits', 'merges', 'borrows', 'estimated_comparisons'), 0)
+        # 查找在共享的读锁下进行，多个线程会同时累加比较次数；修改只在独占的写锁下进行，不需要这个锁
+        self.counters_lock_m = threading.Lock()
         self.root = Node(order)
         self.root.is_leaf = True
 
     def insert(self, value, pointer: int) -> None:
         leaf = self.search(value)
+        self.counters_m['estimated_comparisons'] += len(leaf.values).bit_length()
         leaf.insert_in_leaf(value, pointer)
+        if self.counted:
+            self.__add_count(leaf, 1)
 
         if len(leaf.values) == leaf.order:  # split the leaf node according to the order
+            self.counters_m['splits'] += 1
             new_node = Node(leaf.order)
             new_node.is_leaf = True
             new_node.parent = leaf.parent
@@ -57,6 +128,9 @@ class BPlusTree(object):
                 leaf.right.left = new_node
             leaf.right = new_node
             new_node.left = leaf
+            if self.counted:
+                self.__recount(leaf)
+                self.__recount(new_node)
             # 插入维护
             self.__insert_in_parent(leaf, new_node, new_node.values[0])
 
@@ -65,106 +139,342 @@ class BPlusTree(object):
             rootNode = Node(node1.order)
             rootNode.values = [value]
             rootNode.pointers = [node1, node2]
+            rootNode.count = node1.count + node2.count
             node1.parent = rootNode
             node2.parent = rootNode
             self.root = rootNode
             return
 
         parentNode = node1.parent
-        temp = parentNode.pointers
-        for i in range(len(temp)):
-            if temp[i] == node1:
-                parentNode.values.insert(i, value)
-                parentNode.pointers.insert(i + 1, node2)
-                if len(parentNode.pointers) > parentNode.order:
-                    uncle = Node(parentNode.order)
-                    uncle.parent = parentNode.parent
-                    mid = int(math.ceil(parentNode.order / 2))
-                    uncle.values = parentNode.values[mid:]
-                    uncle.pointers = parentNode.pointers[mid:]
-                    newvalue = parentNode.values[mid - 1]
-                    if mid == 1:
-                        parentNode.values = parentNode.values[:mid]
-                    else:
-                        parentNode.values = parentNode.values[:mid - 1]
-                    parentNode.pointers = parentNode.pointers[:mid]
-                    for n in parentNode.pointers:
-                        n.parent = parentNode
-                    for n in uncle.pointers:
-                        n.parent = uncle
-                    self.__insert_in_parent(parentNode, uncle, newvalue)
-                else:
-                    break
+        i = bisect_right(parentNode.values, value)  # node2 紧跟在 node1 之后
+        parentNode.values.insert(i, value)
+        parentNode.pointers.insert(i + 1, node2)
+        if len(parentNode.pointers) > parentNode.order:
+            self.counters_m['splits'] += 1
+            uncle = Node(parentNode.order)
+            uncle.parent = parentNode.parent
+            mid = int(math.ceil(parentNode.order / 2))
+            uncle.values = parentNode.values[mid:]
+            uncle.pointers = parentNode.pointers[mid:]
+            newvalue = parentNode.values[mid - 1]
+            if mid == 1:
+                parentNode.values = parentNode.values[:mid]
+            else:
+                parentNode.values = parentNode.values[:mid - 1]
+            parentNode.pointers = parentNode.pointers[:mid]
+            for n in parentNode.pointers:
+                n.parent = parentNode
+            for n in uncle.pointers:
+                n.parent = uncle
+            if self.counted:
+                self.__recount(parentNode)
+                self.__recount(uncle)
+            self.__insert_in_parent(parentNode, uncle, newvalue)
+
+    def bulk_load(self, pairs: Iterable[tuple], fill_factor: float = DEFAULT_FILL_FACTOR) -> None:
+        # 自底向上建树：(value, pointer) 排序一次后按填充因子依次装满叶子结点和各层中间结点，替换原有内容
+        if not 0 < fill_factor <= 1:
+            raise ValueError('fill_factor must be in (0, 1], got ' + str(fill_factor))
+        order = self.root.order
+        values = []
+        pointers = []
+        for value, pointer in sorted(pairs):
+            if values and values[-1] == value:
+                pointers[-1].append(pointer)
+            else:
+                values.append(value)
+                pointers.append([pointer])
+        pointers = [p[0] if len(p) == 1 else PostingList.from_sorted(p) for p in pointers]
+
+        # 叶子结点：最多 order-1 个值，最少 ceil(order/2)-1 个值
+        leaves = []
+        leaf_size = (max(1, int(math.ceil(order / 2)) - 1), order - 1)
+        for begin, end in pack_ranges(len(values), leaf_size, fill_factor):
+            leaf = Node(order)
+            leaf.is_leaf = True
+            leaf.values = values[begin:end]
+            leaf.pointers = pointers[begin:end]
+            if self.counted:
+                self.__recount(leaf)
+            if leaves:
+                leaves[-1].right = leaf
+                leaf.left = leaves[-1]
+            leaves.append(leaf)
+        if not leaves:
+            leaves.append(Node(order))
+            leaves[0].is_leaf = True
+
+        # 中间结点：最多 order 个孩子，最少 ceil(order/2) 个孩子；每层记录子树的最小值作为分隔值
+        level = [(leaf, leaf.values[0] if leaf.values else None) for leaf in leaves]
+        node_size = (int(math.ceil(order / 2)), order)
+        while len(level) > 1:
+            upper = []
+            for begin, end in pack_ranges(len(level), node_size, fill_factor):
+                node = Node(order)
+                node.pointers = [child for child, _ in level[begin:end]]
+                node.values = [low for _, low in level[begin + 1:end]]
+                for child in node.pointers:
+                    child.parent = node
+                if self.counted:
+                    self.__recount(node)
+                upper.append((node, level[begin][1]))
+            level = upper
+        self.root = level[0][0]
+        self.root.parent = None
 
     def search(self, value) -> Node:  # get the leaf node where the value might in
         current_node = self.root
+        comparisons = 0
         while not current_node.is_leaf:
-            for i in range(len(current_node.values)):
-                if current_node.values[i] == value:
-                    current_node = current_node.pointers[i + 1]
-                    break
-                if value < current_node.values[i]:
-                    current_node = current_node.pointers[i]
-                    break
-                if i + 1 == len(current_node.values):
-                    current_node = current_node.pointers[i + 1]
-                    break
+            # values[i - 1] <= value < values[i] 时进入 pointers[i]
+            comparisons += len(current_node.values).bit_length()
+            current_node = current_node.pointers[bisect_right(current_node.values, value)]
+        with self.counters_lock_m:
+            self.counters_m['estimated_comparisons'] += comparisons
         return current_node
 
+    def cursor(self, low=None, high=None, include_low: bool = True, include_high: bool = True,
+               reverse: bool = False) -> Iterator[tuple]:
+        # 定位到区间一端后沿叶子链表惰性地产生 (value, pointers)，low/high 为 None 表示该端不设界
+        # 游标期间不能修改树，否则结果未定义
+        if not reverse:
+            if low is None:
+                leaf = self.root
+                while not leaf.is_leaf:
+                    leaf = leaf.pointers[0]
+                begin = 0
+            else:
+                leaf = self.search(low)
+                begin = (bisect_left if include_low else bisect_right)(leaf.values, low)
+            while leaf is not None:
+                end = len(leaf.values)
+                if high is not None:
+                    end = (bisect_right if include_high else bisect_left)(leaf.values, high, begin)
+                for i in range(begin, end):
+                    yield leaf.values[i], iter_posting(leaf.pointers[i])
+                if end < len(leaf.values):  # 已越过上界
+                    return
+                leaf = leaf.right
+                begin = 0
+        else:
+            if high is None:
+                leaf = self.root
+                while not leaf.is_leaf:
+                    leaf = leaf.pointers[-1]
+                end = len(leaf.values)
+            else:
+                leaf = self.search(high)
+                end = (bisect_right if include_high else bisect_left)(leaf.values, high)
+            while leaf is not None:
+                begin = 0
+                if low is not None:
+                    begin = (bisect_left if include_low else bisect_right)(leaf.values, low, 0, end)
+                for i in range(end - 1, begin - 1, -1):
+                    yield leaf.values[i], iter_posting(leaf.pointers[i])
+                if begin > 0:  # 已越过下界
+                    return
+                leaf = leaf.left
+                if leaf is not None:
+                    end = len(leaf.values)
+
+    def iter_find(self, value, op: str) -> Iterator[int]:  # lazy version of find
+        if op == "=":
+            postings = self.cursor(value, value)
+        elif op == ">":
+            postings = self.cursor(low=value, include_low=False)
+        elif op == ">=":
+            postings = self.cursor(low=value)
+        elif op == "<":
+            postings = self.cursor(high=value, include_high=False, reverse=True)
+        elif op == "<=":
+            postings = self.cursor(high=value, reverse=True)
+        else:
+            raise ValueError('unsupported operator for BPlusTree: ' + str(op))
+        for _, pointers in postings:
+            yield from pointers
+
     def find(self, value, op: str) -> list:  # get the list of pointer whose values is op(<.>,=,<=,>=) vaule
-        # global i, item
-        leaf = self.search(value)
-        addr = []
-        if not leaf.values:
-            return addr
-        for i, item in enumerate(leaf.values):
-            if value <= item:
-                break
+        return list(self.iter_find(value, op))
+
+    @staticmethod
+    def __add_count(node: Node, delta: int) -> None:
+        while node is not None:
+            node.count += delta
+            node = node.parent
+
+    @staticmethod
+    def __recount(node: Node) -> None:
+        if node.is_leaf:
+            node.count = sum(posting_len(p) for p in node.pointers)
+        else:
+            node.count = sum(child.count for child in node.pointers)
+
+    def __check_counted(self) -> None:
+        if not self.counted:
+            raise ValueError('BPlusTree ' + str(self.tree_name_m) + ' is not a counted tree')
+
+    def size(self) -> int:  # 树中行号总数
+        self.__check_counted()
+        return self.root.count
+
+    def rank(self, value, inclusive: bool = False) -> int:
+        # 键小于（inclusive 时小于等于）value 的行号个数，自根向下累加左侧子树的计数
+        self.__check_counted()
+        node = self.root
+        rank = 0
+        while not node.is_leaf:
+            i = bisect_right(node.values, value)
+            for child in node.pointers[:i]:
+                rank += child.count
+            node = node.pointers[i]
+        end = (bisect_right if inclusive else bisect_left)(node.values, value)
+        for posting in node.pointers[:end]:
+            rank += posting_len(posting)
+        return rank
+
+    def count_range(self, low=None, high=None, include_low: bool = True, include_high: bool = True) -> int:
+        # 键在 [low, high] 区间（按 include_* 决定开闭，None 表示不设界）内的行号个数
+        upper = self.size() if high is None else self.rank(high, include_high)
+        lower = 0 if low is None else self.rank(low, not include_low)
+        return max(0, upper - lower)
+
+    def count(self, value, op: str) -> int:  # find 的计数版本，不产生行号
         if op == "=":
-            if value == item:
-                addr.append(leaf.pointers[i])
-        elif ">" in op:
-            addr += leaf.pointers[i:]
-            temp = leaf.right
-            while temp is not None:
-                addr += temp.pointers
-                temp = temp.right
-            if "=" not in op and value == item:  # 大于
-                addr.pop(0)
-            elif value > item:
-                addr.pop(0)
-        elif "<" in op:
-            if "=" in op and value == item:
-                addr.append(leaf.pointers[i])
-            elif item < value:
-                addr.append(leaf.pointers[i])
-            addr += list(reversed(leaf.pointers[:i]))
-            temp = leaf.left
-            while temp is not None:
-                addr += temp.pointers[::-1]
-                temp = temp.left
-
-        addr = [sub for group in addr for sub in group]  # flatten
-        return addr
-
-    def delete(self, pointer: int, value) -> int:
+            return self.count_range(value, value)
+        elif op == ">":
+            return self.count_range(low=value, include_low=False)
+        elif op == ">=":
+            return self.count_range(low=value)
+        elif op == "<":
+            return self.count_range(high=value, include_high=False)
+        elif op == "<=":
+            return self.count_range(high=value)
+        raise ValueError('unsupported operator for BPlusTree: ' + str(op))
+
+    def kth(self, k: int):
+        # 按键排序后第 k 个（从 0 开始）行号对应的键
+        self.__check_counted()
+        if not 0 <= k < self.root.count:
+            raise IndexError('kth index out of range: ' + str(k))
+        node = self.root
+        while not node.is_leaf:
+            for child in node.pointers:
+                if k < child.count:
+                    node = child
+                    break
+                k -= child.count
+        for value, posting in zip(node.values, node.pointers):
+            if k < posting_len(posting):
+                return value
+            k -= posting_len(posting)
+
+    def delete(self, pointer: int, value) -> None:
         node = self.search(value)
+        self.counters_m['estimated_comparisons'] += len(node.values).bit_length()
+        if not node.delete_in_leaf(value, pointer):
+            return
+        if self.counted:
+            self.__add_count(node, -1)
+        self.__delete_parents(node, pointer, value)
 
-        temp = 0
-        for i, item in enumerate(node.values):
-            if item == value:
-                temp = 1
-
-                if pointer in node.pointers[i]:
-                    if len(node.pointers[i]) > 1:
-                        node.pointers[i].remove(pointer)
-                    elif node == self.root:
-                        node.values.pop(i)
-                        node.pointers.pop(i)
-                    else:
-                        del node.pointers[i]
-                        node.values.pop(i)
-                        self.__delete_parents(node, pointer, value)
+    def __search_bounded(self, value) -> tuple:
+        # 返回 value 所在叶子及该叶子的上界（路径上最近的右侧分隔值，None 表示无上界）
+        node = self.root
+        upper = None
+        while not node.is_leaf:
+            self.counters_m['estimated_comparisons'] += len(node.values).bit_length()
+            i = bisect_right(node.values, value)
+            if i < len(node.values):
+                upper = node.values[i]
+            node = node.pointers[i]
+        return node, upper
+
+    def insert_many(self, pairs: Iterable[tuple]) -> None:
+        # 按键排序后逐叶子批量插入：每个叶子只定位一次，溢出的叶子在最后统一拆分
+        pairs = sorted(pairs)
+        overflowed = []
+        i = 0
+        while i < len(pairs):
+            leaf, upper = self.__search_bounded(pairs[i][0])
+            j = i
+            while j < len(pairs) and (upper is None or pairs[j][0] < upper):
+                leaf.insert_in_leaf(pairs[j][0], pairs[j][1])
+                j += 1
+            self.counters_m['estimated_comparisons'] += (j - i) * (len(leaf.values).bit_length() + 1)
+            if self.counted:
+                self.__add_count(leaf, j - i)
+            if len(leaf.values) >= leaf.order:
+                overflowed.append(leaf)
+            i = j
+        for leaf in overflowed:
+            self.__split_leaf(leaf)
+
+    def __split_leaf(self, leaf: Node) -> None:
+        # 把超长的叶子切成若干合法叶子，新叶子从右往左依次挂到 leaf 之后
+        order = leaf.order
+        ranges = pack_ranges(len(leaf.values), (max(1, int(math.ceil(order / 2)) - 1), order - 1),
+                             DEFAULT_FILL_FACTOR)
+        self.counters_m['splits'] += len(ranges) - 1
+        values, pointers = leaf.values, leaf.pointers
+        leaf.values = values[:ranges[0][1]]
+        leaf.pointers = pointers[:ranges[0][1]]
+        for begin, end in reversed(ranges[1:]):
+            new_node = Node(order)
+            new_node.is_leaf = True
+            new_node.values = values[begin:end]
+            new_node.pointers = pointers[begin:end]
+            new_node.right = leaf.right
+            if leaf.right is not None:
+                leaf.right.left = new_node
+            leaf.right = new_node
+            new_node.left = leaf
+            new_node.parent = leaf.parent
+            if self.counted:  # leaf 的计数暂时包含尚未挂出的部分，保证祖先计数不变
+                self.__recount(new_node)
+                leaf.count -= new_node.count
+            self.__insert_in_parent(leaf, new_node, new_node.values[0])
+
+    def delete_many(self, pairs: Iterable[tuple]) -> None:
+        # 按键排序后逐叶子批量删除，同一个键的多行一次从倒排项中删除；欠载叶子的合并/借位推迟到全部删除之后统一处理
+        pairs = sorted(pairs)
+        underflowed = []
+        i = 0
+        while i < len(pairs):
+            leaf, upper = self.__search_bounded(pairs[i][0])
+            removed = 0
+            j = i
+            while j < len(pairs) and (upper is None or pairs[j][0] < upper):
+                # 同一个键的各行一起删除
+                k = j + 1
+                while k < len(pairs) and pairs[k][0] == pairs[j][0]:
+                    k += 1
+                if k - j == 1:
+                    removed += leaf.delete_in_leaf(pairs[j][0], pairs[j][1])
+                else:
+                    rows = sorted(set(pair[1] for pair in pairs[j:k]))
+                    removed += leaf.delete_rows_in_leaf(pairs[j][0], rows)
+                j = k
+            self.counters_m['estimated_comparisons'] += (j - i) * (len(leaf.values).bit_length() + 1)
+            if self.counted and removed:
+                self.__add_count(leaf, -removed)
+            if removed and self.__is_underflow(leaf):
+                underflowed.append(leaf)
+            i = j
+        for leaf in underflowed:
+            # 每次借位只移动一个键，直到叶子不再欠载或已被合并到兄弟结点
+            while self.__is_alive(leaf) and self.__is_underflow(leaf):
+                self.__delete_parents(leaf, None, None)
+
+    def __is_underflow(self, node: Node) -> bool:
+        if node == self.root:
+            return False
+        if node.is_leaf:
+            return len(node.values) < int(math.ceil(node.order / 2) - 1)
+        return len(node.pointers) < int(math.ceil(node.order / 2))
+
+    def __is_alive(self, node: Node) -> bool:
+        # 被合并掉的结点已不在父结点的孩子列表中
+        return node == self.root or (node.parent is not None and node in node.parent.pointers)
 
     def __delete_parents(self, node, pointer, value):
         if not node.is_leaf:  # not leaf,then delete the pointer and value
@@ -176,11 +486,12 @@ class BPlusTree(object):
                 if item == value:
                     node.values.pop(i)
                     break
-        if self.root == node and len(node.pointers) == 1:
-            self.root = node.pointers[0]
-            node.pointers[0].parent = None
-            del node
-            return
+        if self.root == node:
+            if len(node.pointers) == 1 and not node.is_leaf:
+                self.root = node.pointers[0]
+                node.pointers[0].parent = None
+                del node
+            return  # 根结点不受最少孩子数限制
         # 每个中间节点至少有ceil(m/2)个孩子，最多m个孩子；每个叶子节点至少都包含ceil(m/2)-1个元素
         elif (len(node.pointers) < int(math.ceil(node.order / 2)) and node.is_leaf == False) or \
                 (len(node.values) < int(math.ceil(node.order / 2) - 1) and node.is_leaf == True):
@@ -218,7 +529,8 @@ class BPlusTree(object):
                     ndash = PrevNode
                     value_ = PrevK
 
-            if len(node.values) + len(ndash.values) < node.order:  # 兄弟结点不富余：合并处理
+            if len(node.values) + len(ndash.values) < node.order - (0 if node.is_leaf else 1):  # 兄弟结点不富余：合并处理
+                self.counters_m['merges'] += 1
                 if is_predecessor == 0:
                     node, ndash = ndash, node  # ndash是node的左兄弟
                 ndash.pointers += node.pointers  # 合并两结点的pointers
@@ -229,6 +541,7 @@ class BPlusTree(object):
                     if node.right is not None:
                         node.right.left = ndash
                 ndash.values += node.values  # 合并左右兄弟的values
+                ndash.count += node.count
 
                 if not ndash.is_leaf:  # 内部结点需将新增的pointer的父结点设为自己
                     for j in ndash.pointers:
@@ -237,6 +550,7 @@ class BPlusTree(object):
                 self.__delete_parents(node.parent, node, value_)
                 del node
             else:  # 兄弟结点富余
+                self.counters_m['borrows'] += 1
                 if is_predecessor == 1:
                     if not node.is_leaf:  # 内部节点：父结点value下移，兄弟结点value上移
                         ndashpm = ndash.pointers.pop(-1)
@@ -279,6 +593,9 @@ class BPlusTree(object):
                             if item == value_:
                                 parentNode.values[i] = ndash.values[0]
                                 break
+                if self.counted:
+                    self.__recount(node)
+                    self.__recount(ndash)
                 # 把交换的结点的父结点设为当前结点
                 if not ndash.is_leaf:
                     for j in ndash.pointers:
@@ -290,27 +607,85 @@ class BPlusTree(object):
                     for j in parentNode.pointers:
                         j.parent = parentNode
 
-    def dict_structure(self, node=0):
+    def remap_pointers(self, mapping: List[int]) -> None:
+        # 沿叶子链表一次性把行号 p 改写为 mapping[p]；mapping 单调递增，倒排表无需重新排序
+        leaf = self.root
+        while not leaf.is_leaf:
+            leaf = leaf.pointers[0]
+        while leaf is not None:
+            leaf.pointers = [mapping[p] if type(p) is int else PostingList.from_sorted(mapping[r] for r in p)
+                             for p in leaf.pointers]
+            leaf = leaf.right
+
+    def statistics(self) -> dict:
+        # 不导出整棵树的结构统计：逐层计数结点，叶子只读取键的个数
+        nodes_per_level = []
+        level = [self.root]
+        while not level[0].is_leaf:
+            nodes_per_level.append(len(level))
+            level = [child for node in level for child in node.pointers]
+        nodes_per_level.append(len(level))
+        keys = sum(len(leaf.values) for leaf in level)
+        stats = {
+            'order': self.root.order,
+            'height': len(nodes_per_level),
+            'nodes_per_level': nodes_per_level,
+            'leaf_count': len(level),
+            'key_count': keys,
+            'avg_leaf_fill': keys / (len(level) * (self.root.order - 1)),
+        }
+        with self.counters_lock_m:
+            stats.update(self.counters_m)
+        return stats
+
+    def dict_structure(self, node=0) -> dict:
+        # 非递归导出：叶子沿链表从右往左构建，leaf_next_leaf 直接引用右邻叶子的字典，中间结点按层自底向上构建
         if node == 0:
             node = self.root
-        if node.is_leaf:
-            dict_set = {
+        first = node
+        while not first.is_leaf:
+            first = first.pointers[0]
+        leaf = self.root
+        while not leaf.is_leaf:
+            leaf = leaf.pointers[-1]
+        built = {}
+        next_leaf = None
+        while True:
+            next_leaf = {
                 "type": 'leaf',
                 "node_value": None,
                 "node_pointer": None,
-                'leaf_value': node.values,
-                'leaf_pointer': node.pointers,
-                'leaf_next_leaf': self.dict_structure(node.right) if node.right is not None else None
+                'leaf_value': leaf.values,
+                'leaf_pointer': [list(iter_posting(p)) for p in leaf.pointers],
+                'leaf_next_leaf': next_leaf
             }
+            built[id(leaf)] = next_leaf
+            if leaf is first:
+                break
+            leaf = leaf.left
 
-        else:
-            dict_set = {
+        internal = [node] if not node.is_leaf else []
+        for current in internal:
+            internal.extend(child for child in current.pointers if not child.is_leaf)
+        for current in reversed(internal):
+            built[id(current)] = {
                 "type": 'node',
-                "node_value": node.values,
-                "node_pointer": [self.dict_structure(n) for n in node.pointers],
+                "node_value": current.values,
+                "node_pointer": [built[id(child)] for child in current.pointers],
                 'leaf_value': None,
                 'leaf_pointer': None,
                 'leaf_next_leaf': None
             }
+        return built[id(node)]
 
-        return dict_set
+    def iter_nodes(self, max_depth: int = None) -> Iterator[tuple]:
+        # 先序深度优先遍历，逐个产生 (node_id, parent_id, depth, is_leaf, values)，结点编号按产生顺序递增
+        # max_depth 限制遍历深度（根为第 0 层），超出的子树不再展开
+        stack = [(self.root, None, 0)]
+        node_id = 0
+        while stack:
+            node, parent_id, depth = stack.pop()
+            yield node_id, parent_id, depth, node.is_leaf, node.values
+            if not node.is_leaf and (max_depth is None or depth < max_depth):
+                stack.extend((child, node_id, depth + 1) for child in reversed(node.pointers))
+            node_id += 1
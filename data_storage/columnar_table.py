@@ -0,0 +1,202 @@
+from typing import List, Dict, Tuple, Set, Iterable, Iterator
+import operator
+import re
+
+try:
+    import numpy
+except ImportError:  # numpy 为可选依赖，只有列存表需要
+    numpy = None
+
+# 表定义中的类型 -> 列数组的 dtype；其余类型（如 str）使用字典编码
+_NUMERIC_DTYPES = {'int': 'int64', 'float': 'float64', 'bool': 'bool'}
+_OPERATORS = {"=": operator.eq, "<>": operator.ne, ">": operator.gt, "<": operator.lt,
+              ">=": operator.ge, "<=": operator.le}
+_INITIAL_CAPACITY = 64
+
+
+def _grow(array, capacity: int):
+    grown = numpy.zeros(capacity, dtype=array.dtype) if array.dtype != object \
+        else numpy.empty(capacity, dtype=object)
+    grown[:len(array)] = array
+    return grown
+
+
+class _NumericColumn(object):
+    # 数值列：定长数组 + 空值掩码；写入超出 dtype 的值时整列退化为 object 数组
+    __slots__ = ('data', 'null')
+
+    def __init__(self, dtype: str, capacity: int):
+        self.data = numpy.zeros(capacity, dtype=dtype)
+        self.null = numpy.zeros(capacity, dtype=bool)
+
+    def grow(self, capacity: int) -> None:
+        self.data = _grow(self.data, capacity)
+        self.null = _grow(self.null, capacity)
+
+    def set(self, sub: int, value) -> None:
+        self.null[sub] = value is None
+        if value is None:
+            return
+        if self.data.dtype != object:
+            try:
+                self.data[sub] = value
+                if self.data[sub] == value or value != value:  # 写入后值不变（NaN 除外）才保留 dtype
+                    return
+            except (OverflowError, ValueError, TypeError):
+                pass
+            self.data = self.data.astype(object)
+        self.data[sub] = value
+
+    def take(self, rows) -> None:
+        self.data = self.data[rows]
+        self.null = self.null[rows]
+
+    def get(self, sub: int):
+        if self.null[sub]:
+            return None
+        value = self.data[sub]
+        return value.item() if isinstance(value, numpy.generic) else value
+
+    def mask(self, compare: str, value, length: int):
+        data = self.data[:length]
+        null = self.null[:length]
+        if compare.upper() == "LIKE" or data.dtype == object:  # 无法向量化，逐个比较
+            return numpy.fromiter((self.__match(compare, value, self.get(i)) for i in range(length)),
+                                  dtype=bool, count=length)
+        if value is None or not isinstance(value, (int, float)):
+            if compare not in ("=", "<>"):  # 与逐行比较一致：不可比较的类型直接报错
+                raise TypeError("'" + compare + "' not supported between column of " + str(data.dtype) +
+                                " and " + type(value).__name__)
+            matched = numpy.zeros(length, dtype=bool) if value is not None else null.copy()
+            return ~matched if compare == "<>" else matched
+        matched = _OPERATORS[compare](data, value)
+        # 空值只满足 <>，与逐行比较 value != None 的结果一致
+        return (matched | null) if compare == "<>" else (matched & ~null)
+
+    @staticmethod
+    def __match(compare: str, value, item) -> bool:
+        if compare.upper() == "LIKE":
+            return bool(re.match(re.sub(r'%', '.*', value), item))
+        if item is None and compare not in ("=", "<>"):
+            return False
+        return bool(_OPERATORS[compare](item, value))
+
+
+class _DictionaryColumn(object):
+    # 字典编码列：每行存放值在字典中的编号（-1 表示空值），比较先在字典上求值再按编号查表
+    __slots__ = ('codes', 'dictionary', 'lookup')
+
+    def __init__(self, capacity: int):
+        self.codes = numpy.full(capacity, -1, dtype='int32')
+        self.dictionary = []
+        self.lookup = {}
+
+    def grow(self, capacity: int) -> None:
+        codes = numpy.full(capacity, -1, dtype='int32')
+        codes[:len(self.codes)] = self.codes
+        self.codes = codes
+
+    def set(self, sub: int, value) -> None:
+        if value is None:
+            self.codes[sub] = -1
+            return
+        code = self.lookup.get(value)
+        if code is None:
+            code = len(self.dictionary)
+            self.dictionary.append(value)
+            self.lookup[value] = code
+        self.codes[sub] = code
+
+    def take(self, rows) -> None:
+        self.codes = self.codes[rows]
+
+    def get(self, sub: int):
+        code = self.codes[sub]
+        return self.dictionary[code] if code >= 0 else None
+
+    def mask(self, compare: str, value, length: int):
+        if compare.upper() == "LIKE":
+            p = re.compile(re.sub(r'%', '.*', value))
+            table = [bool(p.match(item)) for item in self.dictionary]
+            null_result = False
+        elif compare == "=" and value in self.lookup:  # 等值只需比较编号
+            return self.codes[:length] == self.lookup[value]
+        else:
+            op = _OPERATORS[compare]
+            table = [bool(op(item, value)) for item in self.dictionary]
+            null_result = compare == "<>" or (compare == "=" and value is None)
+        # 查找表最后一项对应编号 -1（空值）
+        table.append(null_result)
+        return numpy.array(table, dtype=bool)[self.codes[:length]]
+
+
+class ColumnarDataTable(object):
+    # 按列存放的数据表：数值列为 numpy 数组，字符串列为字典编码数组；无索引的比较以向量化掩码求值
+    def __init__(self, table_definition: dict):
+        if numpy is None:
+            raise ImportError('[ColumnarDataTable] numpy is required for the columnar table layout')
+        self.table_name_m = "test"
+        self.capacity_m = _INITIAL_CAPACITY
+        self.length_m = 0
+        self.alive_m = numpy.zeros(self.capacity_m, dtype=bool)
+        self.columns_m = []
+        for i in sorted(table_definition):
+            dtype = _NUMERIC_DTYPES.get(table_definition[i]["type"])
+            if dtype is not None:
+                self.columns_m.append(_NumericColumn(dtype, self.capacity_m))
+            elif table_definition[i]["type"] == "str":
+                self.columns_m.append(_DictionaryColumn(self.capacity_m))
+            else:
+                self.columns_m.append(_NumericColumn(object, self.capacity_m))
+
+    def __reserve(self, length: int) -> None:
+        if length <= self.capacity_m:
+            return
+        self.capacity_m = max(length, self.capacity_m * 2)
+        self.alive_m = _grow(self.alive_m, self.capacity_m)
+        for column in self.columns_m:
+            column.grow(self.capacity_m)
+
+    def insert(self, sub: int, record: tuple) -> None:
+        if sub >= self.length_m:
+            self.__reserve(sub + 1)
+            self.length_m = sub + 1
+        for column, value in zip(self.columns_m, record):
+            column.set(sub, value)
+        self.alive_m[sub] = True
+
+    def delete(self, sub: int) -> None:
+        self.alive_m[sub] = False
+
+    def update(self, sub: int, attribute_index: int, value) -> None:
+        self.columns_m[attribute_index].set(sub, value)
+
+    def compact(self, rows: List[int]) -> None:
+        # 只保留 rows 中的行并按顺序重新编号，各列数组按新长度重新分配
+        rows = numpy.asarray(rows, dtype='int64')
+        for column in self.columns_m:
+            column.take(rows)
+        self.capacity_m = len(rows)
+        self.length_m = len(rows)
+        self.alive_m = numpy.ones(len(rows), dtype=bool)
+        self.__reserve(_INITIAL_CAPACITY)
+
+    def length(self) -> int:
+        return self.length_m
+
+    def get_row(self, sub: int) -> tuple:
+        if not self.alive_m[sub]:
+            return None
+        return tuple(column.get(sub) for column in self.columns_m)
+
+    def get_value(self, sub: int, attribute_index: int):
+        return self.columns_m[attribute_index].get(sub)
+
+    def get_record(self) -> List[list]:
+        # 兼容行存表的接口，需要逐行物化
+        return [list(row) if row is not None else None for row in map(self.get_row, range(self.length_m))]
+
+    def scan(self, attribute_index: int, compare: str, value, rows: Iterable[int] = None) -> List[int]:
+        # 整列求掩码后与存活掩码相与；存活行由表自身维护，rows 参数仅为与行存表接口一致
+        mask = self.columns_m[attribute_index].mask(compare, value, self.length_m)
+        return numpy.flatnonzero(mask & self.alive_m[:self.length_m]).tolist()
@@ -1,4 +1,5 @@
-from typing import List, Dict, Tuple, Set
+from typing import List, Dict, Tuple, Set, Iterable, Iterator
+import re
 
 
 class DataTable(object):
@@ -20,3 +21,45 @@ class DataTable(object):
 
     def get_record(self) -> List[list]:
         return self.record_m
+
+    def compact(self, rows: List[int]) -> None:
+        # 只保留 rows 中的行并按顺序重新编号
+        self.record_m = [self.record_m[i] for i in rows]
+
+    def length(self) -> int:  # 行槽位数（包括已删除的空行）
+        return len(self.record_m)
+
+    def get_row(self, sub: int) -> tuple:
+        return tuple(self.record_m[sub]) if self.record_m[sub] is not None else None
+
+    def get_value(self, sub: int, attribute_index: int):
+        return self.record_m[sub][attribute_index]
+
+    def scan(self, attribute_index: int, compare: str, value, rows: Iterable[int]) -> Iterator[int]:
+        # 在候选行 rows（存活行）中逐行比较，产生满足条件的行号
+        record = self.record_m
+        if compare.upper() == "LIKE":
+            p = re.compile(re.sub(r'%', '.*', value))
+            for index in rows:
+                if p.match(record[index][attribute_index]):
+                    yield index
+            return
+        for index in rows:
+            if compare == "=":
+                if value == record[index][attribute_index]:
+                    yield index  # 若满足条件则取其行号
+            elif compare == ">":
+                if record[index][attribute_index] > value:
+                    yield index  # 若满足条件则取其行号
+            elif compare == "<":
+                if record[index][attribute_index] < value:
+                    yield index  # 若满足条件则取其行号
+            elif compare == "<>":
+                if value != record[index][attribute_index]:
+                    yield index  # 若满足条件则取其行号
+            elif compare == ">=":
+                if record[index][attribute_index] >= value:
+                    yield index  # 若满足条件则取其行号
+            elif compare == "<=":
+                if record[index][attribute_index] <= value:
+                    yield index  # 若满足条件则取其行号
@@ -0,0 +1,49 @@
+from typing import List, Dict, Tuple, Set, Iterable, Iterator
+from itertools import islice
+import heapq
+import pickle
+import tempfile
+
+DEFAULT_RUN_SIZE = 100000  # 外部排序时每个有序段在内存中排序的元素数
+_BLOCK_SIZE = 1024  # 有序段文件中每次序列化的元素数，归并时每段只在内存中保留一块
+
+
+def _write_run(items: List, temp_dir: str = None):
+    run = tempfile.TemporaryFile(dir=temp_dir)
+    for begin in range(0, len(items), _BLOCK_SIZE):
+        pickle.dump(items[begin:begin + _BLOCK_SIZE], run, pickle.HIGHEST_PROTOCOL)
+    run.seek(0)
+    return run
+
+
+def _read_run(run) -> Iterator:
+    while True:
+        try:
+            block = pickle.load(run)
+        except EOFError:
+            return
+        yield from block
+
+
+def external_sort(items: Iterable, reverse: bool = False, run_size: int = DEFAULT_RUN_SIZE,
+                  temp_dir: str = None) -> Iterator:
+    # 惰性地产生排好序的 items（元素按自身大小比较，需能被 pickle）：每 run_size 个元素在内存中排序后写入临时文件，
+    # 最后多路归并各有序段；元素不超过 run_size 时不写文件。临时文件在迭代结束或生成器被关闭时删除
+    items = iter(items)
+    first = sorted(islice(items, run_size), reverse=reverse)
+    if len(first) < run_size:
+        yield from first
+        return
+    runs = []
+    try:
+        runs.append(_write_run(first, temp_dir))
+        del first
+        while True:
+            chunk = sorted(islice(items, run_size), reverse=reverse)
+            if not chunk:
+                break
+            runs.append(_write_run(chunk, temp_dir))
+        yield from heapq.merge(*(_read_run(run) for run in runs), reverse=reverse)
+    finally:
+        for run in runs:
+            run.close()
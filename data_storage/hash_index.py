@@ -0,0 +1,32 @@
+from typing import List, Dict, Tuple, Set, Iterable
+
+
+class UniqueHashIndex(object):
+    # 唯一但未建B+树索引的列：值 -> 行号，唯一性检查与等值定位都是常数时间
+    def __init__(self, name: int):
+        self.index_name_m = name
+        self.map_m = {}
+
+    def insert(self, value, pointer: int) -> None:
+        self.map_m[value] = pointer
+
+    def delete(self, pointer: int, value) -> None:
+        if self.map_m.get(value) == pointer:
+            del self.map_m[value]
+
+    def bulk_load(self, pairs: Iterable[tuple]) -> None:
+        self.map_m = {value: pointer for value, pointer in pairs}
+
+    def remap_pointers(self, mapping: List[int]) -> None:
+        self.map_m = {value: mapping[pointer] for value, pointer in self.map_m.items()}
+
+    def find(self, value, op: str = "=") -> List[int]:
+        if op != "=":
+            raise ValueError('unsupported operator for UniqueHashIndex: ' + str(op))
+        return [self.map_m[value]] if value in self.map_m else []
+
+    def __contains__(self, value) -> bool:
+        return value in self.map_m
+
+    def __len__(self) -> int:
+        return len(self.map_m)
@@ -0,0 +1,150 @@
+from typing import List, Dict, Tuple, Set, Iterable, Iterator
+import marshal
+import operator
+import os
+import re
+import struct
+
+from .paged_bplus_tree import Pager, MARSHAL_VERSION, DEFAULT_PAGE_SIZE
+
+TABLE_MAGIC = b'MmapDataTable/1\x00'
+# 行目录文件：文件头 (magic, 列数, 行槽位数, 堆文件已用字节数)，之后每个行槽位一个定长目录项 (偏移, 长度)
+_HEADER = struct.Struct('<16sQQQ')
+_ENTRY = struct.Struct('<QI')
+_OPERATORS = {"=": operator.eq, "<>": operator.ne, ">": operator.gt, "<": operator.lt,
+              ">=": operator.ge, "<=": operator.le}
+
+
+class MmapDataTable(object):
+    # 存放在内存映射文件中的数据表：堆文件 path 顺序存放 marshal 编码的行，行目录 path.dir 按行号定长寻址
+    # 打开已有文件时只读文件头，行在被访问时才解码；目录项长度为 0 表示该行已删除
+    def __init__(self, table_definition: dict, path: str):
+        self.table_name_m = "test"
+        self.path_m = path
+        self.columns_m = len(table_definition)
+        self.__open()
+
+    def __open(self) -> None:
+        self.heap_m = Pager(self.path_m, DEFAULT_PAGE_SIZE)
+        self.directory_m = Pager(self.path_m + '.dir', DEFAULT_PAGE_SIZE)
+        if self.directory_m.is_new_m:
+            self.length_m = 0
+            self.heap_end_m = 0
+            self.__write_header()
+            return
+        magic, columns, self.length_m, self.heap_end_m = _HEADER.unpack_from(self.directory_m.mmap_m, 0)
+        if magic != TABLE_MAGIC or columns != self.columns_m:
+            raise ValueError('table file ' + self.path_m + ' does not match the table definition')
+
+    def __write_header(self) -> None:
+        _HEADER.pack_into(self.directory_m.mmap_m, 0, TABLE_MAGIC, self.columns_m, self.length_m, self.heap_end_m)
+
+    @staticmethod
+    def __reserve(pager: Pager, nbytes: int) -> None:
+        pager.ensure(-(-nbytes // pager.page_size_m))
+
+    def __entry(self, sub: int) -> tuple:
+        return _ENTRY.unpack_from(self.directory_m.mmap_m, _HEADER.size + sub * _ENTRY.size)
+
+    def __set_entry(self, sub: int, offset: int, size: int) -> None:
+        self.__reserve(self.directory_m, _HEADER.size + (sub + 1) * _ENTRY.size)
+        _ENTRY.pack_into(self.directory_m.mmap_m, _HEADER.size + sub * _ENTRY.size, offset, size)
+
+    def __write_row(self, sub: int, record: tuple) -> None:
+        data = marshal.dumps(tuple(record), MARSHAL_VERSION)
+        offset, size = self.__entry(sub) if sub < self.length_m else (0, 0)
+        if not 0 < len(data) <= size:  # 原位置放不下时追加到堆尾，旧空间由 compact 回收
+            offset = self.heap_end_m
+            self.heap_end_m += len(data)
+            self.__reserve(self.heap_m, self.heap_end_m)
+        self.heap_m.mmap_m[offset:offset + len(data)] = data
+        self.__set_entry(sub, offset, len(data))
+
+    def __read_row(self, sub: int) -> tuple:
+        offset, size = self.__entry(sub)
+        if size == 0:
+            return None
+        return marshal.loads(self.heap_m.mmap_m[offset:offset + size])
+
+    def insert(self, sub: int, record: tuple) -> None:
+        self.__write_row(sub, record)
+        if sub >= self.length_m:
+            for i in range(self.length_m, sub):  # 中间跳过的行槽位视为已删除
+                self.__set_entry(i, 0, 0)
+            self.length_m = sub + 1
+        self.__write_header()
+
+    def delete(self, sub: int) -> None:
+        offset, _ = self.__entry(sub)
+        self.__set_entry(sub, offset, 0)
+
+    def update(self, sub: int, attribute_index: int, value) -> None:
+        record = list(self.__read_row(sub))
+        record[attribute_index] = value
+        self.__write_row(sub, record)
+        self.__write_header()
+
+    def compact(self, rows: List[int]) -> None:
+        # 只保留 rows 中的行并按顺序重新编号：写出新的堆文件与行目录后替换原文件
+        old_heap, old_directory = self.heap_m, self.directory_m
+        entries = [self.__entry(i) for i in rows]
+        for suffix in ('', '.dir'):
+            if os.path.exists(self.path_m + '.tmp' + suffix):
+                os.remove(self.path_m + '.tmp' + suffix)
+        heap = Pager(self.path_m + '.tmp', DEFAULT_PAGE_SIZE)
+        directory = Pager(self.path_m + '.tmp.dir', DEFAULT_PAGE_SIZE)
+        self.__reserve(heap, sum(size for _, size in entries))
+        self.__reserve(directory, _HEADER.size + len(entries) * _ENTRY.size)
+        heap_end = 0
+        for sub, (offset, size) in enumerate(entries):
+            heap.mmap_m[heap_end:heap_end + size] = old_heap.mmap_m[offset:offset + size]
+            _ENTRY.pack_into(directory.mmap_m, _HEADER.size + sub * _ENTRY.size, heap_end, size)
+            heap_end += size
+        _HEADER.pack_into(directory.mmap_m, 0, TABLE_MAGIC, self.columns_m, len(entries), heap_end)
+        for pager in (heap, directory, old_heap, old_directory):
+            pager.close()
+        os.replace(self.path_m + '.tmp', self.path_m)
+        os.replace(self.path_m + '.tmp.dir', self.path_m + '.dir')
+        self.__open()
+
+    def length(self) -> int:  # 行槽位数（包括已删除的空行）
+        return self.length_m
+
+    def live_rows(self) -> Iterator[int]:
+        # 只读行目录即可得到存活行，不解码任何行
+        for sub in range(self.length_m):
+            if self.__entry(sub)[1]:
+                yield sub
+
+    def get_row(self, sub: int) -> tuple:
+        return self.__read_row(sub)
+
+    def get_value(self, sub: int, attribute_index: int):
+        return self.__read_row(sub)[attribute_index]
+
+    def get_record(self) -> List[list]:
+        # 兼容行存表的接口，需要逐行解码
+        return [list(row) if row is not None else None for row in map(self.__read_row, range(self.length_m))]
+
+    def scan(self, attribute_index: int, compare: str, value, rows: Iterable[int]) -> Iterator[int]:
+        # 在候选行 rows（存活行）中逐行解码比较，比较语义与 DataTable.scan 相同
+        if compare.upper() == "LIKE":
+            p = re.compile(re.sub(r'%', '.*', value))
+            for index in rows:
+                if p.match(self.__read_row(index)[attribute_index]):
+                    yield index
+            return
+        op = _OPERATORS[compare]
+        for index in rows:
+            if op(self.__read_row(index)[attribute_index], value):
+                yield index
+
+    def flush(self) -> None:
+        self.__write_header()
+        self.heap_m.flush()
+        self.directory_m.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self.heap_m.close()
+        self.directory_m.close()
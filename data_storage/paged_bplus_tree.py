@@ -0,0 +1,535 @@
+from typing import List, Dict, Tuple, Set, Iterable, Iterator
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from itertools import groupby
+import marshal
+import mmap
+import os
+import struct
+import threading
+
+from .bplus_tree import DEFAULT_FILL_FACTOR
+
+DEFAULT_PAGE_SIZE = 4096
+DEFAULT_PAGE_ORDER = 128
+DEFAULT_POOL_SIZE = 256
+
+# marshal 第 2 版不使用对象引用，序列化长度可以按元素累加
+MARSHAL_VERSION = 2
+PAGE_MAGIC = 'PagedBPlusTree/1'
+_LENGTH = struct.Struct('<I')  # 每页开头记录页内数据长度
+_NO_PAGE = 0  # 第 0 页是元数据页，链接指向 0 表示没有兄弟结点
+_MAX_ROW = float('inf')  # (value, _MAX_ROW) 大于所有 (value, rowid)
+
+
+def entry_size(item) -> int:
+    return len(marshal.dumps(item, MARSHAL_VERSION))
+
+
+EMPTY_NODE_SIZE = entry_size((True, [], [], _NO_PAGE, _NO_PAGE))
+CHILD_SIZE = entry_size(_NO_PAGE)
+
+
+class PageNode(object):
+    # 一个页对应一个结点：叶子的键为 (value, rowid)，重复值展开为多个键，因此不需要倒排表
+    # 中间结点的 children 为孩子页号；叶子用 left/right 页号串成双向链表
+    __slots__ = ('page_id', 'is_leaf', 'keys', 'children', 'left', 'right', 'nbytes')
+
+    def __init__(self, page_id: int, is_leaf: bool):
+        self.page_id = page_id
+        self.is_leaf = is_leaf
+        self.keys = []
+        self.children = []
+        self.left = _NO_PAGE
+        self.right = _NO_PAGE
+        self.nbytes = EMPTY_NODE_SIZE  # 序列化后的字节数，随键的增删累加维护
+
+    def measure(self) -> int:
+        # 与插入、删除时累加维护的估计值一致，而不是 marshal 的实际长度，否则加载前后的溢出判断不同
+        return EMPTY_NODE_SIZE + sum(map(entry_size, self.keys)) + CHILD_SIZE * len(self.children)
+
+    def dump(self) -> bytes:
+        return marshal.dumps((self.is_leaf, self.keys, self.children, self.left, self.right), MARSHAL_VERSION)
+
+    @classmethod
+    def load(cls, page_id: int, data: bytes) -> 'PageNode':
+        is_leaf, keys, children, left, right = marshal.loads(data)
+        node = cls(page_id, is_leaf)
+        node.keys = keys
+        node.children = children
+        node.left = left
+        node.right = right
+        node.nbytes = node.measure()
+        return node
+
+
+class PageOverflowException(Exception):
+    def __init__(self, err: str):
+        Exception.__init__(self, '[PageOverflowException]' + err)
+
+
+class Pager(object):
+    # 定长页组成的内存映射文件，文件按页数翻倍增长
+    def __init__(self, path: str, page_size: int):
+        self.path_m = path
+        self.page_size_m = page_size
+        exists = os.path.exists(path) and os.path.getsize(path) >= page_size
+        self.file_m = open(path, 'r+b' if exists else 'w+b')
+        if not exists:
+            self.file_m.truncate(page_size)
+        self.mmap_m = mmap.mmap(self.file_m.fileno(), 0)
+        self.is_new_m = not exists
+
+    def capacity(self) -> int:
+        return len(self.mmap_m) // self.page_size_m
+
+    def ensure(self, page_count: int) -> None:
+        if page_count <= self.capacity():
+            return
+        size = max(page_count, self.capacity() * 2) * self.page_size_m
+        self.mmap_m.close()
+        self.file_m.truncate(size)
+        self.mmap_m = mmap.mmap(self.file_m.fileno(), 0)
+
+    def read(self, page_id: int) -> bytes:
+        offset = page_id * self.page_size_m
+        length, = _LENGTH.unpack_from(self.mmap_m, offset)
+        return self.mmap_m[offset + _LENGTH.size:offset + _LENGTH.size + length]
+
+    def write(self, page_id: int, data: bytes) -> None:
+        if len(data) + _LENGTH.size > self.page_size_m:
+            raise PageOverflowException('page ' + str(page_id) + ' needs ' + str(len(data)) + ' bytes')
+        self.ensure(page_id + 1)
+        offset = page_id * self.page_size_m
+        _LENGTH.pack_into(self.mmap_m, offset, len(data))
+        self.mmap_m[offset + _LENGTH.size:offset + _LENGTH.size + len(data)] = data
+
+    def flush(self) -> None:
+        self.mmap_m.flush()
+
+    def close(self) -> None:
+        self.mmap_m.flush()
+        self.mmap_m.close()
+        self.file_m.close()
+
+
+class BufferPool(object):
+    # 有界的 LRU 页缓存：淘汰脏页时写回页文件
+    # 修改结点后必须调用 put，被淘汰但仍被调用方持有的结点会因此重新入池
+    # 并发的只读查询也会调整 LRU 顺序、载入与淘汰页，因此各操作由互斥锁保护
+    def __init__(self, pager: Pager, capacity: int):
+        if capacity < 8:
+            raise ValueError('buffer pool needs at least 8 pages, got ' + str(capacity))
+        self.pager_m = pager
+        self.capacity_m = capacity
+        self.pages_m = OrderedDict()
+        self.dirty_m = set()
+        self.lock_m = threading.Lock()
+
+    def get(self, page_id: int) -> PageNode:
+        with self.lock_m:
+            node = self.pages_m.get(page_id)
+            if node is None:
+                node = PageNode.load(page_id, self.pager_m.read(page_id))
+                self.pages_m[page_id] = node
+                self.__evict()
+            else:
+                self.pages_m.move_to_end(page_id)
+            return node
+
+    def put(self, node: PageNode) -> None:
+        with self.lock_m:
+            self.pages_m[node.page_id] = node
+            self.pages_m.move_to_end(node.page_id)
+            self.dirty_m.add(node.page_id)
+            self.__evict()
+
+    def __evict(self) -> None:
+        while len(self.pages_m) > self.capacity_m:
+            page_id, node = self.pages_m.popitem(last=False)
+            if page_id in self.dirty_m:
+                self.pager_m.write(page_id, node.dump())
+                self.dirty_m.discard(page_id)
+
+    def flush(self) -> None:
+        with self.lock_m:
+            for page_id in sorted(self.dirty_m):
+                self.pager_m.write(page_id, self.pages_m[page_id].dump())
+            self.dirty_m.clear()
+
+    def clear(self) -> None:
+        # 丢弃所有缓存页（包括脏页），用于整体重建
+        with self.lock_m:
+            self.pages_m.clear()
+            self.dirty_m.clear()
+
+
+class PagedBPlusTree(object):
+    # 基于页文件的B+树，接口与 BPlusTree 一致；删除时不做合并，空叶子留在链表中，由 bulk_load 重建时回收
+    def __init__(self, name: int, path: str, order: int = DEFAULT_PAGE_ORDER, page_size: int = DEFAULT_PAGE_SIZE,
+                 pool_size: int = DEFAULT_POOL_SIZE):
+        if order < 3:
+            raise ValueError('order of PagedBPlusTree must be at least 3, got ' + str(order))
+        self.tree_name_m = name
+        self.counted = False
+        self.pager_m = Pager(path, page_size)
+        self.pool_m = BufferPool(self.pager_m, pool_size)
+        self.order = order
+        # 与 BPlusTree 相同的累计计数；页文件树删除时不合并，merges/borrows 恒为 0
+        self.counters_m = dict.fromkeys(('splits', 'merges', 'borrows', 'estimated_comparisons'), 0)
+        self.counters_lock_m = threading.Lock()  # 与 BPlusTree 相同，读锁下的查找也会累加比较次数
+        if self.pager_m.is_new_m:
+            self.page_count_m = 1
+            self.root_m = self.__new_node(True).page_id
+            self.flush()
+        else:  # 已有页文件：阶数等以文件中的元数据为准
+            magic, stored_page_size, self.order, self.root_m, self.page_count_m = \
+                marshal.loads(self.pager_m.read(0))
+            if magic != PAGE_MAGIC or stored_page_size != page_size:
+                raise ValueError('page file ' + path + ' does not match page size ' + str(page_size))
+        # 单个键最多占页的四分之一，保证按字节对半拆分后两半都能放进一页
+        self.max_entry_m = (page_size - _LENGTH.size - EMPTY_NODE_SIZE) // 4
+
+    def __new_node(self, is_leaf: bool) -> PageNode:
+        node = PageNode(self.page_count_m, is_leaf)
+        self.page_count_m += 1
+        self.pool_m.put(node)
+        return node
+
+    def __page_capacity(self) -> int:
+        return self.pager_m.page_size_m - _LENGTH.size
+
+    def flush(self) -> None:
+        self.pool_m.flush()
+        self.pager_m.write(0, marshal.dumps((PAGE_MAGIC, self.pager_m.page_size_m, self.order, self.root_m,
+                                             self.page_count_m), MARSHAL_VERSION))
+        self.pager_m.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self.pager_m.close()
+
+    def __descend(self, key, path: list = None) -> PageNode:
+        node = self.pool_m.get(self.root_m)
+        comparisons = 0
+        while not node.is_leaf:
+            if path is not None:
+                path.append(node)
+            comparisons += len(node.keys).bit_length()
+            node = self.pool_m.get(node.children[bisect_right(node.keys, key)])
+        with self.counters_lock_m:
+            self.counters_m['estimated_comparisons'] += comparisons + len(node.keys).bit_length()
+        return node
+
+    def __overflow(self, node: PageNode) -> bool:
+        if node.nbytes > self.__page_capacity():
+            return True
+        return len(node.children) > self.order if not node.is_leaf else len(node.keys) > self.order - 1
+
+    def insert(self, value, pointer: int) -> None:
+        key = (value, pointer)
+        size = entry_size(key)
+        if size > self.max_entry_m:
+            raise PageOverflowException('key ' + repr(value) + ' is too large for a page')
+        path = []
+        leaf = self.__descend(key, path)
+        i = bisect_left(leaf.keys, key)
+        if i < len(leaf.keys) and leaf.keys[i] == key:
+            return
+        leaf.keys.insert(i, key)
+        leaf.nbytes += size
+        self.pool_m.put(leaf)
+        node = leaf
+        while self.__overflow(node):
+            sibling, separator = self.__split(node)
+            if not path:  # 根结点分裂，树增高一层
+                root = self.__new_node(False)
+                root.keys = [separator]
+                root.children = [node.page_id, sibling.page_id]
+                root.nbytes += entry_size(separator) + 2 * CHILD_SIZE
+                self.pool_m.put(root)
+                self.root_m = root.page_id
+                return
+            parent = path.pop()
+            # 按孩子页号定位：分隔键可能与父结点中已有的键相等，按键二分会落到错误的槽位
+            i = parent.children.index(node.page_id)
+            parent.keys.insert(i, separator)
+            parent.children.insert(i + 1, sibling.page_id)
+            parent.nbytes += entry_size(separator) + CHILD_SIZE
+            self.pool_m.put(parent)
+            node = parent
+
+    def __split(self, node: PageNode) -> tuple:
+        # 按字节数对半拆分，返回新的右兄弟和上推的分隔键
+        self.counters_m['splits'] += 1
+        sizes = [entry_size(key) for key in node.keys]
+        half = sum(sizes) // 2
+        mid = 0
+        acc = 0
+        while mid < len(sizes) - 1 and acc + sizes[mid] <= half:
+            acc += sizes[mid]
+            mid += 1
+        mid = max(mid, 1)
+        sibling = self.__new_node(node.is_leaf)
+        if node.is_leaf:
+            sibling.keys = node.keys[mid:]
+            node.keys = node.keys[:mid]
+            separator = sibling.keys[0]
+            sibling.right = node.right
+            sibling.left = node.page_id
+            if node.right != _NO_PAGE:
+                right = self.pool_m.get(node.right)
+                right.left = sibling.page_id
+                self.pool_m.put(right)
+            node.right = sibling.page_id
+        else:
+            separator = node.keys[mid]
+            sibling.keys = node.keys[mid + 1:]
+            sibling.children = node.children[mid + 1:]
+            node.keys = node.keys[:mid]
+            node.children = node.children[:mid + 1]
+        for n in (node, sibling):
+            n.nbytes = n.measure()
+        self.pool_m.put(node)
+        self.pool_m.put(sibling)
+        return sibling, separator
+
+    def insert_many(self, pairs: Iterable[tuple]) -> None:
+        # 排序后按键顺序插入，相邻的键落在同一批页上，缓冲池命中率更高
+        for value, pointer in sorted(pairs):
+            self.insert(value, pointer)
+
+    def delete(self, pointer: int, value) -> None:
+        key = (value, pointer)
+        leaf = self.__descend(key)
+        i = bisect_left(leaf.keys, key)
+        if i < len(leaf.keys) and leaf.keys[i] == key:
+            del leaf.keys[i]
+            leaf.nbytes -= entry_size(key)
+            self.pool_m.put(leaf)
+
+    def delete_many(self, pairs: Iterable[tuple]) -> None:
+        for value, pointer in sorted(pairs):
+            self.delete(pointer, value)
+
+    def bulk_load(self, pairs: Iterable[tuple], fill_factor: float = DEFAULT_FILL_FACTOR) -> None:
+        # 自底向上按填充因子写满各层页，替换页文件中原有的树
+        if not 0 < fill_factor <= 1:
+            raise ValueError('fill_factor must be in (0, 1], got ' + str(fill_factor))
+        keys = sorted(set(pairs))
+        self.pool_m.clear()
+        self.page_count_m = 1
+        budget = self.__page_capacity() * fill_factor
+
+        leaves = []
+        sizes = [entry_size(key) for key in keys]
+        for chunk in self.__chunks(keys, sizes, self.__per_node(self.order - 1, fill_factor), budget):
+            leaf = self.__new_node(True)
+            leaf.keys = chunk
+            leaf.nbytes += sum(map(entry_size, chunk))
+            if leaves:
+                leaves[-1].right = leaf.page_id
+                leaf.left = leaves[-1].page_id
+                self.pool_m.put(leaves[-1])
+            self.pool_m.put(leaf)
+            leaves.append(leaf)
+        if not leaves:
+            leaves.append(self.__new_node(True))
+
+        level = [(leaf.page_id, leaf.keys[0] if leaf.keys else None) for leaf in leaves]
+        while len(level) > 1:
+            upper = []
+            sizes = [CHILD_SIZE + (entry_size(low) if i else 0) for i, (_, low) in enumerate(level)]
+            for chunk in self.__chunks(level, sizes, self.__per_node(self.order, fill_factor), budget):
+                node = self.__new_node(False)
+                node.children = [page_id for page_id, _ in chunk]
+                node.keys = [low for _, low in chunk[1:]]
+                node.nbytes += sum(map(entry_size, node.keys)) + CHILD_SIZE * len(node.children)
+                self.pool_m.put(node)
+                upper.append((node.page_id, chunk[0][1]))
+            level = upper
+        self.root_m = level[0][0]
+        self.flush()
+
+    @staticmethod
+    def __per_node(maximum: int, fill_factor: float) -> int:
+        return min(maximum, max(2, int(round(maximum * fill_factor))))
+
+    @staticmethod
+    def __chunks(items: list, sizes: List[int], per: int, budget: float) -> Iterator[list]:
+        # 贪心切分：每段不超过 per 个元素，且序列化后不超过 budget 字节
+        chunk = []
+        used = EMPTY_NODE_SIZE
+        for item, size in zip(items, sizes):
+            if chunk and (len(chunk) >= per or used + size > budget):
+                yield chunk
+                chunk = []
+                used = EMPTY_NODE_SIZE
+            chunk.append(item)
+            used += size
+        if chunk:
+            yield chunk
+
+    def search(self, value) -> PageNode:
+        return self.__descend((value,))
+
+    def __entries(self, low, high, include_low: bool, include_high: bool, reverse: bool) -> Iterator[tuple]:
+        # 沿叶子链表逐个产生 (value, rowid) 键
+        if not reverse:
+            probe = None if low is None else ((low,) if include_low else (low, _MAX_ROW))
+            if probe is None:
+                leaf = self.pool_m.get(self.root_m)
+                while not leaf.is_leaf:
+                    leaf = self.pool_m.get(leaf.children[0])
+                begin = 0
+            else:
+                leaf = self.__descend(probe)
+                begin = bisect_left(leaf.keys, probe)
+            while True:
+                for key in leaf.keys[begin:]:
+                    if high is not None and (key[0] > high or (key[0] == high and not include_high)):
+                        return
+                    yield key
+                if leaf.right == _NO_PAGE:
+                    return
+                leaf = self.pool_m.get(leaf.right)
+                begin = 0
+        else:
+            probe = None if high is None else ((high, _MAX_ROW) if include_high else (high,))
+            if probe is None:
+                leaf = self.pool_m.get(self.root_m)
+                while not leaf.is_leaf:
+                    leaf = self.pool_m.get(leaf.children[-1])
+                end = len(leaf.keys)
+            else:
+                leaf = self.__descend(probe)
+                end = bisect_left(leaf.keys, probe)
+            while True:
+                for key in reversed(leaf.keys[:end]):
+                    if low is not None and (key[0] < low or (key[0] == low and not include_low)):
+                        return
+                    yield key
+                if leaf.left == _NO_PAGE:
+                    return
+                leaf = self.pool_m.get(leaf.left)
+                end = len(leaf.keys)
+
+    def cursor(self, low=None, high=None, include_low: bool = True, include_high: bool = True,
+               reverse: bool = False) -> Iterator[tuple]:
+        # 与 BPlusTree.cursor 相同：按值分组产生 (value, rowids)，每组内行号升序
+        entries = self.__entries(low, high, include_low, include_high, reverse)
+        for value, group in groupby(entries, key=lambda key: key[0]):
+            rows = [key[1] for key in group]
+            yield value, rows[::-1] if reverse else rows
+
+    def iter_find(self, value, op: str) -> Iterator[int]:
+        if op == "=":
+            postings = self.cursor(value, value)
+        elif op == ">":
+            postings = self.cursor(low=value, include_low=False)
+        elif op == ">=":
+            postings = self.cursor(low=value)
+        elif op == "<":
+            postings = self.cursor(high=value, include_high=False, reverse=True)
+        elif op == "<=":
+            postings = self.cursor(high=value, reverse=True)
+        else:
+            raise ValueError('unsupported operator for PagedBPlusTree: ' + str(op))
+        for _, pointers in postings:
+            yield from pointers
+
+    def find(self, value, op: str) -> list:
+        return list(self.iter_find(value, op))
+
+    def remap_pointers(self, mapping: List[int]) -> None:
+        # 叶子中的行号改写为 mapping[rowid] 后自底向上重建整棵树
+        # mapping 只是单调不减：就地改写时引用已删除行的分隔键会与相邻的键相等，之后的分裂找错父结点中的位置
+        self.bulk_load([(value, mapping[row]) for value, row in self.__entries(None, None, True, True, False)])
+
+    def statistics(self) -> dict:
+        # 逐层读取各页统计结构；叶子填充率按键数相对 order-1 计算
+        nodes_per_level = []
+        level = [self.pool_m.get(self.root_m)]
+        while not level[0].is_leaf:
+            nodes_per_level.append(len(level))
+            level = [self.pool_m.get(child) for node in level for child in node.children]
+        nodes_per_level.append(len(level))
+        keys = sum(len(leaf.keys) for leaf in level)
+        stats = {
+            'order': self.order,
+            'height': len(nodes_per_level),
+            'nodes_per_level': nodes_per_level,
+            'leaf_count': len(level),
+            'key_count': keys,
+            'avg_leaf_fill': keys / (len(level) * (self.order - 1)),
+            'page_count': self.page_count_m,
+        }
+        with self.counters_lock_m:
+            stats.update(self.counters_m)
+        return stats
+
+    @staticmethod
+    def __group(keys: list) -> tuple:
+        # 叶子中相同的值合并为一组行号
+        values = []
+        pointers = []
+        for value, group in groupby(keys, key=lambda key: key[0]):
+            values.append(value)
+            pointers.append([key[1] for key in group])
+        return values, pointers
+
+    def dict_structure(self, page_id: int = None) -> dict:
+        # 与 BPlusTree.dict_structure 格式相同的非递归导出；分隔键只展示值部分
+        node = self.pool_m.get(self.root_m if page_id is None else page_id)
+        first = node
+        while not first.is_leaf:
+            first = self.pool_m.get(first.children[0])
+        leaf = self.pool_m.get(self.root_m)
+        while not leaf.is_leaf:
+            leaf = self.pool_m.get(leaf.children[-1])
+        built = {}
+        next_leaf = None
+        while True:
+            values, pointers = self.__group(leaf.keys)
+            next_leaf = {
+                "type": 'leaf',
+                "node_value": None,
+                "node_pointer": None,
+                'leaf_value': values,
+                'leaf_pointer': pointers,
+                'leaf_next_leaf': next_leaf
+            }
+            built[leaf.page_id] = next_leaf
+            if leaf.page_id == first.page_id:
+                break
+            leaf = self.pool_m.get(leaf.left)
+
+        internal = [node] if not node.is_leaf else []
+        for current in internal:
+            internal.extend(child for child in map(self.pool_m.get, current.children) if not child.is_leaf)
+        for current in reversed(internal):
+            built[current.page_id] = {
+                "type": 'node',
+                "node_value": [key[0] for key in current.keys],
+                "node_pointer": [built[child] for child in current.children],
+                'leaf_value': None,
+                'leaf_pointer': None,
+                'leaf_next_leaf': None
+            }
+        return built[node.page_id]
+
+    def iter_nodes(self, max_depth: int = None) -> Iterator[tuple]:
+        # 与 BPlusTree.iter_nodes 相同的先序遍历，每次只读取一页
+        stack = [(self.root_m, None, 0)]
+        node_id = 0
+        while stack:
+            page_id, parent_id, depth = stack.pop()
+            node = self.pool_m.get(page_id)
+            if node.is_leaf:
+                values = self.__group(node.keys)[0]
+            else:
+                values = [key[0] for key in node.keys]
+            yield node_id, parent_id, depth, node.is_leaf, values
+            if not node.is_leaf and (max_depth is None or depth < max_depth):
+                stack.extend((child, node_id, depth + 1) for child in reversed(node.children))
+            node_id += 1
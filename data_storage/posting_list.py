@@ -0,0 +1,243 @@
+from typing import List, Dict, Tuple, Set, Iterable, Iterator
+from array import array
+from bisect import bisect_left
+from itertools import accumulate, chain
+import threading
+
+from .bitmap import Bitmap
+
+# 差值数组按最大差值选用最窄的无符号类型
+_DELTA_LIMITS = [(code, (1 << (8 * array(code).itemsize)) - 1) for code in ('B', 'H', 'I', 'Q')]
+# 元素不少于该值才考虑位图；位图比差值数组小一半以上时切换为位图，反之大一倍以上时切回
+BITMAP_MIN_SIZE = 64
+_prefix_lock = threading.Lock()  # 建立前缀和缓存时持有，所有倒排项共用
+
+
+def _delta_typecode(delta: int) -> str:
+    for code, limit in _DELTA_LIMITS:
+        if delta <= limit:
+            return code
+    raise OverflowError('row id delta too large: ' + str(delta))
+
+
+class PostingList(object):
+    # 非唯一索引中一个键对应的有序行号集合
+    # 稀疏时存为首元素 + 有序差值数组，稠密时存为以 base 为起点的位图（base 不大于首元素）
+    # 增删都在原处完成：位图模式直接置位/清位，差值模式用缓存的前缀和（即各行号）二分定位后修改相邻差值
+    __slots__ = ('first', 'last', 'size', 'deltas', 'bitmap', 'base', 'rows')
+
+    def __init__(self):
+        self.first = None
+        self.last = None
+        self.size = 0
+        self.deltas = array('B')
+        self.bitmap = None
+        self.base = 0
+        self.rows = None  # 差值模式下的前缀和缓存，首次按值定位时建立，之后随增删维护
+
+    @classmethod
+    def from_sorted(cls, rows: Iterable[int]) -> 'PostingList':
+        posting = cls()
+        for row in rows:
+            posting.__append(row)
+        posting.__choose_layout()
+        return posting
+
+    def is_bitmap(self) -> bool:
+        return self.bitmap is not None
+
+    def __widen(self, delta: int) -> None:
+        if delta > (1 << (8 * self.deltas.itemsize)) - 1:
+            self.deltas = array(_delta_typecode(delta), self.deltas)
+
+    def __append(self, row: int) -> None:
+        # 差值模式下追加一个大于 last 的行号
+        if self.size == 0:
+            self.first = row
+        else:
+            delta = row - self.last
+            self.__widen(delta)
+            self.deltas.append(delta)
+        if self.rows is not None:
+            self.rows.append(row)
+        self.last = row
+        self.size += 1
+
+    def __encode(self, rows: List[int]) -> None:
+        self.first = None
+        self.last = None
+        self.size = 0
+        self.deltas = array('B')
+        self.bitmap = None
+        self.base = 0
+        self.rows = None
+        for row in rows:
+            self.__append(row)
+
+    def __prefix(self) -> array:
+        # 按值定位（__contains__）在共享的读锁下进行，多个读者可能同时第一次建立缓存，由 _prefix_lock 保证只建立一次
+        rows = self.rows
+        if rows is None:
+            with _prefix_lock:
+                rows = self.rows
+                if rows is None:
+                    rows = self.rows = array('q', accumulate(chain((self.first,), self.deltas)))
+        return rows
+
+    def __choose_layout(self) -> None:
+        # 只在两种布局的大小相差一倍以上时切换，切换的代价分摊到之前的多次增删上
+        if self.size < BITMAP_MIN_SIZE:
+            if self.bitmap is not None:
+                self.__encode(list(self))
+            return
+        bitmap_bytes = (self.last - self.first) >> 3
+        if self.bitmap is None:
+            if bitmap_bytes * 2 < self.size * self.deltas.itemsize:
+                bitmap = Bitmap(self.last - self.first + 1)
+                for row in self:
+                    bitmap.add(row - self.first)
+                self.deltas = array('B')
+                self.rows = None
+                self.bitmap = bitmap
+                self.base = self.first
+            return
+        delta_bytes = self.size * array(_delta_typecode((self.last - self.first) // self.size)).itemsize
+        if bitmap_bytes > delta_bytes * 2:
+            self.__encode(list(self))
+        elif len(self.bitmap.data) > 4 * bitmap_bytes + 64:
+            # 首尾的行删除后位图两端留下空字节，超过实际跨度数倍时按首元素重新对齐并截掉
+            self.bitmap = Bitmap.from_int(self.bitmap.to_int() >> (self.first - self.base))
+            self.base = self.first
+
+    def add(self, row: int) -> None:
+        if self.bitmap is not None:
+            if row < self.base:  # 位图整体左移，让 base 前移到 row
+                self.bitmap = Bitmap.from_int(self.bitmap.to_int() << (self.base - row))
+                self.base = row
+            if row - self.base in self.bitmap:
+                return
+            self.bitmap.add(row - self.base)
+            self.size += 1
+            self.first = min(self.first, row)
+            self.last = max(self.last, row)
+        elif self.size == 0 or row > self.last:
+            self.__append(row)
+        else:  # 插入到中间或首元素之前：拆分所在位置的差值
+            rows = self.__prefix()
+            i = bisect_left(rows, row)
+            if rows[i] == row:
+                return
+            if i == 0:
+                self.__widen(self.first - row)
+                self.deltas.insert(0, self.first - row)
+                self.first = row
+            else:
+                self.deltas[i - 1] = row - rows[i - 1]
+                self.deltas.insert(i, rows[i] - row)
+            rows.insert(i, row)
+            self.size += 1
+        self.__choose_layout()
+
+    def remove(self, row: int) -> None:
+        if row not in self:
+            raise ValueError('row ' + str(row) + ' not in posting list')
+        if self.size == 1:
+            self.__encode([])
+            return
+        if self.bitmap is not None:
+            offset = row - self.base
+            self.bitmap.discard(offset)
+            if row == self.first:
+                self.first = self.base + self.bitmap.next_set(offset)
+            if row == self.last:
+                self.last = self.base + self.bitmap.prev_set(offset)
+        elif row == self.last:
+            self.last -= self.deltas.pop()
+            if self.rows is not None:
+                self.rows.pop()
+        elif row == self.first:
+            self.first += self.deltas.pop(0)
+            if self.rows is not None:
+                del self.rows[0]
+        else:  # 中间的行：与后一个差值合并
+            rows = self.__prefix()
+            i = bisect_left(rows, row)
+            delta = self.deltas[i - 1] + self.deltas[i]
+            self.__widen(delta)
+            self.deltas[i - 1] = delta
+            del self.deltas[i]
+            del rows[i]
+        self.size -= 1
+        self.__choose_layout()
+
+    def __contains__(self, row: int) -> bool:
+        if self.size == 0 or row < self.first or row > self.last:
+            return False
+        if self.bitmap is not None:
+            return row - self.base in self.bitmap
+        if row == self.first or row == self.last:
+            return True
+        rows = self.__prefix()
+        i = bisect_left(rows, row)
+        return rows[i] == row
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self) -> Iterator[int]:
+        if self.size == 0:
+            return iter(())
+        if self.bitmap is not None:
+            base = self.base
+            return (base + offset for offset in self.bitmap)
+        if self.rows is not None:
+            return iter(self.rows)
+        return accumulate(chain((self.first,), self.deltas))
+
+    def __to_int(self) -> int:
+        # 以绝对行号为位序的整数位图，用于位图之间的集合运算
+        return self.bitmap.to_int() << self.base
+
+    def union(self, other: 'PostingList') -> 'PostingList':
+        if self.bitmap is not None and other.bitmap is not None:
+            return PostingList.__from_int(self.__to_int() | other.__to_int())
+        return PostingList.from_sorted(sorted(set(self).union(other)))
+
+    def intersection(self, other: 'PostingList') -> 'PostingList':
+        if self.bitmap is not None and other.bitmap is not None:
+            return PostingList.__from_int(self.__to_int() & other.__to_int())
+        small, large = (self, other) if len(self) <= len(other) else (other, self)
+        if large.bitmap is not None:  # 小集合逐个在位图中探测
+            return PostingList.from_sorted(row for row in small if row in large)
+        return PostingList.from_sorted(sorted(set(small).intersection(large)))
+
+    def difference(self, other: 'PostingList') -> 'PostingList':
+        if self.bitmap is not None and other.bitmap is not None:
+            return PostingList.__from_int(self.__to_int() & ~other.__to_int())
+        if other.bitmap is not None:
+            return PostingList.from_sorted(row for row in self if row not in other)
+        excluded = set(other)
+        return PostingList.from_sorted(row for row in self if row not in excluded)
+
+    @staticmethod
+    def __from_int(bits: int) -> 'PostingList':
+        if not bits:
+            return PostingList()
+        first = (bits & -bits).bit_length() - 1
+        bitmap = Bitmap.from_int(bits >> first)
+        posting = PostingList()
+        posting.first = first
+        posting.base = first
+        posting.last = bits.bit_length() - 1
+        posting.size = len(bitmap)
+        posting.bitmap = bitmap
+        posting.__choose_layout()
+        return posting
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, PostingList):
+            return len(self) == len(other) and list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return 'PostingList(' + str(list(self)) + ')'
@@ -0,0 +1,54 @@
+from typing import List, Dict, Tuple, Set
+from contextlib import contextmanager
+import threading
+
+
+class ReadWriteLock(object):
+    # 读写锁：多个读者可以同时持有，写者独占；有写者等待时新的读者也要等待，避免写者饿死
+    # 不可重入，同一线程在持有锁时不能再次获取
+    def __init__(self):
+        self.condition_m = threading.Condition(threading.Lock())
+        self.readers_m = 0
+        self.writer_m = False
+        self.waiting_writers_m = 0
+
+    def acquire_read(self) -> None:
+        with self.condition_m:
+            while self.writer_m or self.waiting_writers_m:
+                self.condition_m.wait()
+            self.readers_m += 1
+
+    def release_read(self) -> None:
+        with self.condition_m:
+            self.readers_m -= 1
+            if self.readers_m == 0:
+                self.condition_m.notify_all()
+
+    def acquire_write(self) -> None:
+        with self.condition_m:
+            self.waiting_writers_m += 1
+            while self.writer_m or self.readers_m:
+                self.condition_m.wait()
+            self.waiting_writers_m -= 1
+            self.writer_m = True
+
+    def release_write(self) -> None:
+        with self.condition_m:
+            self.writer_m = False
+            self.condition_m.notify_all()
+
+    @contextmanager
+    def read_locked(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write_locked(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
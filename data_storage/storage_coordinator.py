@@ -1,9 +1,21 @@
-from typing import List, Dict, Tuple, Set
+from typing import List, Dict, Tuple, Set, Iterable, Iterator
 from collections import defaultdict
+from itertools import islice
+import heapq
 import re
 
-from .bplus_tree import Node, BPlusTree
+from .bplus_tree import Node, BPlusTree, DEFAULT_ORDER, DEFAULT_FILL_FACTOR
+from .paged_bplus_tree import PagedBPlusTree, DEFAULT_PAGE_ORDER, DEFAULT_PAGE_SIZE, DEFAULT_POOL_SIZE
 from .data_table import DataTable
+from .columnar_table import ColumnarDataTable
+from .mmap_table import MmapDataTable
+from .hash_index import UniqueHashIndex
+from .bitmap import Bitmap
+from .rwlock import ReadWriteLock
+from .external_sort import external_sort, DEFAULT_RUN_SIZE
+
+# 所选行不少于存活行的这一比例时，ORDER BY 沿B+树叶子链表按序遍历；更少时直接对所选行排序更快
+ORDER_SCAN_FRACTION = 1 / 16
 
 
 class NotUniqueException(Exception):
@@ -12,111 +24,319 @@ class NotUniqueException(Exception):
 
 
 class StorageCoordinator(object):
-    def __init__(self, table: List[tuple], table_definition: dict):
-        self.table_m = DataTable()
+    def __init__(self, table: List[tuple], table_definition: dict, table_layout: str = "row",
+                 table_path: str = None, checkpoint: dict = None):
+        # table_layout 为 "row"（行存）、"columnar"（列存，需要 numpy）或 "mmap"（内存映射的表文件 table_path）
+        # 给出 checkpoint 时忽略 table 与表文件中已有的内容，直接从检查点恢复
+        if table_layout == "row":
+            self.table_m = DataTable()
+        elif table_layout == "columnar":
+            self.table_m = ColumnarDataTable(table_definition)
+        elif table_layout == "mmap":
+            if table_path is None:
+                raise ValueError('mmap table_layout needs a table_path')
+            self.table_m = MmapDataTable(table_definition, table_path)
+        else:
+            raise ValueError('unknown table_layout ' + str(table_layout))
         self.empty_m = []
+        self.live_m = Bitmap()  # 未被删除的行号，随增删增量维护
         self.table_definition_m = table_definition
         self.bplustree_m = []
+        self.hash_index_m = []  # 唯一但未建B+树索引的列用哈希索引维护唯一性
+        self.log_hooks_m = []  # 每次成功的增删改之后依次以 (op, args) 调用，用于写预写日志与复制
+        # 语句级的读写锁：各方法本身不加锁，由调用方（Core）在整条只读语句期间持有读锁、修改语句期间持有写锁
+        self.lock_m = ReadWriteLock()
+        self.sort_run_m = DEFAULT_RUN_SIZE  # 排序的行数超过此值时改为外部归并排序
         for i in table_definition:
             if table_definition[i]["is_key"]:
-                tree = BPlusTree(i)
-                self.bplustree_m.append(tree)
-        if table:
-            for item in self.bplustree_m:
-                item.insert(table[0][item.tree_name_m], 0)
-            self.table_m.insert(0, table[0])
-            for item in table[1:]:
-                self.insert(item)
+                self.bplustree_m.append(self.__make_index(i, table_definition[i]))
+            elif table_definition[i]["is_unique"]:
+                self.hash_index_m.append(UniqueHashIndex(i))
+        if checkpoint is not None:
+            # 表文件中已有的行随即被检查点替换，不必先逐行解码来重建内存中的索引
+            self.restore_state(checkpoint)
+        elif self.table_m.length() > 0:
+            # 打开已有的表文件：忽略 table，存活行只读行目录得到，不解码任何行
+            self.live_m = Bitmap.from_iterable(self.table_m.live_rows())
+            self.empty_m = [i for i in range(self.table_m.length()) if i not in self.live_m]
+            for tree in self.bplustree_m:
+                # 已有的页文件索引直接沿用，内存中的索引需要从表中重建
+                if not isinstance(tree, PagedBPlusTree) or tree.pager_m.is_new_m:
+                    self.rebuild_index(tree.tree_name_m)
+            for index in self.hash_index_m:
+                index.bulk_load((self.table_m.get_value(i, index.index_name_m), i) for i in self.live_m)
+        elif table:
+            # 初始数据整体做唯一性检查，然后一次性装入数据表并自底向上批量建立索引
+            for key in self.table_definition_m:
+                if self.table_definition_m[key]["is_unique"]:
+                    if len(set(record[key] for record in table)) != len(table):
+                        raise NotUniqueException("insert error")
+            for sub, record in enumerate(table):
+                self.table_m.insert(sub, record)
+            self.live_m.add_range(0, len(table))
+            for tree in self.bplustree_m:
+                self.rebuild_index(tree.tree_name_m)
+            for index in self.hash_index_m:
+                index.bulk_load((record[index.index_name_m], sub) for sub, record in enumerate(table))
+        else:
+            # 数据表为空：上次运行留下的页文件索引指向已不存在的行，清空
+            for tree in self.bplustree_m:
+                if isinstance(tree, PagedBPlusTree) and not tree.pager_m.is_new_m:
+                    tree.bulk_load([])
+
+    @staticmethod
+    def __make_index(attribute: int, definition: dict):
+        # 每个索引列可单独指定B+树的阶数（扇出），以及放在内存中还是页文件中
+        storage = definition.get("index_storage", "memory")
+        if storage == "memory":
+            return BPlusTree(attribute, definition.get("index_order", DEFAULT_ORDER),
+                             definition.get("is_counted", False))
+        elif storage == "paged":
+            if "index_path" not in definition:
+                raise ValueError('paged index on attribute ' + str(attribute) + ' needs an index_path')
+            return PagedBPlusTree(attribute, definition["index_path"],
+                                  definition.get("index_order", DEFAULT_PAGE_ORDER),
+                                  definition.get("page_size", DEFAULT_PAGE_SIZE),
+                                  definition.get("buffer_pool_size", DEFAULT_POOL_SIZE))
+        raise ValueError('unknown index_storage ' + str(storage) + ' on attribute ' + str(attribute))
+
+    def flush(self) -> None:
+        # 把页文件索引的脏页与内存映射表文件写回磁盘
+        for tree in self.bplustree_m:
+            if isinstance(tree, PagedBPlusTree):
+                tree.flush()
+        if isinstance(self.table_m, MmapDataTable):
+            self.table_m.flush()
+
+    def close(self) -> None:
+        for tree in self.bplustree_m:
+            if isinstance(tree, PagedBPlusTree):
+                tree.close()
+        if isinstance(self.table_m, MmapDataTable):
+            self.table_m.close()
+
+    def read_locked(self):
+        return self.lock_m.read_locked()
+
+    def write_locked(self):
+        return self.lock_m.write_locked()
+
+    def acquire_read(self) -> None:
+        # 读锁不能用 with 包住的场合（如跨越 yield 的分页迭代），由调用方在 finally 中 release_read
+        self.lock_m.acquire_read()
+
+    def release_read(self) -> None:
+        self.lock_m.release_read()
+
+    def set_log_hook(self, hook) -> None:
+        self.log_hooks_m = [hook]
+
+    def add_log_hook(self, hook) -> None:
+        self.log_hooks_m.append(hook)
+
+    def __log(self, op: str, args: list) -> None:
+        for hook in self.log_hooks_m:
+            hook(op, args)
+
+    def apply_mutation(self, op: str, args: list) -> None:
+        # 重放一条日志记录；args 为 JSON 解码后的参数，元组与字典均以列表表示
+        if op == "insert":
+            self.insert(tuple(args[0]))
+        elif op == "delete":
+            self.delete(args[0])
+        elif op == "update":
+            self.update({key: value for key, value in args[0]}, args[1])
+        elif op == "compact":
+            self.compact()
+        else:
+            raise ValueError('unknown mutation ' + str(op))
+
+    def __is_duplicate(self, key: int, value) -> bool:
+        # 唯一列上 value 是否已存在：建了B+树索引的列查树，否则查哈希索引
+        if self.table_definition_m[key]["is_key"]:
+            for tree in self.bplustree_m:
+                if tree.tree_name_m == key:
+                    return len(tree.find(value, "=")) > 0
+        else:
+            for index in self.hash_index_m:
+                if index.index_name_m == key:
+                    return value in index
+        return False
+
+    def __insert_row(self, record: tuple) -> int:
+        # 若当前数据表有空行，则取空行行号，否则新增一行
+        if self.empty_m:
+            sub = self.empty_m.pop()
+        else:
+            sub = self.table_m.length()
+        self.table_m.insert(sub, record)
+        self.live_m.add(sub)
+        return sub
 
     def insert(self, record: tuple) -> None:
         # 唯一性检查
         for key in self.table_definition_m:
-            if self.table_definition_m[key]["is_unique"]:
-                if self.table_definition_m[key]["is_key"]:
-                    for tree in self.bplustree_m:
-                        if tree.tree_name_m == key:
-                            if len(tree.find(record[key], "=")) > 0:
-                                raise NotUniqueException("insert error")
-                            else:
-                                break
+            if self.table_definition_m[key]["is_unique"] and self.__is_duplicate(key, record[key]):
+                raise NotUniqueException("insert error")
+        sub = self.__insert_row(record)
+        # 维护B+树索引与哈希索引；失败时（如键超过页的容量）撤销这一行，不留下没有索引的行
+        try:
+            for item in self.bplustree_m:
+                item.insert(record[item.tree_name_m], sub)
+            for index in self.hash_index_m:
+                index.insert(record[index.index_name_m], sub)
+        except Exception:
+            self.__undo_inserted([(record, sub)])
+            raise
+        self.__log("insert", [list(record)])
+
+    def insert_many(self, records: List[tuple]) -> List[Exception]:
+        # 批量插入：逐条做唯一性检查（包括与同批之前的记录重复），通过的记录写入数据表后一次性批量维护各索引
+        # 返回与 records 一一对应的异常，插入成功的为 None；结果与逐条调用 insert 相同
+        unique_keys = [key for key in self.table_definition_m if self.table_definition_m[key]["is_unique"]]
+        batch_values = {key: set() for key in unique_keys}
+        errors = []
+        inserted = []
+        first = 0  # inserted 中第一条记录在 records 中的位置，之前的记录都已维护好索引
+        for record in records:
+            if any(record[tree.tree_name_m] is None for tree in self.bplustree_m):
+                # None 无法与其他键一起排序，先维护已攒下的记录的索引，再与 insert 一样逐条插入
+                if not self.__index_inserted(inserted):
+                    return errors[:first] + self.__insert_each(records[first:])
+                inserted = []
+                try:
+                    self.insert(record)
+                except Exception as e:
+                    errors.append(e)
                 else:
-                    old_record = self.table_m.get_record()
-                    for i in old_record:
-                        if i[key] == record[key]:
-                            raise NotUniqueException("insert error")
-        # 若当前数据表有空行，则取空行行号
-        if self.empty_m:
-            sub = self.empty_m.pop()
-        else:  # 否则新增一行
-            sub = len(self.table_m.get_record())
-        self.table_m.insert(sub, record)
-        # 维护B+树索引
-        for item in self.bplustree_m:
-            item.insert(record[item.tree_name_m], sub)
+                    errors.append(None)
+                first = len(errors)
+                continue
+            try:
+                if any(record[key] in batch_values[key] or self.__is_duplicate(key, record[key])
+                       for key in unique_keys):
+                    errors.append(NotUniqueException("insert error"))
+                    continue
+                sub = self.__insert_row(record)
+            except Exception:
+                # 如无法与已有键比较的值：撤销尚未维护索引的行，从这些行起逐条插入
+                self.__undo_inserted(inserted)
+                return errors[:first] + self.__insert_each(records[first:])
+            for key in unique_keys:
+                batch_values[key].add(record[key])
+            inserted.append((record, sub))
+            errors.append(None)
+        if not self.__index_inserted(inserted):
+            return errors[:first] + self.__insert_each(records[first:])
+        return errors
+
+    def __index_inserted(self, inserted: List[tuple]) -> bool:
+        # inserted 为已写入数据表的 (record, 行号)；批量维护索引失败时撤销这些行并返回 False
+        try:
+            for tree in self.bplustree_m:
+                tree.insert_many((record[tree.tree_name_m], sub) for record, sub in inserted)
+            for index in self.hash_index_m:
+                for record, sub in inserted:
+                    index.insert(record[index.index_name_m], sub)
+        except Exception:
+            self.__undo_inserted(inserted)
+            return False
+        for record, _ in inserted:
+            self.__log("insert", [list(record)])
+        return True
+
+    def __undo_inserted(self, inserted: List[tuple]) -> None:
+        # 索引可能只加入了一部分：逐项删除，无法与已有键比较的值不可能已被加入
+        for tree in self.bplustree_m:
+            for record, sub in inserted:
+                try:
+                    tree.delete(sub, record[tree.tree_name_m])
+                except TypeError:
+                    pass
+        for index in self.hash_index_m:
+            for record, sub in inserted:
+                try:
+                    index.delete(sub, record[index.index_name_m])
+                except TypeError:
+                    pass
+        for _, sub in inserted:
+            self.table_m.delete(sub)
+            self.live_m.discard(sub)
+            self.empty_m.append(sub)
+
+    def __insert_each(self, records: List[tuple]) -> List[Exception]:
+        # 批量维护索引失败后的退路：逐条 insert，每条记录的结果与存储的状态一致
+        errors = []
+        for record in records:
+            try:
+                self.insert(record)
+            except Exception as e:
+                errors.append(e)
+            else:
+                errors.append(None)
+        return errors
 
     def locate(self, attribute_index: int, compare: str, value) -> List[int]:
-        # 对LIKE操作直接使用顺序查找
-        # self.bplustree_m[0].show()
-        sub = []
-        if compare == "LIKE":
-            # 对数据表顺序遍历取满足条件的行号index
-            z = re.sub(r'%', '.*', value)
-            p = re.compile(z)
-            j = 0
-            for i in self.table_m.get_record():
-                if i is not None:
-                    if p.match(i[attribute_index]):  # 匹配？？？？？？？？？？？？？？？
-                        sub.append(j)
-                j = j + 1
-            return sub
-            # 对其他操作符
+        return list(self.scan(attribute_index, compare, value))
+
+    def scan(self, attribute_index: int, compare: str, value) -> Iterator[int]:
+        # 惰性地产生满足条件的行号，调用方可以随时停止迭代
+        # 对LIKE操作直接交给数据表在存活行中顺序查找
+        if compare.upper() == "LIKE":
+            yield from self.table_m.scan(attribute_index, compare, value, self.live_m)
+            return
+        # 对其他操作符
         # 若当前属性已建立索引，则利用B+树索引定位行号
         for tree in self.bplustree_m:
             if attribute_index == tree.tree_name_m:
-                if compare == "<>":  # 采用B+树索引时，若operation为<>，则取补集
-                    sub = tree.find(value, "=")
-                    sub = list(
-                        set(range(len(self.table_m.get_record()))).difference(set(self.empty_m)).difference(set(sub)))
+                if compare == "<>":  # 采用B+树索引时，若operation为<>，则在存活行位图中取差集
+                    yield from self.live_m.difference(Bitmap.from_iterable(tree.iter_find(value, "=")))
                 else:
-                    sub = tree.find(value, compare)
-                return sub
-        # 若当前属性未建立索引，则顺序查找定位行号
-        record = self.table_m.get_record()
-        for index in range(len(record)):
-            if record[index] is not None:
-
-                if compare == "=":
-                    if value == record[index][attribute_index]:
-                        sub.append(index)  # 若满足条件则取其行号
-                elif compare == ">":
-                    if record[index][attribute_index] > value:
-                        sub.append(index)  # 若满足条件则取其行号
-                elif compare == "<":
-                    if record[index][attribute_index] < value:
-                        sub.append(index)  # 若满足条件则取其行号
-                elif compare == "<>":
-                    if value != record[index][attribute_index]:
-                        sub.append(index)  # 若满足条件则取其行号
-                elif compare == ">=":
-                    if record[index][attribute_index] >= value:
-                        sub.append(index)  # 若满足条件则取其行号
-                elif compare == "<=":
-                    if record[index][attribute_index] <= value:
-                        sub.append(index)  # 若满足条件则取其行号
-        return sub
+                    yield from tree.iter_find(value, compare)
+                return
+        # 唯一列的等值查询直接查哈希索引
+        for index in self.hash_index_m:
+            if attribute_index == index.index_name_m and compare == "=":
+                yield from index.find(value)
+                return
+        # 若当前属性未建立索引，则由数据表在存活行中查找（列存表为向量化比较）
+        yield from self.table_m.scan(attribute_index, compare, value, self.live_m)
+
+    def count(self, attribute_index: int, compare: str, value) -> int:
+        # 满足条件的行数；计数树上为对数时间，否则退化为顺序扫描计数
+        for tree in self.bplustree_m:
+            if attribute_index == tree.tree_name_m and tree.counted and compare.upper() != "LIKE":
+                if compare == "<>":
+                    return self.count_all() - tree.count(value, "=")
+                return tree.count(value, compare)
+        return sum(1 for _ in self.scan(attribute_index, compare, value))
+
+    def count_all(self) -> int:
+        return len(self.live_m)
+
+    def estimate_selectivity(self, attribute_index: int, compare: str, value) -> float:
+        total = self.count_all()
+        return self.count(attribute_index, compare, value) / total if total else 0.0
 
     def locate_all(self) -> List[int]:
-        return list(set(range(len(self.table_m.get_record()))).difference(set(self.empty_m)))
+        return list(self.live_m)
 
     def delete(self, sub: List[int]) -> None:
+        sub = [i for i in sub if i in self.live_m]  # 已删除的行不再重复处理
+        get_value = self.table_m.get_value
+        # 先按列批量处理索引，欠载结点的合并推迟到整批删除之后
+        for item in self.bplustree_m:
+            item.delete_many((get_value(i, item.tree_name_m), i) for i in sub)
+        for index in self.hash_index_m:
+            for i in sub:
+                index.delete(i, get_value(i, index.index_name_m))
+        # 再处理数据表
         for i in sub:
-            # 先处理索引
-            for item in self.bplustree_m:
-                if self.table_m.get_record()[i] is not None:
-                    item.delete(i, self.table_m.get_record()[i][item.tree_name_m])
-            # 再处理数据表
             self.table_m.delete(i)
             self.empty_m.append(i)
+            self.live_m.discard(i)
+        if sub:
+            self.__log("delete", [sub])
 
     def update(self, new_values: dict, indexes: List[int]) -> None:
         # 唯一性检查
@@ -130,35 +350,149 @@ class StorageCoordinator(object):
                             else:
                                 break
                 else:
-                    old_record = self.table_m.get_record()
-                    for i in old_record:
-                        if i is not None:
-                            if i[key] == new_values[key]:
-                                raise NotUniqueException("update error")
+                    for index in self.hash_index_m:
+                        if index.index_name_m == key and new_values[key] in index:
+                            raise NotUniqueException("update error")
+                # 同一个唯一值不能写入多行
+                if len(indexes) > 1:
+                    raise NotUniqueException("update error")
 
         # 先处理索引
         for tree in self.bplustree_m:
             if tree.tree_name_m in new_values:
                 att = tree.tree_name_m
+                tree.delete_many((self.table_m.get_value(index, att), index) for index in indexes)
+                tree.insert_many((new_values[att], index) for index in indexes)
+        for hash_index in self.hash_index_m:
+            att = hash_index.index_name_m
+            if att in new_values:
                 for index in indexes:
-                    tree.delete(index, self.table_m.get_record()[index][att])
-                    tree.insert(new_values[tree.tree_name_m], index)
+                    hash_index.delete(index, self.table_m.get_value(index, att))
+                    hash_index.insert(new_values[att], index)
         # 再处理数据表
         for key in new_values:
             for index in indexes:
                 self.table_m.update(index, key, new_values[key])
+        if indexes:
+            self.__log("update", [[[key, value] for key, value in new_values.items()], list(indexes)])
 
     def query(self, sub: List[int]) -> List[tuple]:
-        record = []
+        return list(self.iter_query(sub))
+
+    def iter_query(self, sub: Iterable[int]) -> Iterator[tuple]:
+        # 惰性地逐行读取，调用方停止迭代后其余的行不会被读取
         for i in sub:
-            if self.table_m.get_record()[i] is not None:
-                record.append(tuple(self.table_m.get_record()[i]))
-        return record
+            row = self.table_m.get_row(i)
+            if row is not None:
+                yield row
+
+    def iter_ordered(self, sub: Iterable[int], attribute: int, desc: bool = False, bound: int = None) -> Iterator[int]:
+        # 按 attribute 列的值惰性地产生 sub 中的行号，值相同时按行号；desc 为完全逆序；空值排在最小的值之前
+        # bound 为调用方最多需要的行数（LIMIT 与 OFFSET 之和），只产生前 bound 行，None 表示全部
+        if not isinstance(sub, (list, Bitmap)):
+            sub = list(sub)
+        if len(sub) == 0 or (bound is not None and bound <= 0):
+            return
+        # 该列建有B+树时沿叶子链表按序遍历，只保留所选的行，无需排序
+        for tree in self.bplustree_m:
+            if attribute == tree.tree_name_m and len(sub) >= self.count_all() * ORDER_SCAN_FRACTION:
+                selected = sub if isinstance(sub, Bitmap) else set(sub)
+                ordered = (i for _, pointers in tree.cursor(reverse=desc)
+                           for i in (reversed(list(pointers)) if desc else pointers) if i in selected)
+                yield from islice(ordered, bound)
+                return
+        # 否则取出各行的值排序：有 bound 时用容量为 bound 的堆取前 bound 行，行数过多时外部归并排序
+        get_value = self.table_m.get_value
+
+        def keys() -> Iterator[tuple]:
+            for i in sub:
+                value = get_value(i, attribute)
+                yield value is not None, value, i
+
+        if bound is not None and bound < len(sub):
+            ordered = (heapq.nlargest if desc else heapq.nsmallest)(bound, keys())
+        elif len(sub) <= self.sort_run_m:
+            ordered = sorted(keys(), reverse=desc)
+        else:
+            ordered = external_sort(keys(), desc, self.sort_run_m)
+        for key in ordered:
+            yield key[2]
+
+    def compact(self) -> int:
+        # 整理空行：存活行按原顺序紧凑排列，数据表与所有索引中的行号一次性改写，返回回收的行槽位数
+        rows = list(self.live_m)
+        length = self.table_m.length()
+        # mapping[p] 为 p 之前的存活行数：对存活行即新行号，且整体单调，已删除的行号也能保持有序
+        mapping = [0] * (length + 1)
+        live = 0
+        for p in range(length):
+            mapping[p] = live
+            live += p in self.live_m
+        mapping[length] = live
+        self.table_m.compact(rows)
+        for tree in self.bplustree_m:
+            tree.remap_pointers(mapping)
+        for index in self.hash_index_m:
+            index.remap_pointers(mapping)
+        self.live_m = Bitmap()
+        self.live_m.add_range(0, len(rows))
+        self.empty_m = []
+        self.__log("compact", [])  # 之后日志中的行号都是整理后的行号，重放时需要在同一位置整理
+        return length - len(rows)
+
+    def checkpoint_state(self) -> dict:
+        # 检查点内容：所有行槽位（已删除为 None）、空行列表，以及各B+树索引按序排列的 (值, 行号)
+        rows = [self.table_m.get_row(i) for i in range(self.table_m.length())]
+        indexes = {}
+        for tree in self.bplustree_m:
+            indexes[tree.tree_name_m] = [(value, i) for value, posting in tree.cursor() for i in posting]
+        return {"rows": rows, "empty": list(self.empty_m), "indexes": indexes}
+
+    def restore_state(self, state: dict) -> None:
+        # 清空数据表后恢复检查点，索引直接由有序的 (值, 行号) 批量构建，不逐条插入
+        self.table_m.compact([])
+        self.live_m = Bitmap()
+        placeholder = (None,) * len(self.table_definition_m)
+        for sub, row in enumerate(state["rows"]):
+            if row is None:
+                self.table_m.insert(sub, placeholder)
+                self.table_m.delete(sub)
+            else:
+                self.table_m.insert(sub, row)
+                self.live_m.add(sub)
+        self.empty_m = list(state["empty"])
+        for tree in self.bplustree_m:
+            tree.bulk_load(state["indexes"][tree.tree_name_m],
+                           self.table_definition_m[tree.tree_name_m].get("fill_factor", DEFAULT_FILL_FACTOR))
+        for index in self.hash_index_m:
+            index.bulk_load((self.table_m.get_value(i, index.index_name_m), i) for i in self.live_m)
+
+    def rebuild_index(self, attribute: int, fill_factor: float = None) -> None:
+        # 用数据表中现有的行重新批量构建指定列的B+树索引
+        if fill_factor is None:
+            fill_factor = self.table_definition_m[attribute].get("fill_factor", DEFAULT_FILL_FACTOR)
+        for tree in self.bplustree_m:
+            if tree.tree_name_m == attribute:
+                tree.bulk_load(((self.table_m.get_value(i, attribute), i) for i in self.live_m), fill_factor)
+                return
+        raise KeyError('attribute ' + str(attribute) + ' has no index')
 
     def get_data_definition(self) -> dict:
         return self.table_definition_m
 
+    def get_index_statistics(self, attribute: int) -> dict:
+        for tree in self.bplustree_m:
+            if tree.tree_name_m == attribute:
+                return tree.statistics()
+        raise KeyError('attribute ' + str(attribute) + ' has no index')
+
     def get_index_structure(self, attribute: int) -> dict:
         for tree in self.bplustree_m:
             if tree.tree_name_m == attribute:
                 return tree.dict_structure()
+
+    def iter_index_nodes(self, attribute: int, max_depth: int = None) -> Iterator[tuple]:
+        for tree in self.bplustree_m:
+            if tree.tree_name_m == attribute:
+                return tree.iter_nodes(max_depth)
+        raise KeyError('attribute ' + str(attribute) + ' has no index')
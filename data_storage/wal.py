@@ -0,0 +1,146 @@
+from typing import List, Dict, Tuple, Set, Iterator
+import json
+import os
+import pickle
+import threading
+import time
+
+WAL_FILE = 'wal.log'
+CHECKPOINT_FILE = 'checkpoint.bin'
+DEFAULT_GROUP_SIZE = 64
+DEFAULT_GROUP_INTERVAL = 0.01  # 秒
+DEFAULT_CHECKPOINT_INTERVAL = 10000  # 日志记录数
+
+
+class WriteAheadLog(object):
+    # 追加写的逻辑日志：每行一条 JSON 记录 {"seq", "op", "args"}
+    # 组提交：记录先缓存在内存中，攒够 group_size 条或距第一条未提交记录超过 group_interval 秒时一起写入并 fsync；
+    # 需要确认落盘的调用方用 sync(seq) 等待：先到的线程作为领导者把当时缓存的全部记录写入并 fsync，
+    # 其间到达的线程等待，之后由其中一个把又积累的记录作为下一组提交（领导者/跟随者）
+    def __init__(self, directory: str, start_seq: int = 0, group_size: int = DEFAULT_GROUP_SIZE,
+                 group_interval: float = DEFAULT_GROUP_INTERVAL, sync: bool = True):
+        os.makedirs(directory, exist_ok=True)
+        self.path_m = os.path.join(directory, WAL_FILE)
+        self.group_size_m = group_size
+        self.group_interval_m = group_interval
+        self.sync_m = sync
+        self.pending_m = []
+        self.pending_since_m = 0.0
+        self.condition_m = threading.Condition(threading.Lock())  # 保护缓存与序号；写文件与 fsync 在锁外进行
+        self.syncing_m = False  # 是否有领导者正在写入一组记录
+        self.seq_m = start_seq
+        self.count_m = 0  # 日志文件中（含未提交）的记录数
+        # 丢弃崩溃时写了一半的尾部记录，之后的追加从最后一条完整记录之后开始
+        valid = 0
+        for record, offset in self.__scan():
+            self.seq_m = max(self.seq_m, record['seq'])
+            self.count_m += 1
+            valid = offset
+        self.durable_seq_m = self.seq_m  # 已落盘的最大序号
+        self.file_m = open(self.path_m, 'ab')
+        if self.file_m.tell() != valid:
+            self.file_m.truncate(valid)
+
+    def __scan(self) -> Iterator[tuple]:
+        if not os.path.exists(self.path_m):
+            return
+        offset = 0
+        with open(self.path_m, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    return
+                try:
+                    record = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    return
+                offset += len(line)
+                yield record, offset
+
+    def last_seq(self) -> int:
+        return self.seq_m
+
+    def __len__(self) -> int:
+        return self.count_m
+
+    def append(self, op: str, args: list) -> int:
+        with self.condition_m:
+            self.seq_m += 1
+            self.count_m += 1
+            seq = self.seq_m
+            line = json.dumps({'seq': seq, 'op': op, 'args': args}, ensure_ascii=False) + '\n'
+            if not self.pending_m:
+                self.pending_since_m = time.monotonic()
+            self.pending_m.append(line.encode('utf-8'))
+            full = len(self.pending_m) >= self.group_size_m or \
+                time.monotonic() - self.pending_since_m >= self.group_interval_m
+        if full:
+            self.sync(seq)
+        return seq
+
+    def sync(self, seq: int) -> None:
+        # 返回时序号不大于 seq 的记录都已落盘
+        with self.condition_m:
+            while self.durable_seq_m < seq:
+                if self.syncing_m:
+                    self.condition_m.wait()
+                    continue
+                self.syncing_m = True
+                batch, self.pending_m = self.pending_m, []
+                target = self.seq_m
+                self.condition_m.release()
+                try:
+                    self.file_m.write(b''.join(batch))
+                    self.file_m.flush()
+                    if self.sync_m:
+                        os.fsync(self.file_m.fileno())
+                finally:
+                    self.condition_m.acquire()
+                    self.syncing_m = False
+                    self.condition_m.notify_all()
+                self.durable_seq_m = target
+
+    def commit(self) -> None:
+        # 把缓存的记录作为一组写入并落盘
+        self.sync(self.seq_m)
+
+    def records(self, after_seq: int = 0) -> Iterator[dict]:
+        # 已提交的 seq 大于 after_seq 的记录，按写入顺序产生
+        self.commit()
+        for record, _ in self.__scan():
+            if record['seq'] > after_seq:
+                yield record
+
+    def truncate(self) -> None:
+        # 检查点之后调用：日志中的记录都已包含在检查点里
+        self.commit()
+        with self.condition_m:
+            while self.syncing_m:
+                self.condition_m.wait()
+            self.file_m.truncate(0)
+            self.file_m.seek(0)
+            if self.sync_m:
+                os.fsync(self.file_m.fileno())
+            self.count_m = 0
+
+    def close(self) -> None:
+        self.commit()
+        self.file_m.close()
+
+
+def write_checkpoint(directory: str, state: dict) -> None:
+    # 先写临时文件再原子替换，崩溃时保留上一个完整的检查点
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, CHECKPOINT_FILE)
+    with open(path + '.tmp', 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+
+
+def load_checkpoint(directory: str) -> dict:
+    path = os.path.join(directory, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return pickle.load(f)
@@ -0,0 +1,212 @@
+from typing import List, Dict, Tuple, Set, Iterable, Iterator
+from collections import deque
+from concurrent.futures import Future
+import multiprocessing
+import os
+import queue
+import threading
+
+from core import Core, SqlVm
+from data_storage import DEFAULT_CHECKPOINT_INTERVAL
+
+DEFAULT_SHIP_BATCH = 64  # 攒够这么多条修改记录就发送给各副本
+DEFAULT_SHIP_INTERVAL = 0.05  # 未攒满一批的修改记录最多等待这么多秒也发送给各副本
+DEFAULT_IN_FLIGHT = 64  # execute_many 中每个副本最多同时执行的查询数
+_PAGED_INDEX_KEYS = ('index_storage', 'index_path', 'page_size', 'buffer_pool_size')
+# 主进程中可能已有其他线程（接收结果的线程、服务线程），fork 出的子进程可能继承被持有的锁，因此以 spawn 方式启动副本
+_context = multiprocessing.get_context('spawn')
+
+
+def replica_definition(table_definition: dict) -> dict:
+    # 副本的表定义：页文件索引改为内存中的索引。页文件只由主库打开，副本共用同一文件会互相覆盖索引页
+    return {i: {key: value for key, value in definition.items() if key not in _PAGED_INDEX_KEYS}
+            for i, definition in table_definition.items()}
+
+
+def _replica_main(conn, table_definition: dict, table_layout: str, parser_backend: str, state: dict,
+                  seq: int) -> None:
+    # 副本进程：从主库的快照恢复出完整的 Core，之后按顺序应用主库发来的修改，并执行分派来的只读语句
+    # 修改与查询经同一条管道按发送顺序到达，查询执行时已应用发送它之前的全部修改
+    core = Core(table_definition, [], table_layout, parser_backend=parser_backend)
+    core.db_m.restore_state(state)
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message[0] == 'apply':
+            for op, args in message[1]:
+                core.db_m.apply_mutation(op, args)
+            seq = message[2]
+        elif message[0] == 'execute':
+            result = core.execute_sql_expr(message[2])
+            result['seq'] = seq
+            conn.send((message[1], result))
+        else:
+            break
+    conn.close()
+
+
+class ReplicatedCore(object):
+    # 主库加多个只读副本进程：修改语句在主库（普通的 Core）上执行，主库每条成功的修改都按序编号并分批发送给所有副本；
+    # 只读语句分派给当前未完成查询最少的副本，在各进程中并行解析与执行，不受主进程 GIL 的限制
+    # 每个结果带有 seq：修改语句为执行后主库的序号，查询为执行时副本已应用到的序号
+    # 请求中的 min_seq 要求副本至少应用到该序号再执行（读己之写）；read_your_writes 为 True 时默认使用主库当前序号
+    def __init__(self, table_definition: dict, table_data: List[tuple], replicas: int = None,
+                 table_layout: str = "row", wal_dir: str = None,
+                 checkpoint_interval: int = DEFAULT_CHECKPOINT_INTERVAL, table_path: str = None,
+                 parser_backend: str = "ply", read_your_writes: bool = True, ship_batch: int = DEFAULT_SHIP_BATCH,
+                 ship_interval: float = DEFAULT_SHIP_INTERVAL):
+        self.primary_m = Core(table_definition, table_data, table_layout, wal_dir, checkpoint_interval, table_path,
+                              parser_backend)
+        self.read_your_writes_m = read_your_writes
+        self.ship_batch_m = ship_batch
+        self.ship_interval_m = ship_interval
+        self.stopped_m = threading.Event()
+        self.lock_m = threading.Lock()  # 保护以下状态，以及发往各副本的消息的入队顺序
+        self.seq_m = 0  # 主库最后一条修改的序号
+        self.shipped_seq_m = 0  # 已发送给所有副本的序号
+        self.pending_m = []  # 尚未发送的 (op, args)
+        self.ticket_m = 0
+        self.next_m = 0  # 未完成查询数相同的副本之间轮流分派
+        self.futures_m = {}  # ticket -> (副本编号, Future)
+        replicas = replicas or os.cpu_count() or 1
+        self.outstanding_m = [0] * replicas
+        # 副本使用内存中的数据表，内存映射表只由主库打开
+        layout = "row" if table_layout == "mmap" else table_layout
+        definition = replica_definition(table_definition)
+        with self.primary_m.db_m.read_locked():
+            state = self.primary_m.db_m.checkpoint_state()
+        self.connections_m = []
+        self.processes_m = []
+        for _ in range(replicas):
+            parent, child = _context.Pipe()
+            process = _context.Process(target=_replica_main, daemon=True,
+                                       args=(child, definition, layout, parser_backend, state, 0))
+            process.start()
+            child.close()
+            self.connections_m.append(parent)
+            self.processes_m.append(process)
+        # 副本进程全部启动后再注册日志钩子并启动接收结果的线程
+        self.primary_m.db_m.add_log_hook(self.__record)
+        # 每个副本一个发送线程与一个接收线程：管道写满时只阻塞发送线程，不会在持有 lock_m 时阻塞
+        self.outboxes_m = [queue.SimpleQueue() for _ in range(replicas)]
+        self.threads_m = [threading.Thread(target=self.__send, args=(i,), daemon=True) for i in range(replicas)]
+        self.threads_m += [threading.Thread(target=self.__receive, args=(i,), daemon=True) for i in range(replicas)]
+        self.flusher_m = threading.Thread(target=self.__flush, daemon=True)
+        for thread in self.threads_m + [self.flusher_m]:
+            thread.start()
+
+    def __record(self, op: str, args: list) -> None:
+        # 主库的日志钩子，在主库的写锁内调用
+        with self.lock_m:
+            self.seq_m += 1
+            self.pending_m.append((op, args))
+
+    def __ship(self) -> None:
+        # 调用方持有 lock_m
+        if not self.pending_m:
+            return
+        for outbox in self.outboxes_m:
+            outbox.put(('apply', self.pending_m, self.seq_m))
+        self.pending_m = []
+        self.shipped_seq_m = self.seq_m
+
+    def __flush(self) -> None:
+        # 写入停下来之后没有新的修改凑满一批，也没有查询要求 min_seq：每隔 ship_interval 秒把攒下的记录发出，
+        # 不带 min_seq 的查询最多落后主库这么久
+        while not self.stopped_m.wait(self.ship_interval_m):
+            with self.lock_m:
+                self.__ship()
+
+    def __send(self, replica: int) -> None:
+        conn = self.connections_m[replica]
+        while True:
+            message = self.outboxes_m[replica].get()
+            try:
+                conn.send(message)
+            except OSError:
+                break
+            if message[0] == 'stop':
+                break
+
+    def __receive(self, replica: int) -> None:
+        conn = self.connections_m[replica]
+        while True:
+            try:
+                ticket, result = conn.recv()
+            except (EOFError, OSError):
+                break
+            with self.lock_m:
+                _, future = self.futures_m.pop(ticket)
+                self.outstanding_m[replica] -= 1
+            future.set_result(result)
+        # 副本进程退出后，分派给它的未完成查询不会再有结果
+        with self.lock_m:
+            lost = [ticket for ticket, (i, _) in self.futures_m.items() if i == replica]
+            futures = [self.futures_m.pop(ticket)[1] for ticket in lost]
+        for future in futures:
+            future.set_exception(RuntimeError('replica ' + str(replica) + ' exited'))
+
+    def last_seq(self) -> int:
+        return self.seq_m
+
+    def submit(self, request: dict) -> Future:
+        # 修改语句与无法解析的语句在主库上同步执行，返回已完成的 Future；只读语句返回副本执行结果的 Future
+        try:
+            code_list = self.primary_m.engine_m.prepare(request['sql_expr']).code_list
+            read_only = SqlVm.is_read_only(code_list)
+        except Exception:
+            read_only = False
+        future = Future()
+        if not read_only:
+            result = self.primary_m.execute_sql_expr(request)
+            with self.lock_m:
+                result['seq'] = self.seq_m
+                if len(self.pending_m) >= self.ship_batch_m:
+                    self.__ship()
+            future.set_result(result)
+            return future
+        with self.lock_m:
+            min_seq = request.get('min_seq', self.seq_m if self.read_your_writes_m else 0)
+            if min_seq > self.shipped_seq_m:
+                self.__ship()
+            count = len(self.outstanding_m)
+            self.next_m = (self.next_m + 1) % count
+            replica = min(range(count), key=lambda i: (self.outstanding_m[i], (i - self.next_m) % count))
+            self.outstanding_m[replica] += 1
+            self.ticket_m += 1
+            self.futures_m[self.ticket_m] = (replica, future)
+            self.outboxes_m[replica].put(('execute', self.ticket_m, request))
+        return future
+
+    def execute_sql_expr(self, request: dict) -> dict:
+        return self.submit(request).result()
+
+    def execute_many(self, requests: Iterable[dict]) -> Iterator[dict]:
+        # 流水线地分派一批请求，按请求顺序产生结果；同时在途的查询数有上限
+        window = deque()
+        limit = DEFAULT_IN_FLIGHT * len(self.connections_m)
+        for request in requests:
+            window.append(self.submit(request))
+            while window and (window[0].done() or len(window) > limit):
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
+    def checkpoint(self) -> None:
+        self.primary_m.checkpoint()
+
+    def close(self) -> None:
+        self.stopped_m.set()
+        self.flusher_m.join()
+        with self.lock_m:
+            for outbox in self.outboxes_m:
+                outbox.put(('stop',))
+        for process in self.processes_m:
+            process.join()
+        for thread in self.threads_m:
+            thread.join()
+        for conn in self.connections_m:
+            conn.close()
+        self.primary_m.close()
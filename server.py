@@ -0,0 +1,174 @@
+from typing import List, Dict, Tuple, Set
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from core import Core, DEFAULT_BATCH_SIZE
+
+DEFAULT_QUEUE_SIZE = 10000  # 执行队列中最多积压的请求数，超过时暂停读取客户端
+DEFAULT_LINE_LIMIT = 1 << 20  # 单个请求行的最大字节数
+
+
+class CoreServer(object):
+    # 多个客户端共享一个 Core 的 asyncio 服务：TCP 或 Unix 套接字上每行一个 JSON 请求 {sql_expr, serial_number[, params]}，
+    # 每行返回一个 JSON 结果，格式与 Core.execute_sql_expr 相同（由 serial_number 对应请求）
+    # 所有连接的请求进入同一个执行队列，由单个后台线程按到达顺序串行执行，已到达的请求一次取出通过 execute_many 批量执行；
+    # 同一连接的结果按请求顺序返回，客户端不必等待上一个结果即可继续发送（流水线）
+    def __init__(self, core: Core, batch_size: int = DEFAULT_BATCH_SIZE, queue_size: int = DEFAULT_QUEUE_SIZE):
+        self.core_m = core
+        self.batch_size_m = batch_size
+        self.queue_size_m = queue_size
+        self.queue_m = None  # (request, outbox)；request 为 None 表示该连接的请求已全部入队
+        # Core 可以多线程共享，这里有意只用一个线程：请求按进入队列的顺序串行执行，同一批插入可以合并
+        self.executor_m = ThreadPoolExecutor(max_workers=1)
+        self.worker_m = None
+        self.servers_m = []
+        self.connections_m = {}  # 各连接的处理任务 -> StreamWriter，关闭服务时断开
+
+    async def start_tcp(self, host: str = '127.0.0.1', port: int = 0) -> asyncio.AbstractServer:
+        # port 为 0 时由系统分配，实际端口见 server.sockets[0].getsockname()
+        self.__start_worker()
+        server = await asyncio.start_server(self.__handle, host, port, limit=DEFAULT_LINE_LIMIT)
+        self.servers_m.append(server)
+        return server
+
+    async def start_unix(self, path: str) -> asyncio.AbstractServer:
+        self.__start_worker()
+        server = await asyncio.start_unix_server(self.__handle, path, limit=DEFAULT_LINE_LIMIT)
+        self.servers_m.append(server)
+        return server
+
+    async def close(self) -> None:
+        # 停止接受连接并断开现有连接，已在执行中的一批请求执行完后再停止后台线程
+        for server in self.servers_m:
+            server.close()
+        for writer in list(self.connections_m.values()):
+            writer.close()  # 读取端随之读到 EOF，处理任务自行结束
+        await asyncio.gather(*self.connections_m, return_exceptions=True)
+        for server in self.servers_m:
+            await server.wait_closed()
+        self.servers_m = []
+        if self.worker_m is not None:
+            self.worker_m.cancel()
+            try:
+                await self.worker_m
+            except asyncio.CancelledError:
+                pass
+            self.worker_m = None
+        self.executor_m.shutdown(wait=True)
+
+    def __start_worker(self) -> None:
+        if self.worker_m is None:
+            self.queue_m = asyncio.Queue(self.queue_size_m)
+            self.worker_m = asyncio.ensure_future(self.__execute())
+
+    async def __execute(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self.queue_m.get()]
+            while len(items) < self.batch_size_m and not self.queue_m.empty():
+                items.append(self.queue_m.get_nowait())
+            requests = [request for request, _ in items if request is not None]
+            try:
+                results = await loop.run_in_executor(self.executor_m, self.__execute_many, requests)
+            except Exception as e:  # execute_many 已处理单个请求的错误，这里只兜底，保证各连接都能收到结果
+                results = [{'is_success': False, 'content': [], 'error_msg': '[Exception][InternalError] ' + str(e),
+                            'sql_expr': request.get('sql_expr'), 'serial_number': request.get('serial_number')}
+                           for request in requests]
+            results = iter(results)
+            for request, outbox in items:
+                outbox.put_nowait(None if request is None else next(results))
+
+    def __execute_many(self, requests: List[dict]) -> List[dict]:
+        return list(self.core_m.execute_many(requests, self.batch_size_m))
+
+    async def __handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # 读取与写回分开：读取端把请求放入执行队列，写回端按顺序把结果写给客户端，慢的客户端不会阻塞执行
+        self.connections_m[asyncio.current_task()] = writer
+        outbox = asyncio.Queue()
+        sender = asyncio.ensure_future(self.__send(outbox, writer))
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):  # 请求行过长或连接被重置
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                await self.queue_m.put((self.__decode(line), outbox))
+            # 客户端不再发送后，等已入队请求的结果都写回再关闭连接
+            await self.queue_m.put((None, outbox))
+            await sender
+        finally:
+            sender.cancel()
+            self.connections_m.pop(asyncio.current_task(), None)
+
+    @staticmethod
+    def __decode(line: bytes) -> dict:
+        # 无法解析的请求行按缺少字段的请求处理，由 Core 返回请求格式错误的结果
+        try:
+            request = json.loads(line.decode('utf-8'))
+        except ValueError:
+            return {}
+        return request if isinstance(request, dict) else {}
+
+    @staticmethod
+    async def __send(outbox: asyncio.Queue, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                result = await outbox.get()
+                if result is None:
+                    break
+                writer.write(json.dumps(result, ensure_ascii=False).encode('utf-8') + b'\n')
+                if outbox.empty():
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def load_table_definition(path: str) -> dict:
+    # JSON 对象的键只能是字符串，转换回 Core 使用的整数列号
+    with open(path, encoding='utf-8') as f:
+        return {int(key): value for key, value in json.load(f).items()}
+
+
+async def serve(core: Core, host: str = None, port: int = None, unix_path: str = None) -> None:
+    server = CoreServer(core)
+    if unix_path is not None:
+        await server.start_unix(unix_path)
+    if port is not None or unix_path is None:
+        await server.start_tcp(host or '127.0.0.1', port or 0)
+    for listener in server.servers_m:
+        print('listening on', listener.sockets[0].getsockname(), flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='line-delimited JSON SQL server over one shared Core')
+    parser.add_argument('table_definition', help='JSON file with the table definition')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--unix', help='listen on this Unix socket path')
+    parser.add_argument('--wal-dir', help='write-ahead log and checkpoint directory')
+    parser.add_argument('--parser-backend', default='ply', choices=('ply', 'fast'))
+    args = parser.parse_args()
+    core = Core(load_table_definition(args.table_definition), [], wal_dir=args.wal_dir,
+                parser_backend=args.parser_backend)
+    try:
+        asyncio.run(serve(core, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        core.close()
+
+
+if __name__ == '__main__':
+    main()
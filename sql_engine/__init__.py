@@ -1,3 +1,4 @@
 from .sql_engine import SqlEngine
-from .sql_engine import Code
+from .sql_engine import Code, Param
+from .sql_engine import PreparedStatement, normalize_sql
 from .sql_engine import SqlSyntaxException, SqlColumnException, ValueInvalidException
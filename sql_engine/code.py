@@ -24,3 +24,15 @@ class Code(object):
                     return False
         else:
             return False
+
+
+class Param(object):
+    # 预编译语句中的占位符 ?，index 为其在语句中出现的序号（从 0 开始），执行前由 SqlEngine 绑定实际值
+    def __init__(self, index: int):
+        self.index = index
+
+    def __eq__(self, other):
+        return isinstance(other, Param) and self.index == other.index
+
+    def __repr__(self):
+        return 'Param(' + str(self.index) + ')'
@@ -0,0 +1,279 @@
+from typing import List, Dict, Tuple, Set
+import re
+
+# 与 ply 相同：按 pred / value 规则可接受的词法单元类型
+_PRED_TYPES = frozenset(['EQ', 'NE', 'LT', 'LE', 'GT', 'GE', 'LIKE'])
+_VALUE_TYPES = frozenset(['STR', 'NUMBER', 'BOOL', 'PARAM'])
+_END = '$end'
+# 各产生式归约时允许的向前看符号（即文法的 FOLLOW 集）；LR 分析只在向前看合法时才归约并执行语义动作，
+# 归约前按同样的集合检查，语法错误与语义动作中的错误先后顺序就与 ply 一致
+_FOLLOW = {
+    'p_sql_stam': {_END},
+    'p_select_stam': {_END},
+    'p_insert_stam': {_END},
+    'p_update_stam': {_END},
+    'p_delete_stam': {_END},
+    'p_attr_list': {'WHERE', 'VALUES', 'ORDER', 'LIMIT', _END},
+    'p_attr': {'COMMA', 'WHERE', 'VALUES', 'ORDER', 'ASC', 'DESC', 'LIMIT', _END} | _PRED_TYPES,
+    'p_cond_stam': {'ORDER', 'LIMIT', _END},
+    'p_or_cond': {'ORDER', 'LIMIT', _END},
+    'p_and_cond': {'OR', 'ORDER', 'LIMIT', _END},
+    'p_cond': {'AND', 'OR', 'ORDER', 'LIMIT', _END},
+    'p_order_stam': {'LIMIT', _END},
+    'p_limit_stam': {_END},
+    'p_count': {'OFFSET', _END},
+    'p_pred': _VALUE_TYPES,
+    'p_values_list': {_END},
+    'p_value': {'COMMA', 'AND', 'OR', 'WHERE', 'ORDER', 'LIMIT', _END},
+    'p_assg_stam': {'WHERE', _END},
+    'p_assg': {'COMMA', 'WHERE', _END},
+    'p_empty': {'WHERE', 'VALUES', 'ORDER', 'LIMIT', _END},
+}
+
+
+class FastLexer(object):
+    # 快速后端的词法状态，属性与 SqlEngine.gen_lex 得到的 ply 词法分析器一致，供语法规则通过 p.lexer 访问
+    def __init__(self, engine):
+        self.engine = engine
+        self.param_count = 0
+        self.debug_print = False
+
+
+class LexToken(object):
+    # 与 ply 的词法单元同名，词法规则中的异常信息也就与 ply 后端相同
+    __slots__ = ('type', 'value', 'lexer', 'lexpos')
+
+
+class _Production(list):
+    # 代替 ply 的 YaccProduction：p[0] 为结果，p[1:] 为右部各符号的值
+    __slots__ = ('lexer',)
+
+
+class FastParser(object):
+    # 手写的词法分析与递归下降语法分析，复用 grammar 模块中的 t_ 词法规则与 p_ 语义动作：
+    # 词法规则按定义顺序拼成与 ply 相同的主正则；各产生式按 LR 分析的归约顺序调用语义动作，因此生成相同的 Code
+    def __init__(self, grammar):
+        self.grammar_m = grammar
+        rules = sorted((getattr(grammar, name) for name in dir(grammar)
+                        if name.startswith('t_') and name not in ('t_ignore', 't_error')
+                        and callable(getattr(grammar, name))),
+                       key=lambda rule: rule.__code__.co_firstlineno)
+        self.master_m = re.compile('|'.join('(?P<%s>%s)' % (rule.__name__, rule.__doc__) for rule in rules),
+                                   re.VERBOSE)
+        self.rules_m = [None] + [(rule.__name__[2:], rule) for rule in rules]  # 按分组编号取规则
+        self.ignore_m = grammar.t_ignore
+        self.follow_m = {getattr(grammar, name): follow for name, follow in _FOLLOW.items()}
+
+    def parse(self, input: str, lexer: FastLexer):
+        return _Parse(self, input, lexer).statement()
+
+
+class _Parse(object):
+    # 单次解析的状态；整句一次切分为词法单元，词法错误记在出错的位置，语法分析读到该位置时才抛出，与 ply 边分析边读入的报错顺序一致
+    def __init__(self, parser: FastParser, data: str, lexer: FastLexer):
+        self.grammar = parser.grammar_m
+        self.follow = parser.follow_m
+        self.lexer = lexer
+        self.tokens, self.kinds, self.error = self.__tokenize(parser, data, lexer)
+        self.pos = 0
+
+    @staticmethod
+    def __tokenize(parser: FastParser, data: str, lexer: FastLexer) -> tuple:
+        master = parser.master_m
+        rules = parser.rules_m
+        ignore = parser.ignore_m
+        tokens = []
+        pos = 0
+        length = len(data)
+        try:
+            while pos < length:
+                if data[pos] in ignore:
+                    pos += 1
+                    continue
+                tok = LexToken()
+                tok.lexer = lexer
+                tok.lexpos = pos
+                m = master.match(data, pos)
+                if m is None:
+                    tok.type = 'error'
+                    tok.value = data[pos:]
+                    parser.grammar_m.t_error(tok)
+                    raise SyntaxError('illegal character ' + repr(data[pos]))
+                tok.type, rule = rules[m.lastindex]
+                tok.value = m.group()
+                pos = m.end()
+                tok = rule(tok)
+                if tok is not None:
+                    tokens.append(tok)
+        except Exception as e:
+            return tokens, [tok.type for tok in tokens], e
+        return tokens, [tok.type for tok in tokens] + [_END], None
+
+    def peek(self) -> LexToken:
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+        if self.error is not None:
+            raise self.error
+        return None
+
+    def kind(self) -> str:
+        # 向前看符号的类型，输入结束时为 $end
+        if self.pos < len(self.kinds):
+            return self.kinds[self.pos]
+        raise self.error
+
+    def next(self) -> LexToken:
+        tok = self.peek()
+        self.pos += 1
+        return tok
+
+    def expect(self, token_type: str):
+        if self.kind() != token_type:
+            self.grammar.p_error(self.peek())
+        self.pos += 1
+        return self.tokens[self.pos - 1].value
+
+    def reduce(self, action, *values):
+        if self.kind() not in self.follow[action]:
+            self.grammar.p_error(self.peek())
+        p = _Production((None,) + values)
+        p.lexer = self.lexer
+        action(p)
+        return p[0]
+
+    def empty(self):
+        return self.reduce(self.grammar.p_empty)
+
+    def statement(self):
+        kind = self.kind()
+        if kind == 'SELECT':
+            result = self.select_stam()
+        elif kind == 'INSERT':
+            result = self.insert_stam()
+        elif kind == 'UPDATE':
+            result = self.update_stam()
+        elif kind == 'DELETE':
+            result = self.delete_stam()
+        else:
+            self.grammar.p_error(self.peek())
+        if self.kind() != _END:
+            self.grammar.p_error(self.peek())
+        return self.reduce(self.grammar.p_sql_stam, result)
+
+    def select_stam(self):
+        select = self.expect('SELECT')
+        attr_list = self.attr_list()
+        cond_stam = self.cond_stam()
+        order_stam = self.order_stam()
+        limit_stam = self.limit_stam()
+        return self.reduce(self.grammar.p_select_stam, select, attr_list, cond_stam, order_stam, limit_stam)
+
+    def insert_stam(self):
+        insert = self.expect('INSERT')
+        attr_list = self.attr_list()
+        values = self.expect('VALUES')
+        values_list = self.values_list()
+        return self.reduce(self.grammar.p_insert_stam, insert, attr_list, values, values_list)
+
+    def update_stam(self):
+        update = self.expect('UPDATE')
+        set_ = self.expect('SET')
+        assg_stam = self.right_list(self.assg, 'COMMA', self.grammar.p_assg_stam)
+        cond_stam = self.cond_stam()
+        return self.reduce(self.grammar.p_update_stam, update, set_, assg_stam, cond_stam)
+
+    def delete_stam(self):
+        delete = self.expect('DELETE')
+        cond_stam = self.cond_stam()
+        return self.reduce(self.grammar.p_delete_stam, delete, cond_stam)
+
+    def right_list(self, item, separator: str, action):
+        # 右递归的列表 x : item SEP x | item 迭代地读入，再从右向左依次归约，与 LR 分析的归约顺序一致
+        items = [item()]
+        separators = []
+        while self.kind() == separator:
+            separators.append(self.next().value)
+            items.append(item())
+        result = self.reduce(action, items.pop())
+        while items:
+            result = self.reduce(action, items.pop(), separators.pop(), result)
+        return result
+
+    def attr_list(self):
+        # attr_list : attr COMMA attr_list | attr | STAR | empty，逗号之后可以是 STAR 或空
+        attrs = []
+        separators = []
+        while True:
+            kind = self.kind()
+            if kind == 'STAR':
+                tail = self.reduce(self.grammar.p_attr_list, self.next().value)
+                break
+            if kind != 'STR':
+                tail = self.reduce(self.grammar.p_attr_list, self.empty())
+                break
+            attrs.append(self.attr())
+            if self.kind() != 'COMMA':
+                tail = self.reduce(self.grammar.p_attr_list, attrs.pop())
+                break
+            separators.append(self.next().value)
+        while attrs:
+            tail = self.reduce(self.grammar.p_attr_list, attrs.pop(), separators.pop(), tail)
+        return tail
+
+    def attr(self):
+        return self.reduce(self.grammar.p_attr, self.expect('STR'))
+
+    def cond_stam(self):
+        if self.kind() == 'WHERE':
+            tok = self.next()
+            or_cond = self.right_list(self.and_cond, 'OR', self.grammar.p_or_cond)
+            return self.reduce(self.grammar.p_cond_stam, tok.value, or_cond)
+        return self.reduce(self.grammar.p_cond_stam, self.empty())
+
+    def order_stam(self):
+        if self.kind() != 'ORDER':
+            return self.reduce(self.grammar.p_order_stam, self.empty())
+        order = self.next().value
+        by = self.expect('BY')
+        attr = self.attr()
+        if self.kind() not in ('ASC', 'DESC'):
+            return self.reduce(self.grammar.p_order_stam, order, by, attr)
+        return self.reduce(self.grammar.p_order_stam, order, by, attr, self.next().value)
+
+    def limit_stam(self):
+        if self.kind() != 'LIMIT':
+            return self.reduce(self.grammar.p_limit_stam, self.empty())
+        limit = self.next().value
+        count = self.count()
+        if self.kind() != 'OFFSET':
+            return self.reduce(self.grammar.p_limit_stam, limit, count)
+        offset = self.next().value
+        return self.reduce(self.grammar.p_limit_stam, limit, count, offset, self.count())
+
+    def count(self):
+        if self.kind() not in ('NUMBER', 'PARAM'):
+            self.grammar.p_error(self.peek())
+        return self.reduce(self.grammar.p_count, self.next().value)
+
+    def and_cond(self):
+        return self.right_list(self.cond, 'AND', self.grammar.p_and_cond)
+
+    def cond(self):
+        attr = self.attr()
+        if self.kind() not in _PRED_TYPES:
+            self.grammar.p_error(self.peek())
+        pred = self.reduce(self.grammar.p_pred, self.next().value)
+        return self.reduce(self.grammar.p_cond, attr, pred, self.value())
+
+    def value(self):
+        if self.kind() not in _VALUE_TYPES:
+            self.grammar.p_error(self.peek())
+        return self.reduce(self.grammar.p_value, self.next().value)
+
+    def values_list(self):
+        return self.right_list(self.value, 'COMMA', self.grammar.p_values_list)
+
+    def assg(self):
+        attr = self.attr()
+        eq = self.expect('EQ')
+        return self.reduce(self.grammar.p_assg, attr, eq, self.value())
@@ -0,0 +1,10 @@
+# lextab.py. This file automatically created by PLY (version 3.11). Don't edit!
+_tabversion   = '3.10'
+_lextokens    = set(('AND', 'ASC', 'BOOL', 'BY', 'COMMA', 'DELETE', 'DESC', 'EQ', 'GE', 'GT', 'INSERT', 'KEYWORD', 'LE', 'LIKE', 'LIMIT', 'LT', 'NE', 'NUMBER', 'OFFSET', 'OR', 'ORDER', 'PARAM', 'SELECT', 'SET', 'STAR', 'STR', 'UPDATE', 'VALUES', 'WHERE'))
+_lexreflags   = 64
+_lexliterals  = ''
+_lexstateinfo = {'INITIAL': 'inclusive'}
+_lexstatere   = {'INITIAL': [("(?P<t_NUMBER>\\d+\\.?|\\.\\d+|\\d+\\.\\d+)|(?P<t_BOOL>[Tt][Rr][Uu][Ee]|[Ff][Aa][Ll][Ss][Ee])|(?P<t_PARAM>\\?)|(?P<t_KEYWORD>[a-zA-Z_]+|\\=|\\>\\=|\\<\\=|\\<\\>|\\<|\\>|\\*|,)|(?P<t_STR>'[^']*'|[^\\s']+)", [None, ('t_NUMBER', 'NUMBER'), ('t_BOOL', 'BOOL'), ('t_PARAM', 'PARAM'), ('t_KEYWORD', 'KEYWORD'), ('t_STR', 'STR')])]}
+_lexstateignore = {'INITIAL': ' '}
+_lexstateerrorf = {'INITIAL': 't_error'}
+_lexstateeoff = {}
@@ -6,9 +6,9 @@ _tabversion = '3.10'
 
 _lr_method = 'LALR'
 
-_lr_signature = 'AND BOOL COMMA DELETE EQ GE GT INSERT KEYWORD LE LIKE LT NE NUMBER OR SELECT SET STAR STR UPDATE VALUES WHEREsql_stam : select_stam\n                        | insert_stam\n                        | update_stam\n                        | delete_stamselect_stam : SELECT attr_list cond_staminsert_stam : INSERT attr_list VALUES values_listupdate_stam : UPDATE SET assg_stam cond_stamdelete_stam : DELETE cond_stamattr_list : attr COMMA attr_list\n                         | attr\n                         | STAR\n                         | emptyattr : STRcond_stam : WHERE or_cond\n                         | emptyor_cond : and_cond OR or_cond\n                       | and_condand_cond : cond AND and_cond\n                        | condcond : attr pred valuepred : EQ\n \t                | NE\n \t                | LT\n \t                | LE\n \t                | GT\n \t                | GE\n \t                | LIKEvalues_list : value COMMA values_list\n \t                       | valuevalue : STR\n \t                 | NUMBER\n \t                 | BOOLassg_stam : assg COMMA assg_stam\n \t                     | assgassg : attr EQ valueempty :'
+_lr_signature = 'AND ASC BOOL BY COMMA DELETE DESC EQ GE GT INSERT KEYWORD LE LIKE LIMIT LT NE NUMBER OFFSET OR ORDER PARAM SELECT SET STAR STR UPDATE VALUES WHEREsql_stam : select_stam\n                | insert_stam\n                | update_stam\n                | delete_stamselect_stam : SELECT attr_list cond_stam order_stam limit_staminsert_stam : INSERT attr_list VALUES values_listupdate_stam : UPDATE SET assg_stam cond_stamdelete_stam : DELETE cond_stamattr_list : attr COMMA attr_list\n                 | attr\n                 | STAR\n                 | emptyattr : STRcond_stam : WHERE or_cond\n                 | emptyor_cond : and_cond OR or_cond\n               | and_condand_cond : cond AND and_cond\n                | condcond : attr pred valueorder_stam : ORDER BY attr ASC\n                  | ORDER BY attr DESC\n                  | ORDER BY attr\n                  | emptylimit_stam : LIMIT count OFFSET count\n                  | LIMIT count\n                  | emptycount : NUMBER\n             | PARAMpred : EQ\n\t                | NE\n\t                | LT\n\t                | LE\n\t                | GT\n\t                | GE\n\t                | LIKEvalues_list : value COMMA values_list\n\t                       | valuevalue : STR\n\t                 | NUMBER\n\t                 | BOOL\n\t                 | PARAMassg_stam : assg COMMA assg_stam\n\t                     | assgassg : attr EQ valueempty :'
     
-_lr_action_items = {'SELECT':([0,],[6,]),'INSERT':([0,],[7,]),'UPDATE':([0,],[8,]),'DELETE':([0,],[9,]),'$end':([1,2,3,4,5,6,9,10,11,12,13,14,17,19,20,21,23,24,26,27,28,30,31,32,33,34,35,36,50,51,52,53,54,55,],[0,-1,-2,-3,-4,-36,-36,-36,-10,-11,-12,-13,-8,-15,-5,-36,-36,-34,-14,-17,-19,-9,-6,-29,-30,-31,-32,-7,-33,-35,-16,-18,-20,-28,]),'STAR':([6,7,21,],[12,12,12,]),'STR':([6,7,16,18,21,22,37,38,39,40,41,42,43,44,45,46,47,48,49,],[14,14,14,14,14,33,14,33,14,14,33,-21,-22,-23,-24,-25,-26,-27,33,]),'WHERE':([6,9,10,11,12,13,14,21,23,24,30,33,34,35,50,51,],[-36,18,18,-10,-11,-12,-13,-36,18,-34,-9,-30,-31,-32,-33,-35,]),'VALUES':([7,11,12,13,14,15,21,30,],[-36,-10,-11,-12,-13,22,-36,-9,]),'SET':([8,],[16,]),'COMMA':([11,14,24,32,33,34,35,51,],[21,-13,37,49,-30,-31,-32,-35,]),'EQ':([14,25,29,],[-13,38,42,]),'NE':([14,29,],[-13,43,]),'LT':([14,29,],[-13,44,]),'LE':([14,29,],[-13,45,]),'GT':([14,29,],[-13,46,]),'GE':([14,29,],[-13,47,]),'LIKE':([14,29,],[-13,48,]),'NUMBER':([22,38,41,42,43,44,45,46,47,48,49,],[34,34,34,-21,-22,-23,-24,-25,-26,-27,34,]),'BOOL':([22,38,41,42,43,44,45,46,47,48,49,],[35,35,35,-21,-22,-23,-24,-25,-26,-27,35,]),'OR':([27,28,33,34,35,53,54,],[39,-19,-30,-31,-32,-18,-20,]),'AND':([28,33,34,35,54,],[40,-30,-31,-32,-20,]),}
+_lr_action_items = {'SELECT':([0,],[6,]),'INSERT':([0,],[7,]),'UPDATE':([0,],[8,]),'DELETE':([0,],[9,]),'$end':([1,2,3,4,5,6,9,10,11,12,13,14,17,19,20,21,23,24,26,27,28,30,32,33,34,35,36,37,38,39,40,53,55,58,59,60,61,62,63,64,65,66,67,69,70,71,],[0,-1,-2,-3,-4,-46,-46,-46,-10,-11,-12,-13,-8,-15,-46,-46,-46,-44,-14,-17,-19,-46,-24,-9,-6,-38,-39,-40,-41,-42,-7,-5,-27,-43,-45,-16,-18,-20,-26,-28,-29,-23,-37,-21,-22,-25,]),'STAR':([6,7,21,],[12,12,12,]),'STR':([6,7,16,18,21,22,41,42,43,44,45,46,47,48,49,50,51,52,56,57,],[14,14,14,14,14,36,14,36,14,14,36,-30,-31,-32,-33,-34,-35,-36,14,36,]),'WHERE':([6,9,10,11,12,13,14,21,23,24,33,36,37,38,39,58,59,],[-46,18,18,-10,-11,-12,-13,-46,18,-44,-9,-39,-40,-41,-42,-43,-45,]),'ORDER':([6,10,11,12,13,14,19,20,21,26,27,28,33,36,37,38,39,60,61,62,],[-46,-46,-10,-11,-12,-13,-15,31,-46,-14,-17,-19,-9,-39,-40,-41,-42,-16,-18,-20,]),'LIMIT':([6,10,11,12,13,14,19,20,21,26,27,28,30,32,33,36,37,38,39,60,61,62,66,69,70,],[-46,-46,-10,-11,-12,-13,-15,-46,-46,-14,-17,-19,54,-24,-9,-39,-40,-41,-42,-16,-18,-20,-23,-21,-22,]),'VALUES':([7,11,12,13,14,15,21,33,],[-46,-10,-11,-12,-13,22,-46,-9,]),'SET':([8,],[16,]),'COMMA':([11,14,24,35,36,37,38,39,59,],[21,-13,41,57,-39,-40,-41,-42,-45,]),'EQ':([14,25,29,],[-13,42,46,]),'NE':([14,29,],[-13,47,]),'LT':([14,29,],[-13,48,]),'LE':([14,29,],[-13,49,]),'GT':([14,29,],[-13,50,]),'GE':([14,29,],[-13,51,]),'LIKE':([14,29,],[-13,52,]),'ASC':([14,66,],[-13,69,]),'DESC':([14,66,],[-13,70,]),'NUMBER':([22,42,45,46,47,48,49,50,51,52,54,57,68,],[37,37,37,-30,-31,-32,-33,-34,-35,-36,64,37,64,]),'BOOL':([22,42,45,46,47,48,49,50,51,52,57,],[38,38,38,-30,-31,-32,-33,-34,-35,-36,38,]),'PARAM':([22,42,45,46,47,48,49,50,51,52,54,57,68,],[39,39,39,-30,-31,-32,-33,-34,-35,-36,65,39,65,]),'OR':([27,28,36,37,38,39,61,62,],[43,-19,-39,-40,-41,-42,-18,-20,]),'AND':([28,36,37,38,39,62,],[44,-39,-40,-41,-42,-20,]),'BY':([31,],[56,]),'OFFSET':([63,64,65,],[68,-28,-29,]),}
 
 _lr_action = {}
 for _k, _v in _lr_action_items.items():
@@ -17,7 +17,7 @@ for _k, _v in _lr_action_items.items():
       _lr_action[_x][_k] = _y
 del _lr_action_items
 
-_lr_goto_items = {'sql_stam':([0,],[1,]),'select_stam':([0,],[2,]),'insert_stam':([0,],[3,]),'update_stam':([0,],[4,]),'delete_stam':([0,],[5,]),'attr_list':([6,7,21,],[10,15,30,]),'attr':([6,7,16,18,21,37,39,40,],[11,11,25,29,11,25,29,29,]),'empty':([6,7,9,10,21,23,],[13,13,19,19,13,19,]),'cond_stam':([9,10,23,],[17,20,36,]),'assg_stam':([16,37,],[23,50,]),'assg':([16,37,],[24,24,]),'or_cond':([18,39,],[26,52,]),'and_cond':([18,39,40,],[27,27,53,]),'cond':([18,39,40,],[28,28,28,]),'values_list':([22,49,],[31,55,]),'value':([22,38,41,49,],[32,51,54,32,]),'pred':([29,],[41,]),}
+_lr_goto_items = {'sql_stam':([0,],[1,]),'select_stam':([0,],[2,]),'insert_stam':([0,],[3,]),'update_stam':([0,],[4,]),'delete_stam':([0,],[5,]),'attr_list':([6,7,21,],[10,15,33,]),'attr':([6,7,16,18,21,41,43,44,56,],[11,11,25,29,11,25,29,29,66,]),'empty':([6,7,9,10,20,21,23,30,],[13,13,19,19,32,13,19,55,]),'cond_stam':([9,10,23,],[17,20,40,]),'assg_stam':([16,41,],[23,58,]),'assg':([16,41,],[24,24,]),'or_cond':([18,43,],[26,60,]),'and_cond':([18,43,44,],[27,27,61,]),'cond':([18,43,44,],[28,28,28,]),'order_stam':([20,],[30,]),'values_list':([22,57,],[34,67,]),'value':([22,42,45,57,],[35,59,62,35,]),'pred':([29,],[45,]),'limit_stam':([30,],[53,]),'count':([54,68,],[63,71,]),}
 
 _lr_goto = {}
 for _k, _v in _lr_goto_items.items():
@@ -27,40 +27,50 @@ for _k, _v in _lr_goto_items.items():
 del _lr_goto_items
 _lr_productions = [
   ("S' -> sql_stam","S'",1,None,None,None),
-  ('sql_stam -> select_stam','sql_stam',1,'p_sql_stam','sql_engine.py',94),
-  ('sql_stam -> insert_stam','sql_stam',1,'p_sql_stam','sql_engine.py',95),
-  ('sql_stam -> update_stam','sql_stam',1,'p_sql_stam','sql_engine.py',96),
-  ('sql_stam -> delete_stam','sql_stam',1,'p_sql_stam','sql_engine.py',97),
-  ('select_stam -> SELECT attr_list cond_stam','select_stam',3,'p_select_stam','sql_engine.py',102),
-  ('insert_stam -> INSERT attr_list VALUES values_list','insert_stam',4,'p_insert_stam','sql_engine.py',111),
-  ('update_stam -> UPDATE SET assg_stam cond_stam','update_stam',4,'p_update_stam','sql_engine.py',116),
-  ('delete_stam -> DELETE cond_stam','delete_stam',2,'p_delete_stam','sql_engine.py',124),
-  ('attr_list -> attr COMMA attr_list','attr_list',3,'p_attr_list','sql_engine.py',132),
-  ('attr_list -> attr','attr_list',1,'p_attr_list','sql_engine.py',133),
-  ('attr_list -> STAR','attr_list',1,'p_attr_list','sql_engine.py',134),
-  ('attr_list -> empty','attr_list',1,'p_attr_list','sql_engine.py',135),
-  ('attr -> STR','attr',1,'p_attr','sql_engine.py',151),
-  ('cond_stam -> WHERE or_cond','cond_stam',2,'p_cond_stam','sql_engine.py',159),
-  ('cond_stam -> empty','cond_stam',1,'p_cond_stam','sql_engine.py',160),
-  ('or_cond -> and_cond OR or_cond','or_cond',3,'p_or_cond','sql_engine.py',168),
-  ('or_cond -> and_cond','or_cond',1,'p_or_cond','sql_engine.py',169),
-  ('and_cond -> cond AND and_cond','and_cond',3,'p_and_cond','sql_engine.py',177),
-  ('and_cond -> cond','and_cond',1,'p_and_cond','sql_engine.py',178),
-  ('cond -> attr pred value','cond',3,'p_cond','sql_engine.py',186),
-  ('pred -> EQ','pred',1,'p_pred','sql_engine.py',196),
-  ('pred -> NE','pred',1,'p_pred','sql_engine.py',197),
-  ('pred -> LT','pred',1,'p_pred','sql_engine.py',198),
-  ('pred -> LE','pred',1,'p_pred','sql_engine.py',199),
-  ('pred -> GT','pred',1,'p_pred','sql_engine.py',200),
-  ('pred -> GE','pred',1,'p_pred','sql_engine.py',201),
-  ('pred -> LIKE','pred',1,'p_pred','sql_engine.py',202),
-  ('values_list -> value COMMA values_list','values_list',3,'p_values_list','sql_engine.py',210),
-  ('values_list -> value','values_list',1,'p_values_list','sql_engine.py',211),
-  ('value -> STR','value',1,'p_value','sql_engine.py',219),
-  ('value -> NUMBER','value',1,'p_value','sql_engine.py',220),
-  ('value -> BOOL','value',1,'p_value','sql_engine.py',221),
-  ('assg_stam -> assg COMMA assg_stam','assg_stam',3,'p_assg_stam','sql_engine.py',226),
-  ('assg_stam -> assg','assg_stam',1,'p_assg_stam','sql_engine.py',227),
-  ('assg -> attr EQ value','assg',3,'p_assg','sql_engine.py',235),
-  ('empty -> <empty>','empty',0,'p_empty','sql_engine.py',245),
+  ('sql_stam -> select_stam','sql_stam',1,'p_sql_stam','sql_engine.py',129),
+  ('sql_stam -> insert_stam','sql_stam',1,'p_sql_stam','sql_engine.py',130),
+  ('sql_stam -> update_stam','sql_stam',1,'p_sql_stam','sql_engine.py',131),
+  ('sql_stam -> delete_stam','sql_stam',1,'p_sql_stam','sql_engine.py',132),
+  ('select_stam -> SELECT attr_list cond_stam order_stam limit_stam','select_stam',5,'p_select_stam','sql_engine.py',139),
+  ('insert_stam -> INSERT attr_list VALUES values_list','insert_stam',4,'p_insert_stam','sql_engine.py',152),
+  ('update_stam -> UPDATE SET assg_stam cond_stam','update_stam',4,'p_update_stam','sql_engine.py',176),
+  ('delete_stam -> DELETE cond_stam','delete_stam',2,'p_delete_stam','sql_engine.py',186),
+  ('attr_list -> attr COMMA attr_list','attr_list',3,'p_attr_list','sql_engine.py',196),
+  ('attr_list -> attr','attr_list',1,'p_attr_list','sql_engine.py',197),
+  ('attr_list -> STAR','attr_list',1,'p_attr_list','sql_engine.py',198),
+  ('attr_list -> empty','attr_list',1,'p_attr_list','sql_engine.py',199),
+  ('attr -> STR','attr',1,'p_attr','sql_engine.py',218),
+  ('cond_stam -> WHERE or_cond','cond_stam',2,'p_cond_stam','sql_engine.py',229),
+  ('cond_stam -> empty','cond_stam',1,'p_cond_stam','sql_engine.py',230),
+  ('or_cond -> and_cond OR or_cond','or_cond',3,'p_or_cond','sql_engine.py',244),
+  ('or_cond -> and_cond','or_cond',1,'p_or_cond','sql_engine.py',245),
+  ('and_cond -> cond AND and_cond','and_cond',3,'p_and_cond','sql_engine.py',255),
+  ('and_cond -> cond','and_cond',1,'p_and_cond','sql_engine.py',256),
+  ('cond -> attr pred value','cond',3,'p_cond','sql_engine.py',268),
+  ('order_stam -> ORDER BY attr ASC','order_stam',4,'p_order_stam','sql_engine.py',281),
+  ('order_stam -> ORDER BY attr DESC','order_stam',4,'p_order_stam','sql_engine.py',282),
+  ('order_stam -> ORDER BY attr','order_stam',3,'p_order_stam','sql_engine.py',283),
+  ('order_stam -> empty','order_stam',1,'p_order_stam','sql_engine.py',284),
+  ('limit_stam -> LIMIT count OFFSET count','limit_stam',4,'p_limit_stam','sql_engine.py',296),
+  ('limit_stam -> LIMIT count','limit_stam',2,'p_limit_stam','sql_engine.py',297),
+  ('limit_stam -> empty','limit_stam',1,'p_limit_stam','sql_engine.py',298),
+  ('count -> NUMBER','count',1,'p_count','sql_engine.py',310),
+  ('count -> PARAM','count',1,'p_count','sql_engine.py',311),
+  ('pred -> EQ','pred',1,'p_pred','sql_engine.py',321),
+  ('pred -> NE','pred',1,'p_pred','sql_engine.py',322),
+  ('pred -> LT','pred',1,'p_pred','sql_engine.py',323),
+  ('pred -> LE','pred',1,'p_pred','sql_engine.py',324),
+  ('pred -> GT','pred',1,'p_pred','sql_engine.py',325),
+  ('pred -> GE','pred',1,'p_pred','sql_engine.py',326),
+  ('pred -> LIKE','pred',1,'p_pred','sql_engine.py',327),
+  ('values_list -> value COMMA values_list','values_list',3,'p_values_list','sql_engine.py',337),
+  ('values_list -> value','values_list',1,'p_values_list','sql_engine.py',338),
+  ('value -> STR','value',1,'p_value','sql_engine.py',348),
+  ('value -> NUMBER','value',1,'p_value','sql_engine.py',349),
+  ('value -> BOOL','value',1,'p_value','sql_engine.py',350),
+  ('value -> PARAM','value',1,'p_value','sql_engine.py',351),
+  ('assg_stam -> assg COMMA assg_stam','assg_stam',3,'p_assg_stam','sql_engine.py',358),
+  ('assg_stam -> assg','assg_stam',1,'p_assg_stam','sql_engine.py',359),
+  ('assg -> attr EQ value','assg',3,'p_assg','sql_engine.py',369),
+  ('empty -> <empty>','empty',0,'p_empty','sql_engine.py',382),
 ]
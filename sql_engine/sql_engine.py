@@ -1,9 +1,16 @@
 from typing import List, Dict, Tuple, Set
 import ply.lex as lex
 import ply.yacc as yacc
+from collections import OrderedDict
+import os
 import re
+import sys
+import threading
 
-from .code import Code
+from .code import Code, Param
+from .fast_parser import FastLexer, FastParser
+
+DEFAULT_PLAN_CACHE_SIZE = 256
 
 
 class SqlSyntaxException(Exception):
@@ -21,258 +28,575 @@ class ValueInvalidException(Exception):
         Exception.__init__(self, '[ValueInvalidException]' + err)
 
 
+def collapse_spaces(sql_expr: str) -> str:
+    # 引号外的连续空格合并为一个并去掉首尾空格；引号内的内容原样保留
+    parts = re.split(r"('[^']*')", sql_expr)
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(r' +', ' ', parts[i])
+    return ''.join(parts).strip(' ')
+
+
+def normalize_sql(sql_expr: str) -> tuple:
+    # 计划缓存的键：按与词法分析器相同的规则切分，数值与带引号的字符串字面值替换为占位符 ?，空格合并
+    # 返回 (键, 键中各占位符依次对应的值)，语句原有的 ? 对应 Param(第几个调用方参数)，只差字面值的语句共用一个计划
+    # 词法分析会失败的语句只合并空格，留给解析时报错
+    parts = []
+    slots = []
+    params = 0
+    for match in _NORMALIZE_TOKEN.finditer(sql_expr):
+        kind = match.lastgroup
+        text = match.group()
+        if kind == 'SPACE':
+            continue
+        if kind == 'ERROR':
+            return collapse_spaces(sql_expr), ()
+        if kind == 'NUMBER':
+            slots.append(float(text) if '.' in text else int(text))
+            text = '?'
+        elif kind == 'STR' and text[0] == "'":
+            slots.append(text[1:-1])
+            text = '?'
+        elif kind == 'PARAM':
+            slots.append(Param(params))
+            params += 1
+        parts.append(text)
+    return ' '.join(parts), tuple(slots)
+
+
+class PreparedStatement(object):
+    # 已解析的语句：每次执行只把参数绑定进缓存的计划，不再词法、语法分析
+    # slots 非空时计划中的占位符包括规范化时提取的字面值，绑定时与调用方的参数按位置合并
+    def __init__(self, engine: 'SqlEngine', code_list: List[Code], param_count: int, slots: tuple = ()):
+        self.engine = engine
+        self.code_list = code_list
+        self.slots = slots
+        self.param_count = sum(isinstance(value, Param) for value in slots) if slots else param_count
+
+    def bind(self, params: tuple = ()) -> List[Code]:
+        if not self.slots:
+            return self.engine.bind_params(self.code_list, self.param_count, params)
+        if len(params) != self.param_count:
+            raise ValueInvalidException('需要' + str(self.param_count) + '个参数，实际为' + str(len(params)) + '个！')
+        merged = tuple(params[value.index] if isinstance(value, Param) else value for value in self.slots)
+        return self.engine.bind_params(self.code_list, len(merged), merged)
+
+
+# 词法与语法规则定义在模块级，整个进程只构建一次词法分析器与语法分析器，由所有 SqlEngine 共享
+# 规则中通过 p.lexer.engine 取得当前语句所属的 SqlEngine（表定义与属性名映射）
+
+# reserved keyword or operator
+reserved = {
+    'select': 'SELECT',
+    'insert': 'INSERT',
+    'delete': 'DELETE',
+    'update': 'UPDATE',
+    'set': 'SET',
+    'where': 'WHERE',
+    'values': 'VALUES',
+    '*': 'STAR',
+    '=': 'EQ',
+    '<': 'LT',
+    '<=': 'LE',
+    '>': 'GT',
+    '>=': 'GE',
+    '<>': 'NE',
+    'like': 'LIKE',
+    ',': 'COMMA',
+    'and': 'AND',
+    'or': 'OR',
+    'limit': 'LIMIT',
+    'offset': 'OFFSET',
+    'order': 'ORDER',
+    'by': 'BY',
+    'asc': 'ASC',
+    'desc': 'DESC'
+}
+
+# define tokens
+tokens = ['STR', 'NUMBER', 'BOOL', 'PARAM', 'KEYWORD'] + list(reserved.values())  # 'KEYWORD' only for lexical analysis
+
+# define ignore
+t_ignore = r' '
+
+# # Regular expression rules for simple tokens
+# t_STR = r"(?<=')[^']+(?=')|[^\s']+"
+
+
+def t_NUMBER(t):
+    r'\d+\.?|\.\d+|\d+\.\d+'
+    t.value = float(t.value) if '.' in t.value else int(t.value)
+    return t
+
+
+def t_BOOL(t):
+    r'[Tt][Rr][Uu][Ee]|[Ff][Aa][Ll][Ss][Ee]'
+    t.value = bool(re.match(r'[Tt][Rr][Uu][Ee]', t))
+    return t
+
+
+def t_PARAM(t):
+    r'\?'
+    # 占位符按出现顺序编号，计数器在每次解析前清零
+    t.value = Param(t.lexer.param_count)
+    t.lexer.param_count += 1
+    return t
+
+
+def t_KEYWORD(t):
+    r'[a-zA-Z_]+|\=|\>\=|\<\=|\<\>|\<|\>|\*|,'
+    t.type = reserved.get(t.value.lower(), 'STR')
+    return t
+
+
+def t_STR(t):
+    r"'[^']*'|[^\s']+"
+    if t.value[0] == "'" and t.value[-1] == "'":  # remove STR's quotation marks
+        t.value = t.value[1:-1]
+    return t
+
+
+def t_error(t):
+    raise SqlSyntaxException('lexical anayasis failed at:(%s)' % t.value)
+
+
+# normalize_sql 使用的切分规则：与 ply 一样按上面各规则定义的顺序尝试，空格跳过，其余字符是词法错误
+_NORMALIZE_TOKEN = re.compile('|'.join(['(?P<SPACE>[ ]+)'] +
+                                       ['(?P<%s>%s)' % (rule.__name__[2:], rule.__doc__)
+                                        for rule in (t_NUMBER, t_BOOL, t_PARAM, t_KEYWORD, t_STR)] +
+                                       ['(?P<ERROR>.)']), re.VERBOSE | re.DOTALL)
+
+
+def p_sql_stam(p):
+    '''sql_stam : select_stam
+                | insert_stam
+                | update_stam
+                | delete_stam'''
+    debug_print = p.lexer.debug_print
+    if debug_print: print('生成SQL语句')
+    p[0] = p[1]
+
+
+def p_select_stam(p):
+    '''select_stam : SELECT attr_list cond_stam order_stam limit_stam'''
+    debug_print = p.lexer.debug_print
+    if debug_print: print('生成查询语句')
+    p[0] = [Code(opc='locate', opr=p[3])]
+    if p[4] is not None:
+        p[0].append(Code(opc='order', opr=p[4]))
+    p[0].append(Code(opc='query', opr=None))
+    p[0].append(Code(opc='project', opr=p[2]))
+    if p[5] is not None:
+        p[0].append(Code(opc='limit', opr=p[5]))
+
+
+def p_insert_stam(p):
+    '''insert_stam : INSERT attr_list VALUES values_list'''
+    debug_print = p.lexer.debug_print
+    engine = p.lexer.engine
+    if debug_print: print('生成插入语句')
+    if len(p[2]) != len(p[4]):
+        # 检查属性列表和值列表数量是否一致
+        raise SqlSyntaxException('属性列表和值列表数量不一致！')
+    temp = [None for i in range(len(engine.table_definition))]
+    for i in range(len(p[2])):
+        # 检查属性列表和值列表对应位数据类型是否匹配，顺便给临时列表赋值
+        pattern = engine.table_definition[p[2][i]]['type']
+        value = str(type(p[4][i]))
+        if isinstance(p[4][i], Param) or re.search(pattern, value):  # 占位符在绑定时检查
+            temp[p[2][i]] = p[4][i]
+        else:
+            raise ValueInvalidException(p[2][i] + '和' + p[4][i] + '类型不匹配！')
+    for i in range(len(p[2])):
+        # 再次检查是否允许为空
+        if temp[p[2][i]] is None and not engine.table_definition[p[2][i]]['is_nullable']:
+            raise SqlColumnException('字段' + p[2][i]['name'] + '不允许为空！')
+    p[0] = [Code(opc='insert', opr=tuple(temp))]
+
+
+def p_update_stam(p):
+    '''update_stam : UPDATE SET assg_stam cond_stam'''
+    debug_print = p.lexer.debug_print
+    if debug_print: print('生成更新语句')
+    p[0] = [
+        Code(opc='locate', opr=p[4]),
+        Code(opc='update', opr=dict(p[3]))
+    ]
+
+
+def p_delete_stam(p):
+    '''delete_stam : DELETE cond_stam'''
+    debug_print = p.lexer.debug_print
+    if debug_print: print('生成删除语句')
+    p[0] = [
+        Code(opc='locate', opr=p[2]),
+        Code(opc='delete', opr=None)
+    ]
+
+
+def p_attr_list(p):
+    '''attr_list : attr COMMA attr_list
+                 | attr
+                 | STAR
+                 | empty'''
+    debug_print = p.lexer.debug_print
+    engine = p.lexer.engine
+    if debug_print: print('生成投影属性列表')
+    if p[1] == '*':
+        """attr_list : STAR"""
+        p[0] = list(range(len(engine.attr_index_map)))
+    elif p[1] is None:
+        """attr_list : empty"""
+        p[0] = None
+    elif isinstance(p[1], int):
+        if len(p) == 4:
+            """attr_list : attr COMMA attr_list"""
+            p[0] = [p[1]] + p[3]
+        else:
+            p[0] = [p[1]]
+
+
+def p_attr(p):
+    '''attr : STR'''
+    debug_print = p.lexer.debug_print
+    engine = p.lexer.engine
+    if debug_print: print('获取属性名称')
+    if p[1] in engine.attr_index_map.keys():
+        p[0] = engine.attr_index_map[p[1]]
+    else:
+        raise SqlColumnException('属性' + p[1] + '不存在！')
+
+
+def p_cond_stam(p):
+    '''cond_stam : WHERE or_cond
+                 | empty'''
+    debug_print = p.lexer.debug_print
+    if debug_print: print('生成条件表达式')
+    if len(p) == 2:
+        p[0] = []
+    else:
+        p[0] = p[2]
+        for i in p[0]:
+            # i.sort(key=lambda x: x[2])
+            # i.sort(key=lambda x: x[1])
+            i.sort(key=lambda x: x[0])
+
+
+def p_or_cond(p):
+    '''or_cond : and_cond OR or_cond
+               | and_cond'''
+    debug_print = p.lexer.debug_print
+    if debug_print: print('生成含或项的复合逻辑表达式')
+    if len(p) == 4:
+        p[0] = p[3] + [p[1]]
+    else:
+        p[0] = [p[1]]
+
+
+def p_and_cond(p):
+    '''and_cond : cond AND and_cond
+                | cond'''
+    debug_print = p.lexer.debug_print
+    if debug_print: print('生成含与项的复合逻辑表达式')
+    if len(p) == 4:
+        if debug_print: print(p[0], p[1], p[2], p[3])
+        p[0] = p[3] + [p[1]]
+        if debug_print: print(p[3])
+    else:
+        p[0] = [p[1]]
+
+
+def p_cond(p):
+    '''cond : attr pred value'''
+    debug_print = p.lexer.debug_print
+    engine = p.lexer.engine
+    if debug_print: print('生成元逻辑表达式')
+    pattern = engine.table_definition[p[1]]['type']
+    value = str(type(p[3]))
+    if isinstance(p[3], Param) or re.search(pattern, value):
+        p[0] = (p[1], p[2], p[3])
+    else:
+        raise ValueInvalidException(p[1] + '和' + p[3] + '类型不匹配！')
+
+
+def p_order_stam(p):
+    '''order_stam : ORDER BY attr ASC
+                  | ORDER BY attr DESC
+                  | ORDER BY attr
+                  | empty'''
+    debug_print = p.lexer.debug_print
+    if debug_print: print('生成排序方式 (属性, 是否降序)')
+    if len(p) == 5:
+        p[0] = (p[3], p[4].upper() == 'DESC')
+    elif len(p) == 4:
+        p[0] = (p[3], False)
+    else:
+        p[0] = None
+
+
+def p_limit_stam(p):
+    '''limit_stam : LIMIT count OFFSET count
+                  | LIMIT count
+                  | empty'''
+    debug_print = p.lexer.debug_print
+    if debug_print: print('生成结果行数限制 (行数, 跳过的行数)')
+    if len(p) == 5:
+        p[0] = (p[2], p[4])
+    elif len(p) == 3:
+        p[0] = (p[2], 0)
+    else:
+        p[0] = None
+
+
+def p_count(p):
+    '''count : NUMBER
+             | PARAM'''
+    debug_print = p.lexer.debug_print
+    if debug_print: print('获取行数')
+    if isinstance(p[1], Param) or (isinstance(p[1], int) and p[1] >= 0):  # 占位符在绑定时检查
+        p[0] = p[1]
+    else:
+        raise ValueInvalidException('LIMIT和OFFSET必须是非负整数，实际为' + repr(p[1]) + '！')
+
+
+def p_pred(p):
+    '''pred : EQ
+	                | NE
+	                | LT
+	                | LE
+	                | GT
+	                | GE
+	                | LIKE'''
+    debug_print = p.lexer.debug_print
+    if debug_print: print('获取谓词')
+    if re.match('[Ll][Ii][Kk][Ee]', p[1]):
+        p[0] = 'LIKE'
+    else:
+        p[0] = p[1]
+
+
+def p_values_list(p):
+    '''values_list : value COMMA values_list
+	                       | value'''
+    debug_print = p.lexer.debug_print
+    if debug_print: print('生成值列表，插入时使用')
+    if len(p) == 4:
+        p[0] = [p[1]] + p[3]
+    else:
+        p[0] = [p[1]]
+
+
+def p_value(p):
+    '''value : STR
+	                 | NUMBER
+	                 | BOOL
+	                 | PARAM'''
+    debug_print = p.lexer.debug_print
+    if debug_print: print('取值')
+    p[0] = p[1]
+
+
+def p_assg_stam(p):
+    '''assg_stam : assg COMMA assg_stam
+	                     | assg'''
+    debug_print = p.lexer.debug_print
+    if debug_print: print('合并赋值表达式，更新时使用')
+    if len(p) == 4:
+        p[0] = [p[1]] + p[3]
+    else:
+        p[0] = [p[1]]
+
+
+def p_assg(p):
+    '''assg : attr EQ value'''
+    debug_print = p.lexer.debug_print
+    engine = p.lexer.engine
+    if debug_print: print('将给定值绑定到指定属性上')
+    pattern = engine.table_definition[p[1]]['type']
+    value = str(type(p[3]))
+    if isinstance(p[3], Param) or re.search(pattern, value):
+        p[0] = (p[1], p[3])
+    else:
+        raise ValueInvalidException(p[1] + '和' + p[3] + '类型不匹配！')
+
+
+def p_empty(p):
+    'empty :'
+    debug_print = p.lexer.debug_print
+    if debug_print: print('空产生式')
+
+
+def p_error(p):
+    raise SqlSyntaxException('语法解析错误！')
+
+
+_shared = None
+_fast_parser = None
+# ply 的 LRParser.parse 把分析栈等状态存放在共享的语法分析器对象上，同一时刻只能有一个线程解析
+_parse_lock = threading.Lock()
+
+
+def build_tables(outputdir: str = None) -> None:
+    # 由语法规则重新生成 lextab.py 与 parsetab.py；修改上面的规则后需要运行一次
+    # python -c "from sql_engine.sql_engine import build_tables; build_tables()"
+    module = sys.modules[__name__]
+    outputdir = outputdir or os.path.dirname(os.path.abspath(__file__))
+    lex.lex(module=module).writetab('lextab', outputdir)
+    # 已有的 parsetab 与规则一致时 yacc 不会重写，因此先以临时模块名生成再替换
+    yacc.yacc(module=module, debug=False, tabmodule='parsetab_build', outputdir=outputdir,
+              errorlog=yacc.NullLogger())
+    build_path = os.path.join(outputdir, 'parsetab_build.py')
+    with open(build_path, encoding='utf-8') as f:
+        source = f.read().replace('# parsetab_build.py', '# parsetab.py', 1)
+    with open(os.path.join(outputdir, 'parsetab.py'), 'w', encoding='utf-8') as f:
+        f.write(source)
+    os.remove(build_path)
+
+
+def shared_parser() -> tuple:
+    # 以优化模式从随包发布的 lextab/parsetab 读取分析表，不校验也不写任何文件
+    global _shared
+    with _parse_lock:
+        if _shared is None:
+            module = sys.modules[__name__]
+            lexer = lex.lex(module=module, optimize=True, lextab=__package__ + '.lextab')
+            parser = yacc.yacc(module=module, debug=False, optimize=True, write_tables=False,
+                               tabmodule=__package__ + '.parsetab', errorlog=yacc.NullLogger())
+            _shared = (lexer, parser)
+    return _shared
+
+
+def shared_fast_parser() -> FastParser:
+    # 手写的解析后端，复用本模块的词法规则与语义动作，同样每个进程只构建一次
+    global _fast_parser
+    with _parse_lock:
+        if _fast_parser is None:
+            _fast_parser = FastParser(sys.modules[__name__])
+    return _fast_parser
+
+
+class EngineParser(object):
+    # 进程内共享的语法分析器加上某个引擎的词法分析器：parse 未给出 lexer 时使用该引擎的
+    # 与共享的分析器一样不是线程安全的，多线程时需像 SqlEngine.prepare 那样持有 _parse_lock
+    def __init__(self, parser, lexer):
+        self.parser = parser
+        self.lexer = lexer
+
+    def parse(self, input: str = None, lexer=None, **kwargs):
+        return self.parser.parse(input, lexer=lexer if lexer is not None else self.lexer, **kwargs)
+
+
 class SqlEngine(object):
-    def __init__(self, table_definition: dict):
+    def __init__(self, table_definition: dict, plan_cache_size: int = DEFAULT_PLAN_CACHE_SIZE,
+                 parser_backend: str = "ply"):
         self.table_definition = table_definition
         self.attr_index_map = {}
         # create attr -> index
         for key in table_definition.keys():
             self.attr_index_map[table_definition[key]['name']] = key
-        self.lexer, tokens = self.gen_lex()
-        self.parser = self.gen_yacc(self.lexer, tokens)
-
-    def resolve_sql_expr(self, sql_expr: str) -> List[Code]:
-        return self.parser.parse(sql_expr)
-
-    def gen_lex(self):
-        # reserved keyword or operator
-        reserved = {
-            'select': 'SELECT',
-            'insert': 'INSERT',
-            'delete': 'DELETE',
-            'update': 'UPDATE',
-            'set': 'SET',
-            'where': 'WHERE',
-            'values': 'VALUES',
-            '*': 'STAR',
-            '=': 'EQ',
-            '<': 'LT',
-            '<=': 'LE',
-            '>': 'GT',
-            '>=': 'GE',
-            '<>': 'NE',
-            'like': 'LIKE',
-            ',': 'COMMA',
-            'and': 'AND',
-            'or': 'OR'
-        }
-
-        # define tokens
-        tokens = ['STR', 'NUMBER', 'BOOL', 'KEYWORD'] + list(reserved.values())  # 'KEYWORD' only for lexical analysis
-
-        # define ignore
-        t_ignore = r' '
-
-        # # Regular expression rules for simple tokens
-        # t_STR = r"(?<=')[^']+(?=')|[^\s']+"
-
-        def t_NUMBER(t):
-            r'\d+\.?|\.\d+|\d+\.\d+'
-            t.value = float(t.value) if '.' in t.value else int(t.value)
-            return t
-
-        def t_BOOL(t):
-            r'[Tt][Rr][Uu][Ee]|[Ff][Aa][Ll][Ss][Ee]'
-            t.value = bool(re.match(r'[Tt][Rr][Uu][Ee]', t))
-            return t
-
-        def t_KEYWORD(t):
-            r'[a-zA-Z_]+|\=|\>\=|\<\=|\<\>|\<|\>|\*|,'
-            t.type = reserved.get(t.value.lower(), 'STR')
-            return t
-
-        def t_STR(t):
-            r"'[^']*'|[^\s']+"
-            if t.value[0] == "'" and t.value[-1] == "'":  # remove STR's quotation marks
-                t.value = t.value[1:-1]
-            return t
-
-        def t_error(t):
-            raise SqlSyntaxException('lexical anayasis failed at:(%s)' % t.value)
-
-        return lex.lex(), tokens
-
-    def gen_yacc(self, lexer, tokens: list, debug_print=False):
-        def p_sql_stam(p):
-            '''sql_stam : select_stam
-                        | insert_stam
-                        | update_stam
-                        | delete_stam'''
-            if debug_print: print('生成SQL语句')
-            p[0] = p[1]
-
-        def p_select_stam(p):
-            '''select_stam : SELECT attr_list cond_stam'''
-            if debug_print: print('生成查询语句')
-            p[0] = [
-                Code(opc='locate', opr=p[3]),
-                Code(opc='query', opr=None),
-                Code(opc='project', opr=p[2])
-            ]
-
-        def p_insert_stam(p):
-            '''insert_stam : INSERT attr_list VALUES values_list'''
-            if debug_print: print('生成插入语句')
-            if len(p[2]) != len(p[4]):
-                # 检查属性列表和值列表数量是否一致
-                raise SqlSyntaxException('属性列表和值列表数量不一致！')
-            temp = [None for i in range(len(self.table_definition))]
-            for i in range(len(p[2])):
-                # 检查属性列表和值列表对应位数据类型是否匹配，顺便给临时列表赋值
-                pattern = self.table_definition[p[2][i]]['type']
-                value = str(type(p[4][i]))
-                if re.search(pattern, value):
-                    temp[p[2][i]] = p[4][i]
-                else:
-                    raise ValueInvalidException(p[2][i] + '和' + p[4][i] + '类型不匹配！')
-            for i in range(len(p[2])):
-                # 再次检查是否允许为空
-                if temp[p[2][i]] is None and not self.table_definition[p[2][i]]['is_nullable']:
-                    raise SqlColumnException('字段' + p[2][i]['name'] + '不允许为空！')
-            p[0] = [Code(opc='insert', opr=tuple(temp))]
-
-        def p_update_stam(p):
-            '''update_stam : UPDATE SET assg_stam cond_stam'''
-            if debug_print: print('生成更新语句')
-            p[0] = [
-                Code(opc='locate', opr=p[4]),
-                Code(opc='update', opr=dict(p[3]))
-            ]
-
-        def p_delete_stam(p):
-            '''delete_stam : DELETE cond_stam'''
-            if debug_print: print('生成删除语句')
-            p[0] = [
-                Code(opc='locate', opr=p[2]),
-                Code(opc='delete', opr=None)
-            ]
-
-        def p_attr_list(p):
-            '''attr_list : attr COMMA attr_list
-                         | attr
-                         | STAR
-                         | empty'''
-            if debug_print: print('生成投影属性列表')
-            if p[1] == '*':
-                """attr_list : STAR"""
-                p[0] = list(range(len(self.attr_index_map)))
-            elif p[1] is None:
-                """attr_list : empty"""
-                p[0] = None
-            elif isinstance(p[1], int):
-                if len(p) == 4:
-                    """attr_list : attr COMMA attr_list"""
-                    p[0] = [p[1]] + p[3]
-                else:
-                    p[0] = [p[1]]
-
-        def p_attr(p):
-            '''attr : STR'''
-            if debug_print: print('获取属性名称')
-            if p[1] in self.attr_index_map.keys():
-                p[0] = self.attr_index_map[p[1]]
-            else:
-                raise SqlColumnException('属性' + p[1] + '不存在！')
-
-        def p_cond_stam(p):
-            '''cond_stam : WHERE or_cond
-                         | empty'''
-            if debug_print: print('生成条件表达式')
-            if len(p) == 2:
-                p[0] = []
+        # parser_backend 为 "ply"（LALR 分析表）或 "fast"（手写的递归下降），两者生成相同的 Code
+        if parser_backend == "ply":
+            self.lexer, tokens = self.gen_lex()
+            self.parser = self.gen_yacc(self.lexer, tokens)
+        elif parser_backend == "fast":
+            self.lexer = FastLexer(self)
+            self.parser = EngineParser(shared_fast_parser(), self.lexer)
+        else:
+            raise ValueError('unknown parser_backend ' + str(parser_backend))
+        # 规范化后的 SQL（字面值替换为占位符）-> (code_list, 占位符个数) 的 LRU 缓存；缓存的计划由各次执行共享，不能被修改
+        self.plan_cache = OrderedDict()
+        self.plan_cache_size = plan_cache_size
+        # 语句原文 -> normalize_sql 的结果，同一原文重复执行时（如带参数的语句）不必再切分；与计划缓存同样大小，先进先出
+        self.normalized_cache = OrderedDict()
+        self.plan_lock = threading.Lock()  # 保护计划缓存与本引擎的词法状态，使 prepare 可以被多个线程调用
+
+    def resolve_sql_expr(self, sql_expr: str, params: tuple = None) -> List[Code]:
+        return self.prepare(sql_expr).bind(params if params is not None else ())
+
+    def prepare(self, sql_expr: str) -> PreparedStatement:
+        with self.plan_lock:
+            normalized = self.normalized_cache.get(sql_expr)
+        if normalized is None:
+            normalized = normalize_sql(sql_expr)
+            with self.plan_lock:
+                self.normalized_cache[sql_expr] = normalized
+                if len(self.normalized_cache) > self.plan_cache_size:
+                    self.normalized_cache.popitem(last=False)
+        key, slots = normalized
+        if all(isinstance(value, Param) for value in slots):
+            return PreparedStatement(self, *self.__plan(key))
+        try:
+            return PreparedStatement(self, *self.__plan(key), slots)
+        except SqlSyntaxException:
+            # 字面值所在的位置不接受占位符（如带引号的属性名）时按原文解析
+            return PreparedStatement(self, *self.__plan(collapse_spaces(sql_expr)))
+
+    def __plan(self, key: str) -> tuple:
+        with self.plan_lock:
+            plan = self.plan_cache.get(key)
+            if plan is None:
+                with _parse_lock:
+                    self.lexer.param_count = 0
+                    code_list = self.parser.parse(key)
+                    plan = (code_list, self.lexer.param_count)
+                self.plan_cache[key] = plan
+                if len(self.plan_cache) > self.plan_cache_size:
+                    self.plan_cache.popitem(last=False)
             else:
-                p[0] = p[2]
-                for i in p[0]:
-                    # i.sort(key=lambda x: x[2])
-                    # i.sort(key=lambda x: x[1])
-                    i.sort(key=lambda x: x[0])
-
-        def p_or_cond(p):
-            '''or_cond : and_cond OR or_cond
-                       | and_cond'''
-            if debug_print: print('生成含或项的复合逻辑表达式')
-            if len(p) == 4:
-                p[0] = p[3] + [p[1]]
+                self.plan_cache.move_to_end(key)
+        return plan
+
+    def bind_params(self, code_list: List[Code], param_count: int, params: tuple) -> List[Code]:
+        # 生成把占位符替换为实际值的新计划，类型与非空检查同解析字面值时一致
+        if len(params) != param_count:
+            raise ValueInvalidException('需要' + str(param_count) + '个参数，实际为' + str(len(params)) + '个！')
+        if param_count == 0:
+            return code_list
+        bound = []
+        for code in code_list:
+            if code.opc == 'locate':
+                opr = [[(attr, pred, self.__bind_value(attr, value, params)) for attr, pred, value in and_cond]
+                       for and_cond in code.opr]
+            elif code.opc == 'update':
+                opr = {attr: self.__bind_value(attr, value, params) for attr, value in code.opr.items()}
+            elif code.opc == 'insert':
+                opr = tuple(self.__bind_value(attr, value, params) for attr, value in enumerate(code.opr))
+            elif code.opc == 'limit':
+                opr = tuple(self.__bind_count(value, params) for value in code.opr)
             else:
-                p[0] = [p[1]]
-
-        def p_and_cond(p):
-            '''and_cond : cond AND and_cond
-                        | cond'''
-            if debug_print: print('生成含与项的复合逻辑表达式')
-            if len(p) == 4:
-                if debug_print: print(p[0], p[1], p[2], p[3])
-                p[0] = p[3] + [p[1]]
-                if debug_print: print(p[3])
-            else:
-                p[0] = [p[1]]
-
-        def p_cond(p):
-            '''cond : attr pred value'''
-            if debug_print: print('生成元逻辑表达式')
-            pattern = self.table_definition[p[1]]['type']
-            value = str(type(p[3]))
-            if re.search(pattern, value):
-                p[0] = (p[1], p[2], p[3])
-            else:
-                raise ValueInvalidException(p[1] + '和' + p[3] + '类型不匹配！')
-
-        def p_pred(p):
-            '''pred : EQ
- 	                | NE
- 	                | LT
- 	                | LE
- 	                | GT
- 	                | GE
- 	                | LIKE'''
-            if debug_print: print('获取谓词')
-            if re.match('[Ll][Ii][Kk][Ee]', p[1]):
-                p[0] = 'LIKE'
-            else:
-                p[0] = p[1]
-
-        def p_values_list(p):
-            '''values_list : value COMMA values_list
- 	                       | value'''
-            if debug_print: print('生成值列表，插入时使用')
-            if len(p) == 4:
-                p[0] = [p[1]] + p[3]
-            else:
-                p[0] = [p[1]]
-
-        def p_value(p):
-            '''value : STR
- 	                 | NUMBER
- 	                 | BOOL'''
-            if debug_print: print('取值')
-            p[0] = p[1]
-
-        def p_assg_stam(p):
-            '''assg_stam : assg COMMA assg_stam
- 	                     | assg'''
-            if debug_print: print('合并赋值表达式，更新时使用')
-            if len(p) == 4:
-                p[0] = [p[1]] + p[3]
-            else:
-                p[0] = [p[1]]
-
-        def p_assg(p):
-            '''assg : attr EQ value'''
-            if debug_print: print('将给定值绑定到指定属性上')
-            pattern = self.table_definition[p[1]]['type']
-            value = str(type(p[3]))
-            if re.search(pattern, value):
-                p[0] = (p[1], p[3])
-            else:
-                raise ValueInvalidException(p[1] + '和' + p[3] + '类型不匹配！')
-
-        def p_empty(p):
-            'empty :'
-            if debug_print: print('空产生式')
+                opr = code.opr
+            bound.append(Code(opc=code.opc, opr=opr))
+        return bound
+
+    def __bind_value(self, attr: int, value, params: tuple):
+        if not isinstance(value, Param):
+            return value
+        value = params[value.index]
+        definition = self.table_definition[attr]
+        if value is None:
+            if not definition['is_nullable']:
+                raise SqlColumnException('字段' + definition['name'] + '不允许为空！')
+        elif not re.search(definition['type'], str(type(value))):
+            raise ValueInvalidException(definition['name'] + '和' + repr(value) + '类型不匹配！')
+        return value
+
+    @staticmethod
+    def __bind_count(value, params: tuple) -> int:
+        if not isinstance(value, Param):
+            return value
+        value = params[value.index]
+        if type(value) is not int or value < 0:
+            raise ValueInvalidException('LIMIT和OFFSET必须是非负整数，实际为' + repr(value) + '！')
+        return value
 
-        def p_error(p):
-            raise SqlSyntaxException('语法解析错误！')
+    def gen_lex(self):
+        # 克隆共享的词法分析器并绑定到本引擎，各引擎的词法状态互不影响
+        lexer = shared_parser()[0].clone()
+        lexer.engine = self
+        lexer.param_count = 0
+        lexer.debug_print = False
+        return lexer, tokens
 
-        yaccer = yacc.yacc()
-        # yaccer.parse(lexer=lexer)
-        return yaccer
+    def gen_yacc(self, lexer, tokens: list, debug_print=False):
+        # 返回绑定了 gen_lex 所得词法分析器的共享语法分析器，parse(sql) 即可直接使用
+        lexer.debug_print = debug_print
+        return EngineParser(shared_parser()[1], lexer)
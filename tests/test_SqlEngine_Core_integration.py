@@ -1,6 +1,7 @@
 import unittest
 from typing import List, Dict, Tuple, Set
 from functools import reduce
+from contextlib import nullcontext
 
 from core import SqlVm, Core
 from sql_engine.code import Code
@@ -38,6 +39,15 @@ class MockStorageCoordinator(object):
             retTbl.append(self.table_content[index])
         return retTbl
 
+    def iter_query(self, sub: List[int]):
+        return iter(self.query(sub))
+
+    def read_locked(self):
+        return nullcontext()
+
+    def write_locked(self):
+        return nullcontext()
+
     def get_data_definition(self) -> dict:
         self.call_seq.append(('get_data_definition'))
         return self.table_definition
@@ -184,10 +194,9 @@ class Test_Core_SqlEngine_integration1(unittest.TestCase):
         codes = self.parser.parse(sql_expr)
         vmResult = self.vm.run(codes, self.db)
         self.assertTrue(vmResult['is_success'])
-        self.assertEqual(3, len(self.db.call_seq))
-        self.assertEqual(('locate_all'), self.db.call_seq[0])
-        self.assertEqual(('locate', 2, '=', 'JackSon Li'), self.db.call_seq[1])
-        self.assertEqual(('delete', [1]), self.db.call_seq[2])
+        self.assertEqual(2, len(self.db.call_seq))
+        self.assertEqual(('locate', 2, '=', 'JackSon Li'), self.db.call_seq[0])
+        self.assertEqual(('delete', [1]), self.db.call_seq[1])
 
     def test_run_sample5(self):
         sql_expr = "UPDATE SET grade=95 WHERE name = 'JackSon Li' and name <> '' OR cno <> 3"
@@ -200,9 +209,9 @@ class Test_Core_SqlEngine_integration1(unittest.TestCase):
         vmResult = self.vm.run(codes, self.db)
         self.assertTrue(vmResult['is_success'])
         seq = self.db.call_seq
-        self.assertEqual(5, len(seq))
-        self.assertEqual(('locate_all'), seq[0])
-        self.assertEqual(('update', {3: 95}, [1, 3, 5, 7, 9]), self.db.call_seq[4])
+        self.assertEqual(4, len(seq))
+        self.assertNotIn(('locate_all'), seq)
+        self.assertEqual(('update', {3: 95}, [1, 3, 5, 7, 9]), self.db.call_seq[3])
 
 
 class Test_Core_SqlEngine_integration2(unittest.TestCase):
@@ -297,10 +306,9 @@ class Test_Core_SqlEngine_integration2(unittest.TestCase):
         self.assertTrue(result['is_success'])
         self.assertEqual(sql_request['serial_number'], result['serial_number'])
         self.assertEqual(sql_request['sql_expr'], result['sql_expr'])
-        self.assertEqual(3, len(self.core.db_m.call_seq))
-        self.assertEqual(('locate_all'), self.core.db_m.call_seq[0])
-        self.assertEqual(('locate', 2, '=', 'JackSon Li'), self.core.db_m.call_seq[1])
-        self.assertEqual(('delete', [1]), self.core.db_m.call_seq[2])
+        self.assertEqual(2, len(self.core.db_m.call_seq))
+        self.assertEqual(('locate', 2, '=', 'JackSon Li'), self.core.db_m.call_seq[0])
+        self.assertEqual(('delete', [1]), self.core.db_m.call_seq[1])
 
     def test_run_sample5(self):
         sql_expr = "UPDATE SET grade=95 WHERE name = 'JackSon Li' and name <> '' OR cno <> 3"
@@ -315,6 +323,6 @@ class Test_Core_SqlEngine_integration2(unittest.TestCase):
         self.assertEqual(sql_request['serial_number'], result['serial_number'])
         self.assertEqual(sql_request['sql_expr'], result['sql_expr'])
         seq = self.core.db_m.call_seq
-        self.assertEqual(5, len(seq))
-        self.assertEqual(('locate_all'), seq[0])
-        self.assertEqual(('update', {3: 95}, [1, 3, 5, 7, 9]), self.core.db_m.call_seq[4])
+        self.assertEqual(4, len(seq))
+        self.assertNotIn(('locate_all'), seq)
+        self.assertEqual(('update', {3: 95}, [1, 3, 5, 7, 9]), self.core.db_m.call_seq[3])
@@ -1,6 +1,7 @@
 import unittest
 from typing import List, Dict, Tuple, Set
 from functools import reduce
+from contextlib import nullcontext
 from core import SqlVm, Core, Code
 
 
@@ -35,6 +36,15 @@ class MockStorageCoordinator(object):
             retTbl.append(self.table_content[index])
         return retTbl
 
+    def iter_query(self, sub: List[int]):
+        return iter(self.query(sub))
+
+    def read_locked(self):
+        return nullcontext()
+
+    def write_locked(self):
+        return nullcontext()
+
     def get_data_definition(self) -> dict:
         self.call_seq.append(('get_data_definition'))
         return self.table_definition
@@ -144,6 +154,21 @@ class Test_SqlVm_locate(unittest.TestCase):
         self.assertEqual([1, 2, 3, 4, 5, 7, 9], self.vm.reg_selector)
 
 
+    def test_locate_empty_conjunction(self):
+        db = MockStorageCoordinator({('sno', '>', 10): [1, 2, 3], ('name', '=', 'Nobody'): []},
+                                    TABLE_DEFINITION_SAMPLE, [])
+        sample_condition = [
+            [
+                ('name', '=', 'Nobody'),
+                ('sno', '>', 10)
+            ]
+        ]
+        self.vm.locate(sample_condition, db)
+        self.assertEqual([], self.vm.reg_selector)
+        # the second condition is never located once the intersection is empty
+        self.assertEqual([('locate', 'name', '=', 'Nobody')], db.call_seq)
+
+
 class Test_SqlVm_project(unittest.TestCase):
     @classmethod
     def setUpClass(self):
@@ -284,10 +309,9 @@ class Test_SqlVm(unittest.TestCase):
         codes[0].opr = [[(2, '=', 'JackSon Li')]]
         vmResult = self.vm.run(codes, self.db)
         self.assertTrue(vmResult['is_success'])
-        self.assertEqual(3, len(self.db.call_seq))
-        self.assertEqual(('locate_all'), self.db.call_seq[0])
-        self.assertEqual(('locate', 2, '=', 'JackSon Li'), self.db.call_seq[1])
-        self.assertEqual(('delete', [1]), self.db.call_seq[2])
+        self.assertEqual(2, len(self.db.call_seq))
+        self.assertEqual(('locate', 2, '=', 'JackSon Li'), self.db.call_seq[0])
+        self.assertEqual(('delete', [1]), self.db.call_seq[1])
 
     def test_run_sample5(self):
         codes = [Code(opc='locate', opr=None),
@@ -298,12 +322,23 @@ class Test_SqlVm(unittest.TestCase):
         vmResult = self.vm.run(codes, self.db)
         self.assertTrue(vmResult['is_success'])
         seq = self.db.call_seq
-        self.assertEqual(5, len(seq))
-        self.assertEqual(('locate_all'), seq[0])
-        self.assertEqual(('locate', 2, '=', 'JackSon Li'), seq[1])
-        self.assertEqual(('locate', 2, '<>', ''), seq[2])
-        self.assertEqual(('locate', 1, '<>', 3), seq[3])
-        self.assertEqual(('update', {3: 95}, [1, 3, 5, 7, 9]), self.db.call_seq[4])
+        self.assertEqual(4, len(seq))
+        self.assertEqual(('locate', 2, '=', 'JackSon Li'), seq[0])
+        self.assertEqual(('locate', 2, '<>', ''), seq[1])
+        self.assertEqual(('locate', 1, '<>', 3), seq[2])
+        self.assertEqual(('update', {3: 95}, [1, 3, 5, 7, 9]), self.db.call_seq[3])
+
+    def test_run_limit(self):
+        codes = [Code(opc='locate', opr=[[(1, '<>', 3)]]),
+                 Code(opc='query', opr=None),
+                 Code(opc='project', opr=[0, 2]),
+                 Code(opc='limit', opr=(2, 1))]
+        vmResult = self.vm.run(codes, self.db)
+        self.assertTrue(vmResult['is_success'])
+        self.assertEqual([(13, 'Beta'), (15, 'Delta')], vmResult['content'])
+        rows = self.vm.stream(codes[:3], self.db)
+        self.assertEqual((11, 'JackSon Li'), next(rows))
+        self.assertEqual(4, len(list(rows)))
 
 
 if __name__ == '__main__':
@@ -1,7 +1,20 @@
 import unittest
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
 from data_storage.bplus_tree import Node, BPlusTree
+from data_storage.paged_bplus_tree import PagedBPlusTree, PageOverflowException
 from data_storage.data_table import DataTable
+from data_storage.columnar_table import ColumnarDataTable, numpy
+from data_storage.mmap_table import MmapDataTable
 from data_storage.storage_coordinator import StorageCoordinator,NotUniqueException
+from data_storage.posting_list import PostingList
+from data_storage.bitmap import Bitmap
+from data_storage.wal import WriteAheadLog, WAL_FILE
+from data_storage.rwlock import ReadWriteLock
+from data_storage.external_sort import external_sort
 
 
 class Test_Node(unittest.TestCase):
@@ -15,6 +28,22 @@ class Test_Node(unittest.TestCase):
             self.assertEqual(self.node.values,sample[:i+1])
 
 
+    def test_compact_layout(self):
+        node = Node(order=3)
+        self.assertFalse(hasattr(node, '__dict__'))
+        node.insert_in_leaf(value="A99", pointer=7)
+        self.assertEqual(node.pointers, [7])
+        node.insert_in_leaf(value="A99", pointer=9)
+        self.assertEqual(list(node.pointers[0]), [7, 9])
+        tree = BPlusTree(name=1, order=3)
+        for i in range(3):
+            tree.insert(value=5, pointer=i)
+        tree.delete(pointer=1, value=5)
+        tree.delete(pointer=0, value=5)
+        self.assertEqual(tree.root.pointers, [2])
+        self.assertEqual(tree.dict_structure()['leaf_pointer'], [[2]])
+
+
 class Test_BPlusTree(unittest.TestCase):
     @classmethod
     def setUpClass(self) -> None:
@@ -62,6 +91,342 @@ class Test_BPlusTree(unittest.TestCase):
             self.tree.delete(pointer=i,value=item)
             self.assertEqual(self.tree.find(value=item,op="="),[])
 
+    def test_high_order(self):
+        # large fanout keeps the tree shallow and must survive deletes with rebalancing
+        for order in [4, 5, 64, 256]:
+            self.tree = BPlusTree(name=1, order=order)
+            sample = [(i * 7919) % 2000 for i in range(2000)]
+            for i, item in enumerate(sample):
+                self.tree.insert(value=item, pointer=i)
+            for i, item in enumerate(sample):
+                if i % 2 == 0:
+                    self.tree.delete(pointer=i, value=item)
+            for i, item in enumerate(sample):
+                self.assertEqual(self.tree.find(value=item, op="="), [] if i % 2 == 0 else [i])
+            self.assertEqual(len(self.tree.find(value=1000, op=">=")), 500)
+            self.assertEqual(len(self.tree.find(value=1000, op="<")), 500)
+
+    def test_invalid_order(self):
+        self.assertRaises(ValueError, BPlusTree, 1, 2)
+
+    def test_bulk_load(self):
+        sample = [(i * 37) % 101 for i in range(300)]
+        for order in [3, 4, 5, 64]:
+            for fill_factor in [0.5, 0.7, 1.0]:
+                self.tree = BPlusTree(name=1, order=order)
+                self.tree.bulk_load([(item, i) for i, item in enumerate(sample)], fill_factor)
+                for item in range(101):
+                    self.assertEqual(self.tree.find(value=item, op="="),
+                                     [i for i, v in enumerate(sample) if v == item])
+                self.assertEqual(len(self.tree.find(value=50, op="<")), len([v for v in sample if v < 50]))
+                # the bulk loaded tree keeps working with normal updates
+                for i, item in enumerate(sample):
+                    self.tree.delete(pointer=i, value=item)
+                    self.tree.insert(value=item + 200, pointer=i)
+                self.assertEqual(sorted(self.tree.find(value=200, op=">=")), list(range(300)))
+                self.assertEqual(self.tree.find(value=200, op="<"), [])
+
+    def test_cursor(self):
+        self.tree = BPlusTree(name=1, order=4)
+        sample = [58, 74, 81, 88, 90, 92, 95, 74]
+        for i, item in enumerate(sample):
+            self.tree.insert(value=item, pointer=i)
+        self.assertEqual([v for v, _ in self.tree.cursor()], [58, 74, 81, 88, 90, 92, 95])
+        self.assertEqual([v for v, _ in self.tree.cursor(reverse=True)], [95, 92, 90, 88, 81, 74, 58])
+        self.assertEqual([(v, list(p)) for v, p in self.tree.cursor(74, 88)], [(74, [1, 7]), (81, [2]), (88, [3])])
+        self.assertEqual([v for v, _ in self.tree.cursor(74, 90, include_low=False, include_high=False)], [81, 88])
+        self.assertEqual([v for v, _ in self.tree.cursor(80, 93, reverse=True)], [92, 90, 88, 81])
+        self.assertEqual([v for v, _ in self.tree.cursor(low=91)], [92, 95])
+        self.assertEqual([v for v, _ in self.tree.cursor(high=60, include_high=False, reverse=True)], [58])
+        self.assertEqual(list(self.tree.cursor(100)), [])
+        # early termination only touches the beginning of the leaf chain
+        it = self.tree.iter_find(value=74, op=">")
+        self.assertEqual([next(it), next(it)], [2, 3])
+        self.assertRaises(ValueError, self.tree.find, 74, "<>")
+
+    def test_counted(self):
+        self.tree = BPlusTree(name=1, order=4, counted=True)
+        sample = [58, 74, 81, 88, 90, 92, 95, 74, 74, 90]
+        for i, item in enumerate(sample):
+            self.tree.insert(value=item, pointer=i)
+        self.tree.delete(pointer=5, value=92)
+        self.assertEqual(self.tree.size(), 9)
+        self.assertEqual(self.tree.rank(81), 4)
+        self.assertEqual(self.tree.rank(74, inclusive=True), 4)
+        self.assertEqual(self.tree.count_range(74, 90), 7)
+        self.assertEqual(self.tree.count_range(74, 90, include_low=False, include_high=False), 2)
+        for op in ["=", "<", "<=", ">", ">="]:
+            for item in [0, 74, 89, 90, 100]:
+                self.assertEqual(self.tree.count(item, op), len(self.tree.find(item, op)))
+        self.assertEqual([self.tree.kth(k) for k in range(9)], [58, 74, 74, 74, 81, 88, 90, 90, 95])
+        self.assertRaises(IndexError, self.tree.kth, 9)
+        self.tree.bulk_load([(item, i) for i, item in enumerate(sample)])
+        self.assertEqual(self.tree.count_range(low=90), 4)
+        self.assertRaises(ValueError, BPlusTree(name=1).rank, 1)
+
+    def test_batch(self):
+        for order in [3, 4, 7]:
+            self.tree = BPlusTree(name=1, order=order, counted=True)
+            self.tree.insert_many([(i % 17, i) for i in range(60)])
+            self.assertEqual(self.tree.size(), 60)
+            self.assertEqual(self.tree.find(value=5, op="="), [5, 22, 39, 56])
+            self.assertEqual(self.tree.find(value=20, op=">="), [])
+            self.tree.delete_many([(i % 17, i) for i in range(0, 60, 2)] + [(3, 1000)])
+            self.assertEqual(self.tree.size(), 30)
+            self.assertEqual(self.tree.find(value=5, op="="), [5, 39])
+            self.assertEqual(sorted(self.tree.find(value=4, op="<")), [1, 3, 17, 19, 35, 37, 51, 53])
+            self.assertEqual(self.tree.count(4, "<"), 8)
+            self.tree.delete_many([(i % 17, i) for i in range(1, 60, 2)])
+            self.assertEqual(self.tree.size(), 0)
+            self.assertTrue(self.tree.root.is_leaf)
+            self.assertEqual(self.tree.find(value=0, op=">="), [])
+
+    def test_batch_shared_key(self):
+        # 同一个键的多行一次删除：大部分行（差集重建）、少量行（逐行删除）、重复与不存在的行
+        self.tree = BPlusTree(name=1, order=4, counted=True)
+        self.tree.insert_many([(i % 2, i) for i in range(2000)])
+        self.tree.delete_many([(0, i) for i in range(0, 1600, 2)] + [(0, 2), (0, 1), (1, 1), (1, 3)])
+        self.assertEqual(self.tree.find(value=0, op="="), list(range(1600, 2000, 2)))
+        self.assertEqual(self.tree.find(value=1, op="="), list(range(5, 2000, 2)))
+        self.assertEqual(self.tree.size(), 1198)
+        self.tree.delete_many([(0, i) for i in range(1600, 1998, 2)])
+        self.assertEqual(self.tree.find(value=0, op="="), [1998])
+        self.tree.delete_many([(0, 1998), (1, 1)])
+        self.assertEqual(self.tree.find(value=0, op="="), [])
+        self.assertEqual(self.tree.count(1, "="), 998)
+
+    def test_statistics(self):
+        self.tree = BPlusTree(name=1, order=4)
+        stats = self.tree.statistics()
+        self.assertEqual((stats['height'], stats['nodes_per_level'], stats['key_count']), (1, [1], 0))
+        for i in range(100):
+            self.tree.insert(value=i, pointer=i)
+        stats = self.tree.statistics()
+        self.assertEqual(stats['key_count'], 100)
+        self.assertEqual(stats['nodes_per_level'][0], 1)
+        self.assertEqual(stats['nodes_per_level'][-1], stats['leaf_count'])
+        self.assertEqual(stats['height'], len(stats['nodes_per_level']))
+        self.assertEqual(stats['splits'], sum(stats['nodes_per_level']) - stats['height'])
+        self.assertGreater(stats['estimated_comparisons'], 0)
+        self.assertAlmostEqual(stats['avg_leaf_fill'], 100 / (stats['leaf_count'] * 3))
+        for i in range(100):
+            self.tree.delete(pointer=i, value=i)
+        stats = self.tree.statistics()
+        self.assertEqual(stats['height'], 1)
+        self.assertGreater(stats['merges'], 0)
+        self.assertGreater(stats['borrows'], 0)
+        self.tree.bulk_load([(i, i) for i in range(100)])
+        self.assertGreater(self.tree.statistics()['avg_leaf_fill'], 0.95)
+
+    def test_concurrent_find(self):
+        # 多个读者同时查找（各自持有共享的读锁）：比较次数不丢失，倒排项的前缀和缓存由多个读者同时建立时结果正确
+        self.tree = BPlusTree(name=1, order=8)
+        self.tree.bulk_load([(i % 10, i * 3) for i in range(5000)])
+        leaf = self.tree.search(7)
+        posting = leaf.pointers[leaf.values.index(7)]
+        before = self.tree.statistics()['estimated_comparisons']
+        self.tree.find(value=5, op="=")
+        per_find = self.tree.statistics()['estimated_comparisons'] - before
+        errors = []
+
+        def reader():
+            if not all(row in posting for row in range(21, 15000, 30)) or 22 in posting:
+                errors.append('contains')
+            for _ in range(300):
+                if self.tree.find(value=5, op="=") != list(range(15, 15000, 30)):
+                    errors.append('find')
+
+        threads = [threading.Thread(target=reader) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(self.tree.statistics()['estimated_comparisons'], before + per_find * (1 + 300 * 4))
+
+    def test_bulk_load_empty(self):
+        self.tree = BPlusTree(name=1, order=3)
+        self.tree.insert(value=1, pointer=0)
+        self.tree.bulk_load([])
+        self.assertEqual(self.tree.find(value=1, op=">="), [])
+        self.assertRaises(ValueError, self.tree.bulk_load, [], 0)
+
+
+class Test_PagedBPlusTree(unittest.TestCase):
+    def setUp(self) -> None:
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'index.pages')
+
+    def tearDown(self) -> None:
+        self.dir.cleanup()
+
+    def test_sample(self):
+        tree = PagedBPlusTree(name=1, path=self.path, order=4, pool_size=8)
+        sample = [58, 74, 81, 88, 90, 92, 95, 74] * 20
+        for i, item in enumerate(sample):
+            tree.insert(value=item, pointer=i)
+        self.assertEqual(tree.find(value=58, op="="), list(range(0, 160, 8)))
+        self.assertEqual(len(tree.find(value=88, op="<")), 80)
+        self.assertEqual(len(tree.find(value=90, op=">=")), 60)
+        self.assertEqual([v for v, _ in tree.cursor(80, 93, reverse=True)], [92, 90, 88, 81])
+        for i, item in enumerate(sample):
+            if item == 74:
+                tree.delete(pointer=i, value=item)
+        self.assertEqual(tree.find(value=74, op="="), [])
+        self.assertEqual(tree.dict_structure()['type'], 'node')
+        stats = tree.statistics()
+        self.assertEqual(stats['key_count'], 120)
+        self.assertEqual(stats['splits'], stats['page_count'] - 1 - stats['height'])
+        self.assertRaises(ValueError, tree.find, 74, "<>")
+        tree.close()
+        # 重新打开页文件后索引内容不变
+        tree = PagedBPlusTree(name=1, path=self.path, pool_size=8)
+        self.assertEqual(tree.order, 4)
+        self.assertEqual(tree.find(value=58, op="="), list(range(0, 160, 8)))
+        self.assertEqual(len(tree.find(value=74, op=">")), 100)
+        tree.close()
+
+    def test_page_size(self):
+        tree = PagedBPlusTree(name=1, path=self.path, order=128, page_size=256, pool_size=8)
+        for i in range(300):
+            tree.insert(value='name%03d' % i + '-' * (i % 30), pointer=i)
+        self.assertEqual(tree.find(value='name150', op="<"), list(reversed(range(150))))
+        self.assertRaises(PageOverflowException, tree.insert, 'x' * 200, 0)
+        tree.bulk_load([('k%03d' % (i % 50), i) for i in range(200)], 0.7)
+        self.assertEqual(tree.find(value='k007', op="="), [7, 57, 107, 157])
+        tree.close()
+
+    def test_evicted_pages(self):
+        # 页被换出再读回后，按字节数的分裂判断与一直留在缓冲池中时相同
+        small = PagedBPlusTree(name=1, path=self.path, order=128, page_size=256, pool_size=8)
+        large = PagedBPlusTree(name=1, path=os.path.join(self.dir.name, 'large.pages'), order=128, page_size=256,
+                               pool_size=256)
+        for i in range(400):
+            for tree in (small, large):
+                tree.insert(value='v%02d' % (i * 37 % 50), pointer=i)
+        self.assertEqual(small.dict_structure(), large.dict_structure())
+        self.assertEqual(small.find(value='v07', op="="), large.find(value='v07', op="="))
+        self.assertEqual(len(small.find(value='v07', op="=")), 8)
+        small.close()
+        large.close()
+
+    def test_coordinator(self):
+        table_definition = {
+            0: {'name': 'sno', 'type': 'int', 'is_nullable': False, 'is_unique': True, 'is_key': True,
+                'index_storage': 'paged', 'index_path': self.path, 'index_order': 16},
+            1: {'name': 'grade', 'type': 'int', 'is_nullable': False, 'is_unique': False, 'is_key': True},
+        }
+        storage = StorageCoordinator([(i, i % 10) for i in range(100)], table_definition)
+        self.assertIsInstance(storage.bplustree_m[0], PagedBPlusTree)
+        storage.delete(list(range(0, 100, 2)))
+        storage.update({0: 1000}, [1])
+        self.assertEqual(sorted(storage.locate(0, '<', 10)), [3, 5, 7, 9])
+        self.assertEqual(storage.locate(0, '=', 1000), [1])
+        self.assertRaises(NotUniqueException, storage.insert, (1000, 1))
+        storage.close()
+        # 以空表重新打开时，页文件中上次的索引被清空
+        storage = StorageCoordinator([], table_definition)
+        self.assertEqual(storage.locate(0, '>=', 0), [])
+        storage.insert((3, 1))
+        self.assertEqual(storage.locate(0, '=', 3), [0])
+        self.assertEqual(storage.query(storage.locate(0, '>=', 0)), [(3, 1)])
+        storage.close()
+        del table_definition[0]['index_path']
+        self.assertRaises(ValueError, StorageCoordinator, [], table_definition)
+
+
+class Test_PostingList(unittest.TestCase):
+    def test_sparse(self):
+        posting = PostingList.from_sorted([3, 10, 700, 70000])
+        self.assertFalse(posting.is_bitmap())
+        self.assertEqual(posting.deltas.typecode, 'I')
+        posting.add(5)
+        posting.add(70001)
+        posting.remove(700)
+        self.assertEqual(list(posting), [3, 5, 10, 70000, 70001])
+        self.assertIn(10, posting)
+        self.assertNotIn(700, posting)
+        self.assertRaises(ValueError, posting.remove, 700)
+
+    def test_dense(self):
+        posting = PostingList.from_sorted(range(100, 1100))
+        self.assertTrue(posting.is_bitmap())
+        posting.add(50)
+        posting.remove(600)
+        self.assertEqual(len(posting), 1000)
+        self.assertEqual(list(posting), [50] + list(range(100, 600)) + list(range(601, 1100)))
+        # thinning out a bitmap falls back to the delta layout
+        for row in range(100, 1100):
+            if row % 25 != 0 and row != 600:
+                posting.remove(row)
+        self.assertFalse(posting.is_bitmap())
+        self.assertEqual(list(posting), [50] + [row for row in range(100, 1100, 25) if row != 600])
+
+    def test_in_place(self):
+        # 删除首尾的行与在中间插入都在原处完成，不重新编码整个倒排项（否则逐行删除为平方复杂度）
+        encode = PostingList._PostingList__encode
+        encoded = []
+        PostingList._PostingList__encode = lambda posting, rows: encoded.append(len(rows)) or encode(posting, rows)
+        try:
+            dense = PostingList.from_sorted(range(0, 20000, 2))
+            sparse = PostingList.from_sorted(range(0, 2000000, 200))
+            self.assertTrue(dense.is_bitmap())
+            self.assertFalse(sparse.is_bitmap())
+            for i in range(1000):
+                dense.remove(2 * i)
+                dense.remove(19998 - 2 * i)
+                sparse.remove(200 * i)
+                sparse.remove(1999800 - 200 * i)
+                sparse.add(1000001 + 200 * i)
+                self.assertIn(1000001 + 200 * i, sparse)
+            sparse.remove(1000200)
+        finally:
+            PostingList._PostingList__encode = encode
+        self.assertEqual(encoded, [])
+        self.assertEqual(list(dense), list(range(2000, 18000, 2)))
+        self.assertEqual((dense.first, dense.last), (2000, 17998))
+        expected = sorted(set(range(200000, 1800000, 200)) - {1000200} | set(range(1000001, 1200001, 200)))
+        self.assertEqual(list(sparse), expected)
+        self.assertEqual(list(PostingList.from_sorted(expected)), expected)
+
+    def test_set_operations(self):
+        evens = PostingList.from_sorted(range(0, 1000, 2))
+        threes = PostingList.from_sorted(range(0, 1000, 3))
+        sparse = PostingList.from_sorted([1, 6, 999, 5000])
+        for a, b in [(evens, threes), (evens, sparse), (sparse, threes)]:
+            self.assertEqual(list(a.union(b)), sorted(set(a) | set(b)))
+            self.assertEqual(list(a.intersection(b)), sorted(set(a) & set(b)))
+            self.assertEqual(list(a.difference(b)), sorted(set(a) - set(b)))
+
+    def test_in_tree(self):
+        tree = BPlusTree(name=1, order=3)
+        sample = [i % 3 for i in range(300)]
+        for i, item in reversed(list(enumerate(sample))):
+            tree.insert(value=item, pointer=i)
+        # postings come out sorted regardless of insertion order
+        self.assertEqual(tree.find(value=1, op="="), list(range(1, 300, 3)))
+        self.assertEqual(tree.find(value=2, op="<"), list(range(1, 300, 3)) + list(range(0, 300, 3)))
+
+
+class Test_Bitmap(unittest.TestCase):
+    def test_bitmap(self):
+        bitmap = Bitmap.from_iterable([1, 5, 64, 200])
+        bitmap.add_range(60, 70)
+        bitmap.discard(5)
+        self.assertEqual(list(bitmap), [1] + list(range(60, 70)) + [200])
+        self.assertEqual(list(reversed(bitmap)), list(reversed(list(bitmap))))
+        self.assertEqual(len(bitmap), 12)
+        self.assertEqual([bitmap.next_set(0), bitmap.next_set(2), bitmap.next_set(70), bitmap.next_set(201)], [1, 60, 200, -1])
+        self.assertEqual([bitmap.prev_set(0), bitmap.prev_set(59), bitmap.prev_set(199), bitmap.prev_set(1000)], [-1, 1, 69, 200])
+        self.assertIn(200, bitmap)
+        self.assertNotIn(1000, bitmap)
+        other = Bitmap.from_iterable([1, 2, 200])
+        self.assertEqual(list(bitmap.intersection(other)), [1, 200])
+        self.assertEqual(list(bitmap.union(other)), [1, 2] + list(range(60, 70)) + [200])
+        self.assertEqual(list(other.difference(bitmap)), [2])
+        self.assertEqual(list(other.complement(5)), [0, 3, 4])
+
+
 class Test_DataTable(unittest.TestCase):
     @classmethod
     def setUpClass(self) -> None:
@@ -96,6 +461,271 @@ class Test_DataTable(unittest.TestCase):
                                                    ]))
 
 
+@unittest.skipIf(numpy is None, 'numpy is not installed')
+class Test_ColumnarDataTable(unittest.TestCase):
+    TABLE_DEFINITION = {
+        0: {'name': 'sno', 'type': 'int', 'is_nullable': False, 'is_unique': True, 'is_key': True},
+        1: {'name': 'academy', 'type': 'str', 'is_nullable': True, 'is_unique': False, 'is_key': False},
+        2: {'name': 'grade', 'type': 'float', 'is_nullable': True, 'is_unique': False, 'is_key': False},
+    }
+
+    def test_table(self):
+        table = ColumnarDataTable(self.TABLE_DEFINITION)
+        for i in range(100):
+            table.insert(i, (i, ['数院', '外院', None][i % 3], None if i % 5 == 0 else i / 2))
+        table.delete(3)
+        table.update(4, 1, '计科院')
+        table.insert(100, (2 ** 70, '数院', 1.0))  # 超出 int64 的值退化为 object 列
+        self.assertEqual(table.length(), 101)
+        self.assertEqual(table.get_row(3), None)
+        self.assertEqual(table.get_row(4), (4, '计科院', 2.0))
+        self.assertEqual(table.get_row(100), (2 ** 70, '数院', 1.0))
+        self.assertEqual(table.get_record()[:3], [[0, '数院', None], [1, '外院', 0.5], [2, None, 1.0]])
+        self.assertEqual(table.scan(1, '=', '数院'), [i for i in range(0, 100, 3) if i not in (3,)] + [100])
+        self.assertEqual(table.scan(1, '<>', '数院')[:4], [1, 2, 4, 5])
+        self.assertEqual(table.scan(2, '<', 2.0), [1, 2, 100])
+        self.assertEqual(table.scan(2, '=', None), list(range(0, 100, 5)))
+        self.assertEqual(table.scan(1, 'like', '%院')[:3], [0, 1, 4])
+        self.assertEqual(table.scan(0, '>', 98), [99, 100])
+        self.assertRaises(TypeError, table.scan, 2, '<', 'a')
+
+    def test_coordinator(self):
+        table = [(i, ['数院', '外院', '计科院'][i % 3], float(i % 7)) for i in range(300)]
+        storages = [StorageCoordinator(table, self.TABLE_DEFINITION, layout) for layout in ('row', 'columnar')]
+        for storage in storages:
+            storage.delete(list(range(0, 300, 4)))
+            storage.update({2: 9.5}, [1, 2])
+            storage.insert((1000, '外院', 3.0))
+        for cond in [(1, '=', '外院'), (1, '<>', '数院'), (2, '>=', 5.0), (2, '<', 3.0), (1, 'LIKE', '%科%')]:
+            self.assertEqual(sorted(storages[0].locate(*cond)), sorted(storages[1].locate(*cond)))
+        self.assertEqual(storages[0].query(storages[0].locate_all()), storages[1].query(storages[1].locate_all()))
+        self.assertRaises(ValueError, StorageCoordinator, [], self.TABLE_DEFINITION, 'unknown')
+
+
+class Test_MmapDataTable(unittest.TestCase):
+    table_definition = {
+        0: {'name': 'sno', 'type': 'int', 'is_nullable': False, 'is_unique': True, 'is_key': True},
+        1: {'name': 'name', 'type': 'str', 'is_nullable': True, 'is_unique': False, 'is_key': False},
+    }
+
+    def test_table(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'table')
+            table = MmapDataTable(self.table_definition, path)
+            for i in range(1000):
+                table.insert(i, (i, 'n%d' % i))
+            table.delete(3)
+            table.update(5, 1, 'a much longer name than before')
+            self.assertEqual(table.get_row(3), None)
+            self.assertEqual(table.get_row(5), (5, 'a much longer name than before'))
+            self.assertEqual(list(table.scan(1, 'LIKE', 'n99%', table.live_rows())), [99] + list(range(990, 1000)))
+            self.assertEqual(list(table.scan(0, '<', 4, table.live_rows())), [0, 1, 2])
+            table.update(6, 1, None)
+            table.close()
+
+            table = MmapDataTable(self.table_definition, path)
+            self.assertEqual(table.length(), 1000)
+            self.assertEqual(table.get_value(999, 1), 'n999')
+            self.assertEqual(table.get_row(6), (6, None))
+            table.compact([0, 5, 999])
+            self.assertEqual(table.get_record(), [[0, 'n0'], [5, 'a much longer name than before'], [999, 'n999']])
+            table.insert(3, (7, 'x'))
+            self.assertEqual(list(table.live_rows()), [0, 1, 2, 3])
+            table.close()
+            self.assertRaises(ValueError, MmapDataTable, {0: self.table_definition[0]}, path)
+
+    def test_coordinator(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'table')
+            storage = StorageCoordinator([(i, 'n%d' % (i % 7)) for i in range(100)], self.table_definition,
+                                         'mmap', path)
+            storage.delete([10, 20])
+            storage.update({1: 'z'}, [30])
+            storage.close()
+            # 重新打开时忽略初始数据，存活行与索引由表文件恢复
+            storage = StorageCoordinator([(0, 'other')], self.table_definition, 'mmap', path)
+            self.assertEqual(storage.count_all(), 98)
+            self.assertEqual(storage.locate(0, '>=', 98), [98, 99])
+            self.assertEqual(storage.locate(1, '=', 'z'), [30])
+            self.assertEqual(storage.query(storage.locate(0, '=', 30)), [(30, 'z')])
+            storage.insert((100, 'n'))
+            self.assertEqual(storage.locate(0, '=', 100), [20])
+            self.assertEqual(storage.compact(), 1)
+            self.assertEqual(storage.query(storage.locate(0, '=', 100)), [(100, 'n')])
+            storage.close()
+            self.assertRaises(ValueError, StorageCoordinator, [], self.table_definition, 'mmap')
+
+    def test_reopen_from_checkpoint(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'table')
+            storage = StorageCoordinator([(i, 'n%d' % i) for i in range(100)], self.table_definition, 'mmap', path)
+            storage.delete([3])
+            state = storage.checkpoint_state()
+            storage.delete([4])
+            storage.close()
+            # 有检查点时表文件中的行不逐行解码，索引由检查点直接构建
+            with mock.patch.object(MmapDataTable, 'get_value', autospec=True,
+                                   side_effect=MmapDataTable.get_value) as get_value:
+                storage = StorageCoordinator([], self.table_definition, 'mmap', path, checkpoint=state)
+                self.assertEqual(get_value.call_count, 0)
+            self.assertEqual(storage.count_all(), 99)
+            self.assertEqual(storage.locate(0, '=', 4), [4])
+            self.assertEqual(storage.locate(0, '=', 3), [])
+            self.assertEqual(storage.query([4]), [(4, 'n4')])
+            storage.close()
+
+
+class Test_WriteAheadLog(unittest.TestCase):
+    def test_group_commit(self):
+        with tempfile.TemporaryDirectory() as directory:
+            wal = WriteAheadLog(directory, group_size=3, group_interval=60)
+            wal.append('insert', [[1, 'a']])
+            wal.append('delete', [[0]])
+            self.assertEqual(os.path.getsize(os.path.join(directory, WAL_FILE)), 0)  # 未攒满一组时不写盘
+            wal.append('update', [[[1, 'b']], [2]])
+            self.assertGreater(os.path.getsize(os.path.join(directory, WAL_FILE)), 0)
+            self.assertEqual([record['seq'] for record in wal.records(1)], [2, 3])
+            self.assertEqual(len(wal), 3)
+            wal.truncate()
+            self.assertEqual(list(wal.records()), [])
+            self.assertEqual(wal.append('insert', [[2, 'c']]), 4)
+            wal.close()
+
+    def test_sync(self):
+        # 领导者/跟随者组提交：sync 返回时记录已落盘，并发等待的线程共用 fsync
+        import data_storage.wal as wal_module
+        fsync = wal_module.os.fsync
+        calls = []
+
+        def slow_fsync(fd):
+            calls.append(fd)
+            time.sleep(0.002)
+            fsync(fd)
+
+        with tempfile.TemporaryDirectory() as directory:
+            wal = WriteAheadLog(directory, group_size=1000, group_interval=60)
+            wal_module.os.fsync = slow_fsync
+            try:
+                def worker(n):
+                    for i in range(20):
+                        wal.sync(wal.append('insert', [[n, i]]))
+
+                threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+            finally:
+                wal_module.os.fsync = fsync
+            self.assertLess(len(calls), 160)
+            # 不经 commit/close，直接从文件读出全部记录
+            self.assertEqual(sorted(record['seq'] for record in WriteAheadLog(directory).records()),
+                             list(range(1, 161)))
+            wal.close()
+
+    def test_torn_tail(self):
+        with tempfile.TemporaryDirectory() as directory:
+            wal = WriteAheadLog(directory, group_size=1)
+            wal.append('insert', [[1]])
+            wal.append('insert', [[2]])
+            wal.close()
+            with open(os.path.join(directory, WAL_FILE), 'ab') as f:
+                f.write(b'{"seq": 3, "op": "ins')  # 崩溃时写了一半的记录
+            wal = WriteAheadLog(directory, group_size=1)
+            self.assertEqual(wal.last_seq(), 2)
+            wal.append('insert', [[3]])
+            self.assertEqual([record['args'] for record in wal.records()], [[[1]], [[2]], [[3]]])
+            wal.close()
+
+    def test_checkpoint_state(self):
+        table_definition = {
+            0: {'name': 'sno', 'type': 'int', 'is_nullable': False, 'is_unique': True, 'is_key': True},
+            1: {'name': 'email', 'type': 'str', 'is_nullable': False, 'is_unique': True, 'is_key': False},
+            2: {'name': 'grade', 'type': 'int', 'is_nullable': False, 'is_unique': False, 'is_key': True},
+        }
+        storage = StorageCoordinator([(i, 'u%d' % i, i % 4) for i in range(50)], table_definition)
+        log = []
+        storage.set_log_hook(lambda op, args: log.append((op, args)))
+        storage.delete([3, 7])
+        storage.update({2: 9}, [10, 11])
+        storage.insert((100, 'u100', 1))
+        self.assertEqual([op for op, _ in log], ['delete', 'update', 'insert'])
+        self.assertRaises(NotUniqueException, storage.insert, (1, 'x', 0))
+        self.assertEqual(len(log), 3)  # 失败的操作不记日志
+
+        restored = StorageCoordinator([], table_definition)
+        restored.restore_state(StorageCoordinator([(i, 'u%d' % i, i % 4) for i in range(50)],
+                                                  table_definition).checkpoint_state())
+        for op, args in log:
+            restored.apply_mutation(op, args)
+        # 重放结果与原协调器一致
+        self.assertEqual(restored.locate(0, '=', 100), [7])
+        self.assertEqual(restored.query(restored.locate_all()), storage.query(storage.locate_all()))
+        self.assertEqual(restored.locate(2, '=', 9), [10, 11])
+        self.assertEqual(restored.locate(1, '=', 'u3'), [])
+        self.assertEqual(restored.empty_m, storage.empty_m)
+
+        again = StorageCoordinator([], table_definition)
+        again.restore_state(storage.checkpoint_state())
+        self.assertEqual(again.query(again.locate_all()), storage.query(storage.locate_all()))
+        self.assertEqual(again.locate(1, '=', 'u100'), [7])
+        again.insert((101, 'u101', 0))
+        self.assertEqual(again.locate(0, '=', 101), [3])
+
+
+class Test_ReadWriteLock(unittest.TestCase):
+    def test_readers_share(self):
+        lock = ReadWriteLock()
+        barrier = threading.Barrier(3, timeout=5)
+
+        def reader():
+            with lock.read_locked():
+                barrier.wait()  # 三个读者必须同时持有读锁才能通过
+
+        threads = [threading.Thread(target=reader) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertFalse(barrier.broken)
+
+    def test_writer_excludes(self):
+        lock = ReadWriteLock()
+        events = []
+        lock.acquire_read()
+        writer = threading.Thread(target=lambda: lock.acquire_write() or events.append('write'))
+        writer.start()
+        time.sleep(0.05)
+        self.assertEqual(events, [])
+        # 有写者等待时，新的读者排在写者之后
+        reader = threading.Thread(target=lambda: lock.acquire_read() or events.append('read'))
+        reader.start()
+        time.sleep(0.05)
+        self.assertEqual(events, [])
+        lock.release_read()
+        writer.join(5)
+        self.assertEqual(events, ['write'])
+        lock.release_write()
+        reader.join(5)
+        self.assertEqual(events, ['write', 'read'])
+
+
+class Test_ExternalSort(unittest.TestCase):
+    def test_sort(self):
+        items = [(i * 7919 % 1000, i) for i in range(1000)]
+        self.assertEqual(list(external_sort(items, run_size=64)), sorted(items))
+        self.assertEqual(list(external_sort(iter(items), reverse=True, run_size=64)), sorted(items, reverse=True))
+        self.assertEqual(list(external_sort(items[:10], run_size=64)), sorted(items[:10]))
+        self.assertEqual(list(external_sort([], run_size=64)), [])
+
+    def test_close(self):
+        # 提前关闭时各有序段的临时文件随之关闭
+        with tempfile.TemporaryDirectory() as directory:
+            ordered = external_sort(range(100, 0, -1), run_size=10, temp_dir=directory)
+            self.assertEqual(next(ordered), 1)
+            ordered.close()
+
+
 class Test_StorageCoordinator(unittest.TestCase):
     @classmethod
     def setUpClass(self) -> None:
@@ -157,6 +787,11 @@ class Test_StorageCoordinator(unittest.TestCase):
         self.assertEqual(sorted(self.storage.locate(2, 'Like', '%t%')), sorted([3, 5, 7, 8]))
         self.assertEqual(sorted(self.storage.locate(1, '<>', 3)), sorted([1, 3, 5, 7, 9]))
 
+    def test_scan(self):
+        it = self.storage.scan(0, '>=', 0)
+        self.assertEqual(next(it), self.storage.locate(0, '>=', 0)[0])
+        self.assertEqual(sorted(self.storage.scan(3, '<', 85)), sorted(self.storage.locate(3, '<', 85)))
+
     def test_locate_all(self):
         self.storage.delete([1,3])
         self.assertEqual(self.storage.locate_all(),[4,5,6,7,8,9,11])
@@ -165,6 +800,193 @@ class Test_StorageCoordinator(unittest.TestCase):
         anw=self.storage.query([4,8])
         self.assertEqual(anw,[(14, 3, 'Gamma', 90),(3, 3, 'Iota', 99)])
 
+    def test_iter_ordered(self):
+        rows = [4, 5, 6, 7, 8, 9]
+        # sno 上有B+树：沿叶子链表遍历
+        self.assertEqual(list(self.storage.iter_ordered(rows, 0)), [6, 7, 8, 9, 4, 5])
+        self.assertEqual(list(self.storage.iter_ordered(rows, 0, True, 2)), [5, 4])
+        # grade 上没有索引：排序、堆、外部归并排序的结果相同
+        by_grade = [9, 4, 5, 6, 7, 8]
+        self.assertEqual(list(self.storage.iter_ordered(rows, 3)), by_grade)
+        self.assertEqual(list(self.storage.iter_ordered(rows, 3, False, 3)), by_grade[:3])
+        self.assertEqual(list(self.storage.iter_ordered(rows, 3, True, 10)), by_grade[::-1])
+        self.assertEqual(list(self.storage.iter_ordered(rows, 3, False, 0)), [])
+        sort_run = self.storage.sort_run_m
+        self.storage.sort_run_m = 2
+        try:
+            self.assertEqual(list(self.storage.iter_ordered(iter(rows), 3, True)), by_grade[::-1])
+        finally:
+            self.storage.sort_run_m = sort_run
+
+
+class Test_StorageCoordinator_IndexOrder(unittest.TestCase):
+    def test_index_order(self):
+        table_definition = {
+            0: {'name': 'sno', 'type': 'int', 'is_nullable': False, 'is_unique': True, 'is_key': True,
+                'index_order': 128},
+            1: {'name': 'grade', 'type': 'int', 'is_nullable': False, 'is_unique': False, 'is_key': True},
+        }
+        storage = StorageCoordinator([(i, i % 10) for i in range(500)], table_definition)
+        self.assertEqual(storage.bplustree_m[0].root.order, 128)
+        self.assertEqual(storage.bplustree_m[1].root.order, 3)
+        self.assertEqual(sorted(storage.locate(0, '<', 5)), [0, 1, 2, 3, 4])
+        self.assertEqual(len(storage.locate(1, '=', 3)), 50)
+
+    def test_rebuild_index(self):
+        table_definition = {
+            0: {'name': 'sno', 'type': 'int', 'is_nullable': False, 'is_unique': True, 'is_key': True,
+                'fill_factor': 0.5},
+            1: {'name': 'grade', 'type': 'int', 'is_nullable': False, 'is_unique': False, 'is_key': True},
+        }
+        storage = StorageCoordinator([(i, i % 10) for i in range(100)], table_definition)
+        storage.delete(list(range(0, 100, 2)))
+        storage.rebuild_index(0)
+        storage.rebuild_index(1, fill_factor=0.7)
+        self.assertEqual(sorted(storage.locate(0, '<', 10)), [1, 3, 5, 7, 9])
+        self.assertEqual(sorted(storage.locate(1, '=', 3)), list(range(3, 100, 10)))
+        self.assertRaises(KeyError, storage.rebuild_index, 2)
+        self.assertEqual(storage.get_index_statistics(1)['key_count'], 5)
+        self.assertRaises(KeyError, storage.get_index_statistics, 2)
+
+    def test_count(self):
+        table_definition = {
+            0: {'name': 'sno', 'type': 'int', 'is_nullable': False, 'is_unique': True, 'is_key': True,
+                'is_counted': True},
+            1: {'name': 'grade', 'type': 'int', 'is_nullable': False, 'is_unique': False, 'is_key': False},
+        }
+        storage = StorageCoordinator([(i, i % 10) for i in range(100)], table_definition)
+        storage.delete([10, 20, 30])
+        storage.insert((200, 1))
+        self.assertTrue(storage.bplustree_m[0].counted)
+        self.assertEqual(storage.count(0, '<', 50), 47)
+        self.assertEqual(storage.count(0, '<>', 40), 97)
+        self.assertEqual(storage.count(1, '=', 1), 11)
+        self.assertEqual(storage.count_all(), 98)
+        self.assertAlmostEqual(storage.estimate_selectivity(0, '>=', 50), 51 / 98)
+
+    def test_unique_hash_index(self):
+        table_definition = {
+            0: {'name': 'sno', 'type': 'int', 'is_nullable': False, 'is_unique': True, 'is_key': True},
+            1: {'name': 'email', 'type': 'str', 'is_nullable': False, 'is_unique': True, 'is_key': False},
+        }
+        storage = StorageCoordinator([(i, 'u%d' % i) for i in range(10)], table_definition)
+        self.assertEqual(len(storage.hash_index_m), 1)
+        self.assertRaises(NotUniqueException, storage.insert, (10, 'u3'))
+        storage.delete([3])
+        storage.insert((10, 'u3'))  # 删除后的值可以再次插入，且不受空行影响
+        self.assertEqual(storage.locate(1, '=', 'u3'), [3])
+        self.assertRaises(NotUniqueException, storage.update, {1: 'u4'}, [5])
+        self.assertRaises(NotUniqueException, storage.update, {1: 'new'}, [5, 6])
+        storage.update({1: 'u50'}, [5])
+        self.assertEqual(storage.locate(1, '=', 'u5'), [])
+        self.assertEqual(storage.locate(1, '=', 'u50'), [5])
+        storage.insert((11, 'u5'))
+        self.assertEqual(storage.locate(1, '=', 'u5'), [10])
+        self.assertEqual(sorted(storage.locate(1, '>=', 'u8')), [8, 9])
+
+    def test_live_rows(self):
+        table_definition = {
+            0: {'name': 'sno', 'type': 'int', 'is_nullable': False, 'is_unique': True, 'is_key': True},
+            1: {'name': 'grade', 'type': 'int', 'is_nullable': False, 'is_unique': False, 'is_key': False},
+        }
+        storage = StorageCoordinator([(i, i % 3) for i in range(200)], table_definition)
+        storage.delete(list(range(0, 200, 2)))
+        storage.delete([0, 2])  # 重复删除不影响存活行
+        self.assertEqual(storage.locate_all(), list(range(1, 200, 2)))
+        storage.insert((500, 1))
+        self.assertEqual(storage.count_all(), 101)
+        self.assertIn(198, storage.locate_all())
+        self.assertEqual(len(storage.locate(0, '<>', 500)), 100)
+        self.assertEqual(sorted(storage.locate(1, '<>', 1)), [i for i in range(1, 200, 2) if i % 3 != 1])
+
+    def test_insert_many(self):
+        table_definition = {
+            0: {'name': 'sno', 'type': 'int', 'is_nullable': False, 'is_unique': True, 'is_key': True},
+            1: {'name': 'email', 'type': 'str', 'is_nullable': False, 'is_unique': True, 'is_key': False},
+            2: {'name': 'grade', 'type': 'int', 'is_nullable': True, 'is_unique': False, 'is_key': True,
+                'index_order': 5},
+        }
+        storage = StorageCoordinator([(i, 'u%d' % i, i % 4) for i in range(10)], table_definition)
+        storage.delete([2, 5])
+        errors = storage.insert_many([(20, 'u20', 1), (3, 'u30', 1), (21, 'u20', 2), (22, 'u22', 3),
+                                      (20, 'u23', 0), (23, 'u23', 2)])
+        self.assertEqual([type(e).__name__ for e in errors],
+                         ['NoneType', 'NotUniqueException', 'NotUniqueException', 'NoneType',
+                          'NotUniqueException', 'NoneType'])
+        # 与逐条 insert 相同，先复用空行，再追加新行
+        self.assertEqual(storage.locate(0, '=', 20), [5])
+        self.assertEqual(storage.locate(1, '=', 'u22'), [2])
+        self.assertEqual(storage.locate(0, '=', 23), [10])
+        self.assertEqual(sorted(storage.locate(2, '=', 1)), [1, 5, 9])
+        self.assertEqual(storage.insert_many([]), [])
+
+    def test_compact(self):
+        table_definition = {
+            0: {'name': 'sno', 'type': 'int', 'is_nullable': False, 'is_unique': True, 'is_key': True},
+            1: {'name': 'email', 'type': 'str', 'is_nullable': False, 'is_unique': True, 'is_key': False},
+            2: {'name': 'grade', 'type': 'int', 'is_nullable': False, 'is_unique': False, 'is_key': True,
+                'index_order': 5},
+        }
+        storage = StorageCoordinator([(i, 'u%d' % i, i % 4) for i in range(100)], table_definition)
+        storage.delete([i for i in range(100) if i % 3])
+        self.assertEqual(storage.compact(), 66)
+        self.assertEqual(storage.locate_all(), list(range(34)))
+        self.assertEqual(storage.locate(0, '=', 99), [33])
+        self.assertEqual(storage.locate(1, '=', 'u33'), [11])
+        self.assertEqual(sorted(storage.locate(2, '=', 1)), [i for i in range(34) if i * 3 % 4 == 1])
+        self.assertEqual(storage.query([0, 33]), [(0, 'u0', 0), (99, 'u99', 3)])
+        storage.insert((100, 'u100', 1))
+        self.assertEqual(storage.locate(0, '>=', 99), [33, 34])
+        self.assertEqual(storage.compact(), 0)
+
+    def test_compact_paged(self):
+        with tempfile.TemporaryDirectory() as directory:
+            table_definition = {
+                0: {'name': 'sno', 'type': 'int', 'is_nullable': False, 'is_unique': False, 'is_key': True,
+                    'index_storage': 'paged', 'index_path': os.path.join(directory, 'sno.pages'), 'index_order': 4},
+            }
+            storage = StorageCoordinator([(i % 10,) for i in range(200)], table_definition)
+            storage.delete(list(range(0, 200, 2)))
+            storage.insert((5,))
+            self.assertEqual(storage.compact(), 99)
+            self.assertEqual(storage.locate(0, '=', 5), list(range(2, 101, 5)) + [99])
+            self.assertEqual(len(storage.locate(0, '<', 5)), 40)
+            storage.insert((5,))
+            self.assertEqual(storage.locate(0, '=', 5)[-2:], [99, 101])
+            storage.close()
+
+    def test_compact_paged_then_insert(self):
+        # 压缩后再插入、删除：页中的行号重写后分隔键仍要能把新插入的键引到正确的叶子
+        with tempfile.TemporaryDirectory() as directory:
+            table_definition = {
+                0: {'name': 'k', 'type': 'int', 'is_nullable': False, 'is_unique': False, 'is_key': True,
+                    'index_storage': 'paged', 'index_path': os.path.join(directory, 'k.pages'), 'index_order': 4},
+            }
+            storage = StorageCoordinator([], table_definition)
+            steps = [('insert', [1, 1, 2, 1, 1, 1, 1, 2]), ('delete', [0, 2, 3, 4, 6, 7]), ('insert', [2]),
+                     ('compact', None), ('delete', [0, 1, 2]), ('insert', [2, 2, 0, 2, 0, 0, 0, 2, 2, 2]),
+                     ('delete', list(range(10))), ('compact', None),
+                     ('insert', [2, 2, 2, 2, 1, 1, 1, 1, 1, 1]), ('delete', [0, 1, 2, 3, 4, 7, 9])]
+            for op, arg in steps:
+                if op == 'insert':
+                    for value in arg:
+                        storage.insert((value,))
+                elif op == 'delete':
+                    storage.delete(arg)
+                else:
+                    storage.compact()
+            self.assertEqual(storage.locate(0, '=', 0), [])
+            self.assertEqual(sorted(storage.locate(0, '=', 1)), [5, 6, 8])
+            self.assertEqual(sorted(storage.locate(0, '>=', 0)), [5, 6, 8])
+            self.assertEqual(storage.query(sorted(storage.locate(0, '=', 1))), [(1,)] * 3)
+            storage.close()
+
+    def test_bulk_init_not_unique(self):
+        table_definition = {
+            0: {'name': 'sno', 'type': 'int', 'is_nullable': False, 'is_unique': True, 'is_key': True},
+        }
+        self.assertRaises(NotUniqueException, StorageCoordinator, [(1,), (2,), (1,)], table_definition)
+
 
 if __name__ == '__main__':
     unittest.main()
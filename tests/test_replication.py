@@ -0,0 +1,97 @@
+import unittest
+import copy
+import os
+import tempfile
+import time
+
+from core import Core
+from replication import ReplicatedCore, replica_definition
+from tests.test_system_wise_integration import TABLE_DEFINITION_SAMPLE, INSERTION_SQL_EXPR
+
+
+class Test_ReplicatedCore(unittest.TestCase):
+    def test_same_results(self):
+        requests = [{'sql_expr': sql, 'serial_number': i} for i, sql in enumerate(INSERTION_SQL_EXPR)]
+        requests += [{'sql_expr': sql, 'serial_number': 100 + i} for i, sql in enumerate([
+            'SELECT * WHERE total_grade > 80', 'DELETE WHERE total_grade > 90', 'SELECT sno WHERE total_grade > 80',
+            'SELECT nosuch', "UPDATE SET name = 'z' WHERE sno = 'F010'", "SELECT name WHERE sno = 'F010'",
+            INSERTION_SQL_EXPR[0], 'SELECT sno'])]
+        core = Core(TABLE_DEFINITION_SAMPLE, [])
+        expected = [core.execute_sql_expr(dict(request)) for request in requests]
+        replicated = ReplicatedCore(TABLE_DEFINITION_SAMPLE, [], replicas=2)
+        try:
+            results = list(replicated.execute_many(dict(request) for request in requests))
+            seqs = [result.pop('seq') for result in results]
+            self.assertEqual(results, expected)
+            self.assertEqual(seqs, sorted(seqs))
+            self.assertEqual(seqs[-1], replicated.last_seq())
+        finally:
+            replicated.close()
+
+    def test_read_your_writes(self):
+        replicated = ReplicatedCore(TABLE_DEFINITION_SAMPLE, [], replicas=2, read_your_writes=False, ship_batch=1000)
+        try:
+            for i, sql in enumerate(INSERTION_SQL_EXPR[:10]):
+                write = replicated.execute_sql_expr({'sql_expr': sql, 'serial_number': i})
+            self.assertEqual(write['seq'], 10)
+            read = replicated.execute_sql_expr({'sql_expr': 'SELECT sno', 'serial_number': 10,
+                                                'min_seq': write['seq']})
+            self.assertEqual(read['seq'], 10)
+            self.assertEqual(len(read['content']), 10)
+            # 整理空行改变了行号，同样作为修改发送给副本
+            replicated.execute_sql_expr({'sql_expr': 'DELETE WHERE total_grade < 90', 'serial_number': 11})
+            with replicated.primary_m.db_m.write_locked():
+                replicated.primary_m.db_m.compact()
+            replicated.execute_sql_expr({'sql_expr': INSERTION_SQL_EXPR[10], 'serial_number': 12})
+            expected = replicated.primary_m.execute_sql_expr({'sql_expr': 'SELECT *', 'serial_number': 13})
+            for i in range(2):
+                read = replicated.execute_sql_expr({'sql_expr': 'SELECT *', 'serial_number': 14,
+                                                    'min_seq': replicated.last_seq()})
+                self.assertEqual(read['content'], expected['content'])
+        finally:
+            replicated.close()
+
+    def test_ship_interval(self):
+        # 未攒满一批的修改在 ship_interval 之后也会发送，不带 min_seq 的查询最终能看到
+        replicated = ReplicatedCore(TABLE_DEFINITION_SAMPLE, [], replicas=1, read_your_writes=False,
+                                    ship_batch=1000, ship_interval=0.01)
+        try:
+            for i, sql in enumerate(INSERTION_SQL_EXPR[:3]):
+                replicated.execute_sql_expr({'sql_expr': sql, 'serial_number': i})
+            deadline = time.monotonic() + 10
+            while True:
+                read = replicated.execute_sql_expr({'sql_expr': 'SELECT sno', 'serial_number': 3})
+                if read['seq'] == 3 or time.monotonic() > deadline:
+                    break
+                time.sleep(0.01)
+            self.assertEqual(read['seq'], 3)
+            self.assertEqual(len(read['content']), 3)
+        finally:
+            replicated.close()
+
+    def test_paged_index(self):
+        # 主库的页文件索引不会被副本打开或改写，副本使用内存中的索引
+        with tempfile.TemporaryDirectory() as directory:
+            table_definition = copy.deepcopy(TABLE_DEFINITION_SAMPLE)
+            table_definition[0].update(index_storage='paged', index_path=os.path.join(directory, 'sno.pages'),
+                                       index_order=8)
+            self.assertEqual(replica_definition(table_definition)[0],
+                             dict(TABLE_DEFINITION_SAMPLE[0], index_order=8))
+            self.assertEqual(table_definition[0]['index_storage'], 'paged')
+            replicated = ReplicatedCore(table_definition, [], replicas=2, ship_batch=1)
+            try:
+                for i, sql in enumerate(INSERTION_SQL_EXPR):
+                    self.assertTrue(replicated.execute_sql_expr({'sql_expr': sql, 'serial_number': i})['is_success'])
+                for i in range(4):
+                    read = replicated.execute_sql_expr({'sql_expr': "SELECT name WHERE sno = 'F010'",
+                                                        'serial_number': i})
+                    self.assertTrue(read['is_success'], read['error_msg'])
+                    self.assertEqual(read['content'], [('朱荣耀',)])
+                read = replicated.execute_sql_expr({'sql_expr': 'SELECT sno', 'serial_number': 0})
+                self.assertEqual(len(read['content']), len(INSERTION_SQL_EXPR))
+            finally:
+                replicated.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+import asyncio
+import json
+import os
+import tempfile
+
+from core import Core
+from server import CoreServer
+from tests.test_system_wise_integration import TABLE_DEFINITION_SAMPLE, INSERTION_SQL_EXPR
+
+
+async def send_all(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, lines: list) -> list:
+    # 流水线：先发出全部请求，再依次读取结果
+    writer.write(b''.join(line + b'\n' for line in lines))
+    await writer.drain()
+    writer.write_eof()
+    results = []
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        results.append(json.loads(line))
+    writer.close()
+    return results
+
+
+class Test_CoreServer(unittest.TestCase):
+    def test_tcp_pipelining(self):
+        async def run():
+            server = CoreServer(Core(TABLE_DEFINITION_SAMPLE, []), batch_size=7)
+            port = (await server.start_tcp()).sockets[0].getsockname()[1]
+            clients = []
+            for c in range(4):
+                lines = [json.dumps({'sql_expr': sql, 'serial_number': c * 1000 + i}).encode()
+                         for i, sql in enumerate(INSERTION_SQL_EXPR) if i % 4 == c]
+                clients.append(send_all(*await asyncio.open_connection('127.0.0.1', port), lines))
+            inserted = await asyncio.gather(*clients)
+            lines = [json.dumps({'sql_expr': 'SELECT sno', 'serial_number': 1}).encode(), b'not json', b'[1]',
+                     json.dumps({'sql_expr': 'SELECT sno WHERE sno = ?', 'serial_number': 2,
+                                 'params': ['F010']}).encode()]
+            queried = await send_all(*await asyncio.open_connection('127.0.0.1', port), lines)
+            await server.close()
+            return inserted, queried
+
+        inserted, queried = asyncio.run(run())
+        for c, results in enumerate(inserted):
+            self.assertEqual([r['serial_number'] for r in results],
+                             [c * 1000 + i for i in range(len(INSERTION_SQL_EXPR)) if i % 4 == c])
+            self.assertTrue(all(r['is_success'] for r in results))
+        self.assertEqual(queried[0]['serial_number'], 1)
+        self.assertEqual(len(queried[0]['content']), len(INSERTION_SQL_EXPR))
+        self.assertIn('KeyError', queried[1]['error_msg'])
+        self.assertIn('KeyError', queried[2]['error_msg'])
+        self.assertEqual(queried[3]['content'], [['F010']])
+
+    @unittest.skipUnless(hasattr(asyncio, 'start_unix_server'), 'Unix sockets are not available')
+    def test_unix_socket(self):
+        async def run(path):
+            server = CoreServer(Core(TABLE_DEFINITION_SAMPLE, []))
+            await server.start_unix(path)
+            lines = [json.dumps({'sql_expr': sql, 'serial_number': i}).encode()
+                     for i, sql in enumerate(INSERTION_SQL_EXPR[:3] + INSERTION_SQL_EXPR[:1])]
+            results = await send_all(*await asyncio.open_unix_connection(path), lines)
+            await server.close()
+            return results
+
+        with tempfile.TemporaryDirectory() as directory:
+            results = asyncio.run(run(os.path.join(directory, 'core.sock')))
+        self.assertEqual([r['is_success'] for r in results], [True, True, True, False])
+        self.assertIn('NotUniqueException', results[3]['error_msg'])
+
+
+if __name__ == '__main__':
+    unittest.main()
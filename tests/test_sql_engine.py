@@ -1,6 +1,12 @@
 import unittest
-from sql_engine.code import Code
-from sql_engine.sql_engine import SqlEngine
+import importlib.util
+import os
+import random
+import tempfile
+from sql_engine.code import Code, Param
+from sql_engine.sql_engine import SqlEngine, normalize_sql, collapse_spaces, build_tables
+from sql_engine import lextab, parsetab
+from sql_engine.sql_engine import SqlColumnException, ValueInvalidException, SqlSyntaxException
 
 
 class Test_Core(unittest.TestCase):
@@ -136,5 +142,160 @@ class Test_SqlEngine_yacc(unittest.TestCase):
         pass
 
 
+class Test_SqlEngine_PlanCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = SqlEngine(TABLE_DEFINITION_SAMPLE, plan_cache_size=2)
+
+    def test_normalize(self):
+        self.assertEqual(normalize_sql("  SELECT  *   WHERE name = 'a  b'  "), ("SELECT * WHERE name = ?", ('a  b',)))
+        self.assertEqual(normalize_sql("UPDATE SET name='x' WHERE sno>? LIMIT 5"),
+                         ("UPDATE SET name = ? WHERE sno > ? LIMIT ?", ('x', Param(0), 5)))
+        self.assertEqual(collapse_spaces("  SELECT  *   WHERE name = 'a  b'  "), "SELECT * WHERE name = 'a  b'")
+
+    def test_cache(self):
+        codes = self.engine.prepare("SELECT * WHERE sno > ?").code_list
+        self.assertIs(self.engine.prepare("SELECT  *  WHERE sno > 5 ").code_list, codes)
+        # 只差字面值的语句共用一个计划，字面值在绑定时代入
+        self.assertEqual(self.engine.resolve_sql_expr("SELECT  *  WHERE sno > 1 ")[0].opr, [[(0, '>', 1)]])
+        self.assertEqual(self.engine.resolve_sql_expr("SELECT * WHERE sno > 2")[0].opr, [[(0, '>', 2)]])
+        self.assertEqual(list(self.engine.plan_cache), ["SELECT * WHERE sno > ?"])
+        self.engine.resolve_sql_expr("SELECT name WHERE sno > 1")
+        self.engine.resolve_sql_expr("SELECT * WHERE sno > 3")
+        self.engine.resolve_sql_expr("SELECT cno WHERE sno > 3")  # 淘汰最久未使用的 SELECT name
+        self.assertEqual(list(self.engine.plan_cache), ["SELECT * WHERE sno > ?", "SELECT cno WHERE sno > ?"])
+        self.assertEqual(self.engine.resolve_sql_expr("SELECT name WHERE name = 'a  b'")[0].opr,
+                         [[(2, '=', 'a  b')]])
+        statement = self.engine.prepare("SELECT name WHERE sno > ? AND name = 'a' LIMIT 5")
+        self.assertEqual(statement.param_count, 1)
+        self.assertEqual(statement.bind((7,))[0].opr, [[(0, '>', 7), (2, '=', 'a')]])
+        self.assertEqual(statement.bind((7,))[3].opr, (5, 0))
+        self.assertRaises(ValueInvalidException, statement.bind, ())
+        self.assertRaises(ValueInvalidException, self.engine.resolve_sql_expr, "SELECT * WHERE sno > 'x'")
+        # 带引号的属性名不能换成占位符，按原文解析
+        self.assertEqual(self.engine.resolve_sql_expr("SELECT 'name' WHERE sno > 1")[2].opr, [2])
+
+    def test_prepare(self):
+        statement = self.engine.prepare("UPDATE SET grade = ?, name = ? WHERE sno > ? AND name LIKE ?")
+        self.assertEqual(statement.param_count, 4)
+        codes = statement.bind((90, 'Bob', 3, 'B%'))
+        self.assertEqual(codes[0].opr, [[(0, '>', 3), (2, 'LIKE', 'B%')]])
+        self.assertEqual(codes[1].opr, {3: 90, 2: 'Bob'})
+        self.assertEqual(statement.bind((None, 'Al', 1, 'A%'))[1].opr, {3: None, 2: 'Al'})
+        self.assertRaises(ValueInvalidException, statement.bind, ('90', 'Bob', 3, 'B%'))
+        self.assertRaises(SqlColumnException, statement.bind, (90, None, 3, 'B%'))
+        self.assertRaises(ValueInvalidException, statement.bind, (90, 'Bob'))
+        codes = self.engine.resolve_sql_expr("INSERT sno, cno, name VALUES ?, ?, ?", (1, 2, 'Eve'))
+        self.assertEqual(codes[0].opr, (1, 2, 'Eve', None))
+        self.assertEqual(len(self.engine.plan_cache), 2)
+
+    def test_limit(self):
+        codes = self.engine.resolve_sql_expr("SELECT name WHERE sno > 1 LIMIT 10")
+        self.assertEqual([code.opc for code in codes], ['locate', 'query', 'project', 'limit'])
+        self.assertEqual(codes[3].opr, (10, 0))
+        self.assertEqual(self.engine.resolve_sql_expr("SELECT * LIMIT 5 OFFSET 20")[3].opr, (5, 20))
+        self.assertEqual(self.engine.resolve_sql_expr("SELECT * LIMIT ? OFFSET ?", (5, 0))[3].opr, (5, 0))
+        self.assertEqual(len(self.engine.resolve_sql_expr("SELECT *")), 3)
+        self.assertRaises(ValueInvalidException, self.engine.resolve_sql_expr, "SELECT * LIMIT ?", (-1,))
+        self.assertRaises(ValueInvalidException, self.engine.resolve_sql_expr, "SELECT * LIMIT ?", (2.0,))
+        self.assertRaises(ValueInvalidException, self.engine.resolve_sql_expr, "SELECT * LIMIT 3.")
+        self.assertRaises(SqlSyntaxException, self.engine.resolve_sql_expr, "DELETE LIMIT 3")
+
+    def test_order(self):
+        codes = self.engine.resolve_sql_expr("SELECT name WHERE sno > 1 ORDER BY grade DESC LIMIT 10")
+        self.assertEqual([code.opc for code in codes], ['locate', 'order', 'query', 'project', 'limit'])
+        self.assertEqual(codes[1].opr, (3, True))
+        self.assertEqual(self.engine.resolve_sql_expr("SELECT * order by name asc")[1].opr, (2, False))
+        self.assertEqual(self.engine.resolve_sql_expr("SELECT * ORDER BY cno")[1].opr, (1, False))
+        self.assertRaises(SqlColumnException, self.engine.resolve_sql_expr, "SELECT * ORDER BY nosuch")
+        self.assertRaises(SqlSyntaxException, self.engine.resolve_sql_expr, "SELECT * ORDER BY sno, cno")
+        self.assertRaises(SqlSyntaxException, self.engine.resolve_sql_expr, "SELECT * LIMIT 1 ORDER BY sno")
+        self.assertRaises(SqlSyntaxException, self.engine.resolve_sql_expr, "DELETE ORDER BY sno")
+
+
+class Test_SqlEngine_SharedParser(unittest.TestCase):
+    def test_shared(self):
+        other_definition = {0: {'name': 'title', 'type': 'str', 'is_nullable': False, 'is_unique': False,
+                                'is_key': False}}
+        engine = SqlEngine(TABLE_DEFINITION_SAMPLE)
+        other = SqlEngine(other_definition)
+        self.assertIs(engine.parser.parser, other.parser.parser)
+        self.assertIsNot(engine.lexer, other.lexer)
+        self.assertEqual(engine.parser.parse("SELECT name WHERE grade > 60")[2].opr, [2])
+        self.assertRaises(SqlColumnException, other.parser.parse, "SELECT name WHERE grade > 60")
+        self.assertEqual(engine.resolve_sql_expr("SELECT name WHERE grade > 60")[2].opr, [2])
+        self.assertEqual(other.resolve_sql_expr("SELECT title WHERE title = 'x'")[2].opr, [0])
+
+    def test_tables_up_to_date(self):
+        # 随包发布的分析表必须与语法规则一致，修改规则后需运行 build_tables()
+        def load(path):
+            spec = importlib.util.spec_from_file_location(os.path.basename(path)[:-3], path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            return module
+
+        with tempfile.TemporaryDirectory() as directory:
+            build_tables(directory)
+            fresh_lextab = load(os.path.join(directory, 'lextab.py'))
+            fresh_parsetab = load(os.path.join(directory, 'parsetab.py'))
+        self.assertEqual(fresh_lextab._lexstatere, lextab._lexstatere)
+        self.assertEqual(fresh_parsetab._lr_signature, parsetab._lr_signature)
+        self.assertEqual(fresh_parsetab._lr_action, parsetab._lr_action)
+
+
+class Test_SqlEngine_FastParser(unittest.TestCase):
+    # 手写后端与 ply 后端的差分测试：合法语句生成相同的 Code，非法语句抛出相同的异常
+    PIECES = ['SELECT', 'INSERT', 'UPDATE', 'DELETE', 'SET', 'WHERE', 'VALUES', '*', ',', '=', '<>', '<', '>=',
+              '<=', '>', 'LIKE', 'like', 'AND', 'OR', 'and', 'sno', 'cno', 'name', 'grade', 'nosuch', '1', '2.5',
+              '.5', '3.', 'true', 'False', "'a b'", "'x'", "''", '?', '\t', "'", 'abc?d', 'LIMIT', 'offset', '0',
+              'ORDER', 'by', 'DESC', 'asc']
+
+    @classmethod
+    def setUpClass(self) -> None:
+        self.ply = SqlEngine(TABLE_DEFINITION_SAMPLE)
+        self.fast = SqlEngine(TABLE_DEFINITION_SAMPLE, parser_backend='fast')
+
+    @staticmethod
+    def parse(engine: SqlEngine, sql: str) -> tuple:
+        engine.lexer.param_count = 0
+        try:
+            codes = engine.parser.parse(sql, lexer=engine.lexer)
+        except Exception as e:
+            return 'error', type(e).__name__, str(e)
+        return 'ok', [(code.opc, repr(code.opr)) for code in codes], engine.lexer.param_count
+
+    def random_condition(self, r: random.Random) -> str:
+        return ' OR '.join(' AND '.join(r.choice(["sno = %d" % r.randrange(9), "grade >= %d" % r.randrange(99),
+                                                   "name LIKE 'a%'", "cno <> ?", "name = 'b c'"])
+                                         for _ in range(r.randrange(1, 4)))
+                           for _ in range(r.randrange(1, 4)))
+
+    def random_statement(self, r: random.Random) -> str:
+        order = r.choice(["", " ORDER BY grade", " ORDER BY sno DESC", " order by name asc", " ORDER BY nosuch",
+                          " ORDER grade", " ORDER BY", " ORDER BY sno DESC ASC"])
+        limit = r.choice(["", " LIMIT 3", " LIMIT ? OFFSET 2", " limit 0 offset ?", " OFFSET 1", " LIMIT"])
+        tail = order + limit if r.random() < 0.9 else limit + order
+        return r.choice(["SELECT * WHERE " + self.random_condition(r) + tail,
+                         "SELECT name, sno WHERE " + self.random_condition(r) + tail,
+                         "SELECT grade" + tail, "DELETE" + tail, "DELETE WHERE " + self.random_condition(r) + order, "DELETE WHERE " + self.random_condition(r),
+                         "UPDATE SET name = 'q', grade = ? WHERE " + self.random_condition(r),
+                         "INSERT sno, cno, name, grade VALUES 1234, 3, 'Alice', 90",
+                         "INSERT name, sno, cno VALUES ?, ?, ?"])
+
+    def test_differential(self):
+        r = random.Random(2020)
+        for i in range(3000):
+            if i % 2:
+                sql = self.random_statement(r)
+            else:
+                sql = ' '.join(r.choice(self.PIECES) for _ in range(r.randrange(12)))
+            self.assertEqual(self.parse(self.ply, sql), self.parse(self.fast, sql), sql)
+
+    def test_resolve(self):
+        sql = "SELECT name WHERE grade > ? AND name LIKE 'A%' OR sno = 1"
+        self.assertEqual([(code.opc, code.opr) for code in self.fast.resolve_sql_expr(sql, (60,))],
+                         [(code.opc, code.opr) for code in self.ply.resolve_sql_expr(sql, (60,))])
+        self.assertRaises(ValueError, SqlEngine, TABLE_DEFINITION_SAMPLE, parser_backend='yacc')
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,4 +1,8 @@
 import unittest
+import os
+import re
+import tempfile
+import threading
 
 from core import Core
 
@@ -248,5 +252,286 @@ class Test_System_Integration_Update(unittest.TestCase):
         self.assertEqual(1, len(self.run_sql("SELECT * WHERE name <> '守法良民'")['content']))
 
 
+class Test_System_Integration_IndexExport(unittest.TestCase):
+    def setUp(self) -> None:
+        self.core = Core(TABLE_DEFINITION_SAMPLE, [])
+        for sql in INSERTION_SQL_EXPR:
+            self.core.execute_sql_expr(make_sql_request(sql))
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'index.gv')
+
+    def tearDown(self) -> None:
+        self.dir.cleanup()
+
+    def dot_nodes(self) -> list:
+        with open(self.path, encoding='utf-8') as f:
+            return re.findall(r'fillcolor=(\w+)', f.read())
+
+    def test_write_index_dot(self):
+        stats = self.core.get_index_statistics(0)
+        self.core.write_index_dot(self.path, 0)
+        nodes = self.dot_nodes()
+        self.assertEqual(len(nodes), sum(stats['nodes_per_level']))
+        self.assertEqual(nodes.count('lightyellow'), stats['leaf_count'])
+        self.core.write_index_dot(self.path, 0, max_depth=1)
+        self.assertEqual(len(self.dot_nodes()), sum(stats['nodes_per_level'][:2]))
+        self.core.write_index_dot(self.path, 0, leaf_sample=5)
+        self.assertEqual(self.dot_nodes().count('lightyellow'), 5)
+
+
+class Test_System_Integration_Params(unittest.TestCase):
+    def test_params(self):
+        core = Core(TABLE_DEFINITION_SAMPLE, [])
+        insert = "INSERT sno, name, academy, major, mid_grade, final_grade, usual_grade, total_grade " \
+                 "VALUES ?, ?, ?, ?, ?, ?, ?, ?"
+        for i in range(10):
+            request = make_sql_request(insert)
+            request['params'] = ('S%02d' % i, 'n%d' % i, 'a', 'm', i, i * 2, None, 50 + i)
+            self.assertTrue(core.execute_sql_expr(request)['is_success'])
+        request = make_sql_request("SELECT sno WHERE total_grade >= ? AND usual_grade = ?")
+        request['params'] = (57,)
+        self.assertFalse(core.execute_sql_expr(request)['is_success'])
+        request = make_sql_request("SELECT sno WHERE total_grade >= ?")
+        request['params'] = (57,)
+        self.assertEqual(core.execute_sql_expr(request)['content'], [('S07',), ('S08',), ('S09',)])
+        request['params'] = ('57',)
+        self.assertIn('ValueInvalidException', core.execute_sql_expr(request)['error_msg'])
+
+
+class Test_System_Integration_ExecuteMany(unittest.TestCase):
+    def test_execute_many(self):
+        requests = [make_sql_request(sql) for sql in INSERTION_SQL_EXPR]
+        requests += [make_sql_request(INSERTION_SQL_EXPR[0]), {'sql_expr': 'SELECT *'},
+                     make_sql_request("delete WHERE total_grade >= 90"), make_sql_request('SELECT name'),
+                     make_sql_request('SELECT nosuch')]
+        requests += [make_sql_request(sql) for sql in INSERTION_SQL_EXPR[:5]]
+        requests.append(make_sql_request('SELECT *'))
+        core = Core(TABLE_DEFINITION_SAMPLE, [])
+        expected = [core.execute_sql_expr(dict(request)) for request in requests]
+        for batch_size in (1, 3, 1000):
+            core = Core(TABLE_DEFINITION_SAMPLE, [])
+            results = core.execute_many((dict(request) for request in requests), batch_size)
+            self.assertEqual(list(results), expected)
+        self.assertIn('NotUniqueException', expected[len(INSERTION_SQL_EXPR)]['error_msg'])
+        self.assertIn('KeyError', expected[len(INSERTION_SQL_EXPR) + 1]['error_msg'])
+
+    def test_index_failure(self):
+        # 批量维护索引失败（sno 超过页的容量）时逐条插入：报告的结果与逐条执行相同，失败的行不留在表中
+        with tempfile.TemporaryDirectory() as directory:
+            requests = [make_sql_request(sql) for sql in INSERTION_SQL_EXPR[:3]]
+            requests.insert(1, make_sql_request("INSERT sno, name VALUES '%s', 'big'" % ('x' * 300)))
+            requests.append(make_sql_request('SELECT sno'))
+            results = []
+            for run in ('single', 'many'):
+                table_definition = {i: dict(definition) for i, definition in TABLE_DEFINITION_SAMPLE.items()}
+                table_definition[0].update(index_storage='paged', page_size=256,
+                                           index_path=os.path.join(directory, run + '.pages'))
+                core = Core(table_definition, [])
+                if run == 'single':
+                    results.append([core.execute_sql_expr(dict(request)) for request in requests])
+                else:
+                    results.append(list(core.execute_many(dict(request) for request in requests)))
+                core.close()
+            self.assertEqual(results[0], results[1])
+            self.assertEqual([result['is_success'] for result in results[1]], [True, False, True, True, True])
+            self.assertIn('PageOverflowException', results[1][1]['error_msg'])
+            self.assertEqual(len(results[1][-1]['content']), 3)
+
+
+class Test_System_Integration_Threads(unittest.TestCase):
+    def test_concurrent_statements(self):
+        # 多个线程共享一个 Core：各线程插入互不重复的行，同时反复查询，每次查询都应看到完整的已提交插入
+        core = Core(TABLE_DEFINITION_SAMPLE, [], parser_backend='fast')
+        errors = []
+
+        def writer(t: int):
+            for i in range(50):
+                request = make_sql_request("INSERT sno, name, academy, major, final_grade, total_grade "
+                                           "VALUES ?, ?, 'a', 'm', ?, ?")
+                request['params'] = ('T%d-%02d' % (t, i), 'n', t, i)
+                if not core.execute_sql_expr(request)['is_success']:
+                    errors.append(request)
+
+        def reader():
+            for i in range(50):
+                result = core.execute_sql_expr(make_sql_request('SELECT sno, total_grade WHERE total_grade >= 0'))
+                if not result['is_success'] or len(set(result['content'])) != len(result['content']):
+                    errors.append(result)
+
+        threads = [threading.Thread(target=writer, args=(t,)) for t in range(4)]
+        threads += [threading.Thread(target=reader) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        result = core.execute_sql_expr(make_sql_request('SELECT sno WHERE total_grade < 10'))
+        self.assertEqual(len(result['content']), 40)
+
+
+class Test_System_Integration_Limit(unittest.TestCase):
+    def setUp(self) -> None:
+        self.core = Core(TABLE_DEFINITION_SAMPLE, [])
+        for sql in INSERTION_SQL_EXPR:
+            self.core.execute_sql_expr(make_sql_request(sql))
+        self.all = self.core.execute_sql_expr(make_sql_request('SELECT sno'))['content']
+
+    def test_limit(self):
+        # 只读取 LIMIT 与 OFFSET 覆盖的行
+        reads = []
+        get_row = self.core.db_m.table_m.get_row
+        self.core.db_m.table_m.get_row = lambda sub: reads.append(sub) or get_row(sub)
+        result = self.core.execute_sql_expr(make_sql_request('SELECT sno LIMIT 3 OFFSET 5'))
+        self.assertEqual(result['content'], self.all[5:8])
+        self.assertEqual(len(reads), 8)
+        result = self.core.execute_sql_expr(make_sql_request('SELECT sno LIMIT 10 OFFSET %d' % (len(self.all) - 2)))
+        self.assertEqual(result['content'], self.all[-2:])
+        self.assertEqual(self.core.execute_sql_expr(make_sql_request('SELECT sno LIMIT 0'))['content'], [])
+
+    def test_iter_pages(self):
+        pages = list(self.core.iter_pages(make_sql_request('SELECT sno'), 10))
+        self.assertEqual([len(page['content']) for page in pages], [10] * (len(self.all) // 10) + [len(self.all) % 10])
+        self.assertEqual([row for page in pages for row in page['content']], self.all)
+        self.assertTrue(all(page['is_success'] for page in pages))
+        pages = list(self.core.iter_pages(make_sql_request("SELECT sno WHERE sno = 'none'"), 10))
+        self.assertEqual([page['content'] for page in pages], [[]])
+        pages = list(self.core.iter_pages(make_sql_request('SELECT nosuch'), 10))
+        self.assertEqual(len(pages), 1)
+        self.assertFalse(pages[0]['is_success'])
+        # 提前关闭迭代器后读锁被释放，修改语句可以继续执行
+        pages = self.core.iter_pages(make_sql_request('SELECT sno'), 10)
+        next(pages)
+        pages.close()
+        pages = list(self.core.iter_pages(make_sql_request("delete WHERE sno = 'F010'"), 10))
+        self.assertTrue(pages[0]['is_success'])
+
+    def test_iter_pages_abandoned(self):
+        def write_in_thread(sql: str) -> bool:
+            # 读锁未被释放时修改语句会一直等待，用超时判断而不是让测试挂住
+            worker = threading.Thread(target=self.core.execute_sql_expr, args=(make_sql_request(sql),), daemon=True)
+            worker.start()
+            worker.join(5)
+            return not worker.is_alive()
+
+        # 只取了一页就被丢弃的迭代器在回收时释放读锁
+        pages = self.core.iter_pages(make_sql_request('SELECT sno'), 10)
+        next(pages)
+        del pages
+        self.assertTrue(write_in_thread("delete WHERE sno = 'F010'"))
+        # 取到最后一页后即使迭代器还被引用、没有再调用 next，读锁也已经释放
+        pages = self.core.iter_pages(make_sql_request('SELECT sno'), len(self.all))
+        self.assertEqual(len(next(pages)['content']), len(self.all) - 1)
+        self.assertTrue(write_in_thread("delete WHERE sno = 'F011'"))
+        self.assertRaises(StopIteration, next, pages)
+
+
+class Test_System_Integration_OrderBy(unittest.TestCase):
+    def setUp(self) -> None:
+        self.core = Core(TABLE_DEFINITION_SAMPLE, [])
+        for sql in INSERTION_SQL_EXPR:
+            self.core.execute_sql_expr(make_sql_request(sql))
+        self.all = self.core.execute_sql_expr(make_sql_request('SELECT *'))['content']
+
+    def expected(self, column: int, desc: bool = False) -> list:
+        # 值相同的行按插入顺序，降序时整体逆序；空值最小
+        order = sorted(range(len(self.all)), key=lambda i: (self.all[i][column] is not None, self.all[i][column], i),
+                       reverse=desc)
+        return [self.all[i] for i in order]
+
+    def select(self, sql: str) -> list:
+        result = self.core.execute_sql_expr(make_sql_request(sql))
+        self.assertTrue(result['is_success'], result['error_msg'])
+        return result['content']
+
+    def test_index_order(self):
+        # sno 与 final_grade 上有B+树，按叶子链表的顺序读取，不取任何列值排序
+        reads = []
+        get_value = self.core.db_m.table_m.get_value
+        self.core.db_m.table_m.get_value = lambda sub, attr: reads.append(sub) or get_value(sub, attr)
+        self.assertEqual(self.select('SELECT * ORDER BY sno'), self.expected(0))
+        self.assertEqual(self.select('SELECT * ORDER BY final_grade DESC'), self.expected(5, True))
+        self.assertEqual(self.select('SELECT * ORDER BY final_grade ASC LIMIT 5 OFFSET 3'), self.expected(5)[3:8])
+        self.assertEqual(reads, [])
+
+    def test_sort(self):
+        for sql, column, desc in [('SELECT * ORDER BY mid_grade', 4, False), ('SELECT * order by name desc', 1, True)]:
+            self.assertEqual(self.select(sql), self.expected(column, desc))
+            self.assertEqual(self.select(sql + ' LIMIT 4 OFFSET 2'), self.expected(column, desc)[2:6])
+        # 超过 sort_run_m 行时外部归并排序
+        self.core.db_m.sort_run_m = 8
+        self.assertEqual(self.select('SELECT * ORDER BY usual_grade DESC'), self.expected(6, True))
+        rows = self.select("SELECT sno, mid_grade WHERE mid_grade >= 60 ORDER BY mid_grade LIMIT 3")
+        self.assertEqual(rows, [(row[0], row[4]) for row in self.expected(4) if row[4] is not None and row[4] >= 60][:3])
+
+    def test_errors(self):
+        result = self.core.execute_sql_expr(make_sql_request('SELECT * ORDER BY nosuch'))
+        self.assertFalse(result['is_success'])
+        result = self.core.execute_sql_expr(make_sql_request('SELECT * LIMIT 1 ORDER BY sno'))
+        self.assertFalse(result['is_success'])
+
+
+class Test_System_Integration_Durability(unittest.TestCase):
+    def run_sql(self, core, sql) -> dict:
+        return core.execute_sql_expr(make_sql_request(sql))
+
+    def test_restart(self):
+        with tempfile.TemporaryDirectory() as directory:
+            core = Core(TABLE_DEFINITION_SAMPLE, [], wal_dir=directory, checkpoint_interval=20)
+            for sql in INSERTION_SQL_EXPR:
+                self.assertTrue(self.run_sql(core, sql)['is_success'])
+            self.assertTrue(self.run_sql(core, "delete WHERE total_grade >= 90")['is_success'])
+            self.assertTrue(self.run_sql(core, "UPDATE SET name = 'X' WHERE sno = 'F010'")['is_success'])
+            expected = self.run_sql(core, 'SELECT *')['content']
+            core.close()
+
+            # 重启时忽略 table_data，由检查点与日志尾部恢复
+            core = Core(TABLE_DEFINITION_SAMPLE, [], wal_dir=directory)
+            self.assertEqual(self.run_sql(core, 'SELECT *')['content'], expected)
+            self.assertEqual(self.run_sql(core, "SELECT name WHERE sno = 'F010'")['content'], [('X',)])
+            self.assertEqual(len(self.run_sql(core, 'SELECT * WHERE total_grade >= 90')['content']), 0)
+            self.assertFalse(self.run_sql(core, INSERTION_SQL_EXPR[3])['is_success'])
+            core.checkpoint()
+            self.assertTrue(self.run_sql(core, "delete WHERE sno = 'F010'")['is_success'])
+            core.close()
+
+            core = Core(TABLE_DEFINITION_SAMPLE, [], wal_dir=directory)
+            self.assertEqual(len(self.run_sql(core, 'SELECT *')['content']), len(expected) - 1)
+            core.close()
+
+    def test_restart_after_compact(self):
+        # 整理空行后的删除与更新使用新的行号，日志重放时必须在同一位置整理
+        with tempfile.TemporaryDirectory() as directory:
+            core = Core(TABLE_DEFINITION_SAMPLE, [], wal_dir=directory)
+            for sql in INSERTION_SQL_EXPR:
+                self.assertTrue(self.run_sql(core, sql)['is_success'])
+            self.assertTrue(self.run_sql(core, "delete WHERE total_grade < 80")['is_success'])
+            self.assertGreater(core.compact(), 0)
+            self.assertTrue(self.run_sql(core, "delete WHERE total_grade >= 95")['is_success'])
+            self.assertTrue(self.run_sql(core, "UPDATE SET name = 'X' WHERE sno = 'F010'")['is_success'])
+            self.assertTrue(self.run_sql(core, INSERTION_SQL_EXPR[1])['is_success'])
+            expected = self.run_sql(core, 'SELECT *')['content']
+            core.close()
+
+            core = Core(TABLE_DEFINITION_SAMPLE, [], wal_dir=directory)
+            self.assertEqual(self.run_sql(core, 'SELECT *')['content'], expected)
+            self.assertEqual(self.run_sql(core, "SELECT name WHERE sno = 'F010'")['content'], [('X',)])
+            core.close()
+
+    def test_acknowledged_without_close(self):
+        # 修改语句返回成功时日志已落盘：不调用 close 直接从同一目录恢复，也能看到全部修改
+        with tempfile.TemporaryDirectory() as directory:
+            core = Core(TABLE_DEFINITION_SAMPLE, [], wal_dir=directory)
+            for sql in INSERTION_SQL_EXPR[:5]:
+                self.assertTrue(self.run_sql(core, sql)['is_success'])
+            results = list(core.execute_many([make_sql_request(sql) for sql in INSERTION_SQL_EXPR[5:10]]))
+            self.assertTrue(all(result['is_success'] for result in results))
+            expected = self.run_sql(core, 'SELECT *')['content']
+            recovered = Core(TABLE_DEFINITION_SAMPLE, [], wal_dir=directory)
+            self.assertEqual(self.run_sql(recovered, 'SELECT *')['content'], expected)
+            self.assertEqual(len(expected), 10)
+            recovered.close()
+            core.close()
+
+
 if __name__ == '__main__':
     unittest.main()